@@ -1,61 +1,99 @@
 from typing import Optional
-from contextlib import AsyncExitStack
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import time
 import traceback
 import json
 import os
-from datetime import datetime
-import aiohttp
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+import uuid
+from urllib.parse import urlsplit
+from mcp import ClientSession, McpError, StdioServerParameters, types
+from mcp.client.sse import sse_client
+from mcp.client.stdio import get_default_environment, stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from utils.logger import logger
+from utils.conversation_log import conversation_log
+from utils.llm_payload import Conversation, build_body, dumps
+from utils.token_budget import TokenBudget, estimate_tokens
+from utils.outbound import Outbound
+from utils.llm_providers import QueryOptions, create_provider
+from utils.tracing import Tracer
+from utils.speculation import Speculation, Speculator
+from pydantic import AnyUrl
+
+# Circuit breaker, rate limit and retries for LLM calls (OUTBOUND_* env vars).
+# Shared by every pooled client so the limits apply to the whole process.
+llm_outbound = Outbound.from_env("llm", logger=logger)
+# Per-stage spans and latency histograms (TRACE_EXPORTER), served by the API at /metrics
+tracer = Tracer.from_env("mcp-client")
+# Call errors meaning the session itself is gone: the connection closed, or
+# (streamable HTTP) the server restarted and no longer knows our session id
+SESSION_LOST_CODES = {types.CONNECTION_CLOSED, 32600}
+# Speculative get_docs alongside the first LLM call (MCP_SPECULATIVE_DOCS); budget and metrics are process-wide
+speculator = Speculator.from_env()
 
 
 class MCPClient:
     def __init__(self):
         self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
+        # Set while a session is up; setting disconnect drops it (and reconnects unless closing)
+        self.connection: asyncio.Task | None = None
+        self.connected = asyncio.Event()
+        self.disconnect = asyncio.Event()
+        self.closing = False
+        # Seconds between reconnect attempts, doubling up to the max
+        self.reconnect_delay = float(os.getenv("MCP_RECONNECT_DELAY", "0.5"))
+        self.reconnect_max_delay = float(os.getenv("MCP_RECONNECT_MAX_DELAY", "10"))
+        # Seconds spent on the last (re)connect: transport + initialize, then the tool list
+        self.connect_timings: dict[str, float] = {}
         self.tools = []
-        self.messages = []
+        # Tool catalog as served by /tools, cached until the server sends tools/list_changed
+        self.tool_catalog = []
+        self.tools_etag = None
+        # Libraries get_docs supports, for guessing a query's library when speculating
+        self.docs_libraries: list[str] = []
+        self.tools_refresh: asyncio.Task | None = None
+        # Request parts that don't change between turns, encoded once
+        self.tools_json = None
+        self.tools_tokens = 0
         self.logger = logger
-        self.http_session = aiohttp.ClientSession()
-        self.api_key = os.getenv("OPENROUTER_API_KEY")  
-
-    async def connect_to_server(self, server_script_path: str):
+        # LLM backend chosen by LLM_PROVIDER: openrouter (default), openai (any compatible endpoint) or mock
+        self.provider = create_provider(llm_outbound, logger)
+        # Max tool calls from one LLM turn that run at the same time
+        self.tool_semaphore = asyncio.Semaphore(int(os.getenv("MCP_TOOL_CONCURRENCY", "4")))
+        # Seconds before a tool call is abandoned; per-tool overrides as JSON, e.g. {"get_docs": 45}
+        self.tool_timeout = float(os.getenv("MCP_TOOL_TIMEOUT", "30"))
+        self.tool_timeouts = json.loads(os.getenv("MCP_TOOL_TIMEOUTS", "{}"))
+        # Defaults for options a request doesn't set. Agent loop guards
+        # (iterations, tool calls): once either is hit the LLM gets one last turn without tools
+        self.default_options = QueryOptions(
+            model=os.getenv("LLM_MODEL", "openai/gpt-4o"),
+            max_tokens=int(os.getenv("LLM_MAX_TOKENS", "1000")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+            max_iterations=int(os.getenv("MCP_MAX_ITERATIONS", "8")),
+            max_tool_calls=int(os.getenv("MCP_MAX_TOOL_CALLS", "16")),
+        )
+        self.token_budget = TokenBudget(
+            max_prompt_tokens=int(os.getenv("MCP_MAX_PROMPT_TOKENS", "24000")),
+            keep_recent=int(os.getenv("MCP_KEEP_RECENT_TOOL_RESULTS", "2")),
+            compacted_chars=int(os.getenv("MCP_COMPACTED_TOOL_CHARS", "800")),
+        )
+
+    async def connect_to_server(self, server: str):
+        """
+        Connect to an MCP server: a .py/.js script started as a stdio
+        subprocess, or the URL of a shared server running in streamable-HTTP
+        (or SSE, for URLs ending in /sse) mode. The connection is owned by a
+        background task that reconnects with backoff when it is lost; failing
+        to connect the first time raises.
+        """
         try:
-            is_python = server_script_path.endswith(".py")
-            is_js = server_script_path.endswith(".js")
-            if not (is_python or is_js):
-                raise ValueError("Server script must be a .py or .js file")
-
-            command = "python" if is_python else "node"
-            server_params = StdioServerParameters(
-                command=command, args=[server_script_path], env=None
-            )
-
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            self.stdio, self.write = stdio_transport
-            self.session = await self.exit_stack.enter_async_context(
-                ClientSession(self.stdio, self.write)
-            )
-
-            await self.session.initialize()
-            self.logger.info("Connected to MCP server")
-
-            mcp_tools = await self.get_mcp_tools()
-            self.tools = [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "parameters": tool.inputSchema
-                    }
-                }
-                for tool in mcp_tools
-            ]
-
+            # Bad configuration fails here instead of in the reconnect loop
+            self.server_transport(server)
+            ready = asyncio.get_running_loop().create_future()
+            self.connection = asyncio.create_task(self.maintain_connection(server, ready))
+            await ready
             return True
 
         except Exception as e:
@@ -63,6 +101,121 @@ class MCPClient:
             traceback.print_exc()
             raise
 
+    @staticmethod
+    def server_transport(server: str) -> str:
+        """The transport for a server URL or script ("sse", "streamable-http" or "stdio"); raises if invalid"""
+        if server.startswith(("http://", "https://")):
+            if not urlsplit(server).hostname:
+                raise ValueError(f"MCP server URL has no host: {server}")
+            return "sse" if server.rstrip("/").endswith("/sse") else "streamable-http"
+        if not server.endswith((".py", ".js")):
+            raise ValueError("Server script must be a .py or .js file, or an http(s) URL")
+        if not os.path.isfile(server):
+            raise FileNotFoundError(f"MCP server script not found: {server}")
+        return "stdio"
+
+    @asynccontextmanager
+    async def transport_context(self, server: str):
+        """Open the transport to server and yield its (read, write) streams"""
+        transport = self.server_transport(server)
+        if transport == "sse":
+            async with sse_client(server) as (read, write):
+                yield read, write
+            return
+        if transport == "streamable-http":
+            async with streamablehttp_client(server) as (read, write, _):
+                yield read, write
+            return
+
+        command = "python" if server.endswith(".py") else "node"
+        # The server gets the SDK's safe default environment plus our tracing and warm-up settings
+        forwarded_env = {k: v for k, v in os.environ.items() if k.startswith(("TRACE_", "WARMUP"))}
+        server_params = StdioServerParameters(
+            command=command,
+            args=[server],
+            env={**get_default_environment(), **forwarded_env} if forwarded_env else None,
+        )
+        async with stdio_client(server_params) as (read, write):
+            yield read, write
+
+    async def maintain_connection(self, server: str, ready: asyncio.Future):
+        """
+        Keep a session to server open until cleanup. Transports must be
+        closed by the task that opened them, and a failing transport cancels
+        that task's work, so this task owns them rather than the callers.
+        """
+        delay = self.reconnect_delay
+        while not self.closing:
+            try:
+                started = time.perf_counter()
+                async with self.transport_context(server) as (read, write):
+                    async with ClientSession(read, write, message_handler=self.handle_server_message) as session:
+                        await session.initialize()
+                        initialized = time.perf_counter()
+                        self.session = session
+                        await self.refresh_tools()
+                        if speculator.enabled:
+                            await self.refresh_libraries()
+                        self.connect_timings = {
+                            "connect": round(initialized - started, 4),
+                            "tools": round(time.perf_counter() - initialized, 4),
+                        }
+                        self.logger.info("Connected to MCP server")
+                        self.connected.set()
+                        if not ready.done():
+                            ready.set_result(True)
+                        delay = self.reconnect_delay
+                        await self.disconnect.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                    return
+                # Transport failures surface as task group errors; log the cause
+                while isinstance(e, BaseExceptionGroup) and e.exceptions:
+                    e = e.exceptions[0]
+                self.logger.error(f"Lost connection to MCP server: {type(e).__name__}: {e}")
+            finally:
+                self.connected.clear()
+                self.disconnect.clear()
+                self.session = None
+
+            if self.closing:
+                break
+            self.logger.info(f"Reconnecting to MCP server in {delay:.1f}s")
+            try:
+                # cleanup() sets disconnect to interrupt the backoff
+                await asyncio.wait_for(self.disconnect.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    async def call_tool(self, tool_name: str, tool_args: dict, meta: dict | None = None):
+        """
+        Call a tool on the current session. If the connection was lost, wait
+        for the reconnect and retry once; docs tools are safe to repeat.
+        """
+        for attempt in range(2):
+            await self.connected.wait()
+            session = self.session
+            try:
+                return await session.send_request(self.call_tool_request(tool_name, tool_args, meta), types.CallToolResult)
+            except McpError as e:
+                if e.error.code not in SESSION_LOST_CODES or attempt:
+                    raise
+                self.logger.warning(f"MCP session lost during {tool_name} ({e.error.message}); reconnecting")
+                if self.session is session:
+                    self.connected.clear()
+                    self.disconnect.set()
+
+    @staticmethod
+    def call_tool_request(tool_name: str, tool_args: dict, meta: dict | None = None) -> types.ClientRequest:
+        """
+        A tools/call request with `_meta` (e.g. the traceparent). Built by hand
+        because ClientSession.call_tool in mcp 1.11 has no meta argument.
+        """
+        params = types.CallToolRequestParams(name=tool_name, arguments=tool_args, _meta=meta)
+        return types.ClientRequest(types.CallToolRequest(method="tools/call", params=params))
+
     async def get_mcp_tools(self):
         try:
             response = await self.session.list_tools()
@@ -70,14 +223,74 @@ class MCPClient:
         except Exception as e:
             self.logger.error(f"Error getting MCP tools: {e}")
             raise
-    async def process_query(self, query: str):
+
+    async def refresh_tools(self):
+        """Fetch the tool list once and rebuild everything derived from it"""
+        mcp_tools = await self.get_mcp_tools()
+        tools = [
+            {
+                "type": "function",
+                "function": {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "parameters": tool.inputSchema
+                }
+            }
+            for tool in mcp_tools
+        ]
+        tools_json = dumps(tools) if tools else None
+        self.tool_catalog = [
+            {"name": tool.name, "description": tool.description, "input_schema": tool.inputSchema}
+            for tool in mcp_tools
+        ]
+        self.tools_etag = f'"{hashlib.sha256(tools_json or b"").hexdigest()[:32]}"'
+        self.tools, self.tools_json = tools, tools_json
+        self.tools_tokens = estimate_tokens(tools_json.decode()) if tools_json else 0
+
+    async def refresh_libraries(self):
+        try:
+            result = await self.session.read_resource(AnyUrl("docs://libraries"))
+            self.docs_libraries = json.loads(result.contents[0].text)
+        except Exception as e:
+            self.logger.warning(f"Could not read the docs library list: {e}")
+            self.docs_libraries = []
+
+    async def handle_server_message(self, message):
+        """Refresh the cached tool catalog when the server reports a change"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.logger.info("MCP server tools changed; refreshing the tool catalog")
+            # Requests can't be awaited from the session's receive loop
+            self.tools_refresh = asyncio.create_task(self.refresh_tools_quietly())
+
+    async def refresh_tools_quietly(self):
         try:
-            self.logger.info(f"Processing query: {query}")
+            await self.refresh_tools()
+        except Exception:
+            # Already logged; keep serving the previous catalog
+            pass
+
+    @tracer.traced("process_query")
+    async def process_query(self, query: str, options: QueryOptions | None = None):
+        speculation = None
+        try:
+            conversation_id = uuid.uuid4().hex
+            self.logger.info(f"Processing query [{conversation_id}]: {query}")
+            options = (options or QueryOptions()).merged(self.default_options)
+            settings = options.encode_settings(stream=False)
+            # Conversation state is per query so concurrent queries don't mix
             user_message = {"role": "user", "content": query}
-            self.messages = [user_message]
+            messages = Conversation([user_message])
+            self.log_messages(conversation_id, [user_message])
+            usage = self.new_usage()
+            speculation = self.speculate(query)
 
             while True:
-                response = await self.call_llm()
+                use_tools = self.tools_allowed(usage, options)
+                turn = self.prepare_turn(messages, query, usage, use_tools)
+                response, llm_usage = await self.call_llm(messages, settings, options, use_tools=use_tools)
+                self.record_turn(turn, llm_usage)
+                prefetched = self.claim_speculation(speculation, response.get("tool_calls") if use_tools else None)
+                speculation = None
 
                 # Final response (no tool calls)
                 if response.get("content") and not response.get("tool_calls"):
@@ -85,157 +298,280 @@ class MCPClient:
                         "role": "assistant",
                         "content": response["content"]
                     }
-                    self.messages.append(assistant_message)
-                    await self.log_conversation()
+                    messages.append(assistant_message)
+                    self.log_messages(conversation_id, [assistant_message])
                     break
 
                 # Tool call detected
-                if response.get("tool_calls"):
+                if response.get("tool_calls") and use_tools:
+                    usage["tool_calls"] += len(response["tool_calls"])
                     assistant_message = {
                         "role": "assistant",
                         "content": response.get("content", ""),
                         "tool_calls": response["tool_calls"]
                     }
-                    self.messages.append(assistant_message)
-                    await self.log_conversation()
+                    messages.append(assistant_message)
+                    self.log_messages(conversation_id, [assistant_message])
 
-                    # Process each tool call
-                    for tool_call in response["tool_calls"]:
-                        tool_name = tool_call["function"]["name"]
-                        tool_args = json.loads(tool_call["function"]["arguments"])
-                        tool_call_id = tool_call["id"]
-
-                        self.logger.info(f"Calling tool {tool_name} with args {tool_args}")
-
-                        try:
-                            result = await self.session.call_tool(tool_name, tool_args)
-                            self.logger.info(f"Tool {tool_name} executed successfully")
-
-                            self.messages.append({
-                                "role": "tool",
-                                "content": "\n".join([
-                                    c.text for c in result.content if hasattr(c, "text")
-                                ]),
-                                "tool_call_id": tool_call_id
-                            })
-                            await self.log_conversation()
-                        except Exception as e:
-                            self.logger.error(f"Error calling tool {tool_name}: {e}")
-                            self.messages.append({
-                                "role": "tool",
-                                "content": f"Error: {str(e)}",
-                                "tool_call_id": tool_call_id
-                            })
-                            await self.log_conversation()
+                    # Run the tool calls concurrently; gather keeps them in call order
+                    tool_messages = await asyncio.gather(*[
+                        self.execute_tool_call(tool_call, prefetched.get(tool_call["id"]))
+                        for tool_call in response["tool_calls"]
+                    ])
+                    messages.extend(tool_messages)
+                    self.log_messages(conversation_id, tool_messages)
 
                     continue
 
                 self.logger.error(f"Unexpected response format: {response}")
                 break
 
-            return self.messages
+            return {"messages": messages.messages, "usage": usage}
 
         except Exception as e:
             self.logger.error(f"Error processing query: {e}")
             raise
-
-
-    async def call_llm(self):
+        finally:
+            if speculation is not None:
+                speculation.finish()
+
+    @tracer.traced("process_query")
+    async def process_query_stream(self, query: str, options: QueryOptions | None = None):
+        """
+        Agent loop that yields events as they happen:
+        token, tool_call_start, tool_call_end, message and finally done.
+        """
+        speculation = None
         try:
-            self.logger.info("Calling LLM ")
+            conversation_id = uuid.uuid4().hex
+            self.logger.info(f"Processing streamed query [{conversation_id}]: {query}")
+            options = (options or QueryOptions()).merged(self.default_options)
+            settings = options.encode_settings(stream=True)
+            user_message = {"role": "user", "content": query}
+            messages = Conversation([user_message])
+            self.log_messages(conversation_id, [user_message])
+            usage = self.new_usage()
+            speculation = self.speculate(query)
 
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            }
+            while True:
+                use_tools = self.tools_allowed(usage, options)
+                turn = self.prepare_turn(messages, query, usage, use_tools)
+                response, llm_usage = None, None
+                async for kind, value in self.call_llm_stream(messages, settings, options, use_tools=use_tools):
+                    if kind == "delta":
+                        yield {"type": "token", "content": value}
+                    elif kind == "usage":
+                        llm_usage = value
+                    else:
+                        response = value
+                self.record_turn(turn, llm_usage)
+                prefetched = self.claim_speculation(speculation, response.get("tool_calls") if use_tools else None)
+                speculation = None
+
+                if response.get("tool_calls") and use_tools:
+                    usage["tool_calls"] += len(response["tool_calls"])
+                    messages.append(response)
+                    self.log_messages(conversation_id, [response])
+                    yield {"type": "message", "message": response}
+
+                    tasks = {}
+                    for tool_call in response["tool_calls"]:
+                        yield {
+                            "type": "tool_call_start",
+                            "id": tool_call["id"],
+                            "name": tool_call["function"]["name"],
+                            "arguments": tool_call["function"]["arguments"],
+                        }
+                        tasks[tool_call["id"]] = asyncio.create_task(
+                            self.execute_tool_call(tool_call, prefetched.get(tool_call["id"]))
+                        )
+
+                    # Report tools as they finish, but keep the conversation in call order
+                    try:
+                        for finished in asyncio.as_completed(tasks.values()):
+                            tool_message = await finished
+                            yield {"type": "tool_call_end", **tool_message}
+                    finally:
+                        for task in tasks.values():
+                            task.cancel()
+
+                    tool_messages = [tasks[tool_call["id"]].result() for tool_call in response["tool_calls"]]
+                    messages.extend(tool_messages)
+                    self.log_messages(conversation_id, tool_messages)
+                    continue
 
-            compatible_messages = []
-            for m in self.messages:
-                if m["role"] == "tool":
-                    compatible_messages.append({
-                        "role": "tool",
-                        "content": m["content"],
-                        "tool_call_id": m["tool_call_id"]
-                    })
-                elif m["role"] == "assistant" and "tool_calls" in m:
-                    compatible_messages.append({
-                        "role": "assistant",
-                        "content": m["content"],
-                        "tool_calls": m["tool_calls"]
-                    })
+                if response.get("content"):
+                    assistant_message = {"role": "assistant", "content": response["content"]}
+                    messages.append(assistant_message)
+                    self.log_messages(conversation_id, [assistant_message])
+                    yield {"type": "message", "message": assistant_message}
                 else:
-                    compatible_messages.append({
-                        "role": m["role"],
-                        "content": m["content"]
-                    })
-
-            payload = {
-                "model": "openai/gpt-4o", 
-                "messages": compatible_messages,
-                "max_tokens": 1000
-            }
+                    self.logger.error(f"Unexpected response format: {response}")
+                break
 
-            if self.tools:
-                payload["tools"] = self.tools
-                payload["tool_choice"] = None  
+            yield {"type": "done", "messages": messages.messages, "usage": usage}
 
-            async with self.http_session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                response_text = await response.text()
-                if response.status != 200:
-                    self.logger.error(f"OpenRouter API error: {response_text}")
-                    raise Exception(f"OpenRouter API error: {response_text}")
+        except Exception as e:
+            self.logger.error(f"Error processing streamed query: {e}")
+            raise
+        finally:
+            if speculation is not None:
+                speculation.finish()
+
+    def new_usage(self):
+        current = tracer.current()
+        return {
+            "turns": [],
+            "tool_calls": 0,
+            "compacted_messages": 0,
+            "stopped_early": False,
+            "trace_id": current.trace_id if current else None,
+        }
+
+    def tools_allowed(self, usage, options: QueryOptions) -> bool:
+        """False once the loop has hit max iterations or max tool calls"""
+        if len(usage["turns"]) < options.max_iterations and usage["tool_calls"] < options.max_tool_calls:
+            return True
+        if not usage["stopped_early"]:
+            usage["stopped_early"] = True
+            self.logger.warning(
+                f"Agent loop limit reached after {len(usage['turns'])} turns and "
+                f"{usage['tool_calls']} tool calls; asking for a final answer"
+            )
+        return False
+
+    def prepare_turn(self, messages: Conversation, query: str, usage, use_tools: bool):
+        """Compact old tool output to fit the token budget and start a turn record"""
+        fixed_tokens = self.tools_tokens if use_tools else 0
+        compacted = self.token_budget.compact(messages, query, fixed_tokens)
+        usage["compacted_messages"] += compacted
+        turn = {
+            "turn": len(usage["turns"]) + 1,
+            "estimated_prompt_tokens": messages.prompt_tokens() + fixed_tokens,
+            "prompt_tokens": None,
+        }
+        usage["turns"].append(turn)
+        if compacted:
+            self.logger.info(f"Compacted {compacted} tool results to fit the prompt budget")
+        return turn
+
+    def record_turn(self, turn, llm_usage):
+        if llm_usage:
+            turn["prompt_tokens"] = llm_usage.get("prompt_tokens")
+            turn["completion_tokens"] = llm_usage.get("completion_tokens")
+        self.logger.info(
+            f"LLM turn {turn['turn']}: ~{turn['estimated_prompt_tokens']} estimated prompt tokens, "
+            f"{turn['prompt_tokens']} reported"
+        )
+
+    def speculate(self, query: str) -> Speculation | None:
+        """Start the likely get_docs call concurrently with the first LLM call, if enabled"""
+        if not speculator.enabled or not any(t["function"]["name"] == "get_docs" for t in self.tools):
+            return None
+        return speculator.start(query, self.docs_libraries, self.speculative_get_docs)
+
+    async def speculative_get_docs(self, arguments: dict):
+        timeout = self.tool_timeouts.get("get_docs", self.tool_timeout)
+        with tracer.span("speculative_get_docs", library=arguments["library"]):
+            return await asyncio.wait_for(
+                self.call_tool("get_docs", arguments, meta={"traceparent": tracer.traceparent()}), timeout=timeout
+            )
 
-                result = json.loads(response_text)
-                message = result["choices"][0]["message"]
-                return message
+    def claim_speculation(self, speculation: Speculation | None, tool_calls) -> dict[str, asyncio.Task]:
+        """Hand the speculative call to a matching tool call (by id), cancelling it otherwise"""
+        prefetched = {}
+        if speculation is None:
+            return prefetched
+        for tool_call in tool_calls or []:
+            try:
+                arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                continue
+            task = speculation.claim(tool_call["function"]["name"], arguments)
+            if task is not None:
+                prefetched[tool_call["id"]] = task
+        speculation.finish()
+        return prefetched
+
+    async def execute_tool_call(self, tool_call, prefetched: asyncio.Task | None = None):
+        """
+        Run one tool call and return its tool message, never raising.
+        `prefetched` is a matching speculative call already in flight.
+        """
+        tool_name = tool_call["function"]["name"]
+        tool_call_id = tool_call["id"]
+        timeout = self.tool_timeouts.get(tool_name, self.tool_timeout)
 
+        try:
+            tool_args = json.loads(tool_call["function"]["arguments"] or "{}")
+            async with self.tool_semaphore:
+                self.logger.info(f"Calling tool {tool_name} with args {tool_args}")
+                with tracer.span("call_tool", tool=tool_name, speculative=prefetched is not None):
+                    # The server parents its spans on this one
+                    result = await asyncio.wait_for(
+                        prefetched or self.call_tool(tool_name, tool_args, meta={"traceparent": tracer.traceparent()}),
+                        timeout=timeout,
+                    )
+            self.logger.info(f"Tool {tool_name} executed successfully")
+            content = "\n".join([
+                c.text for c in result.content if hasattr(c, "text")
+            ])
+        except asyncio.TimeoutError:
+            self.logger.error(f"Tool {tool_name} timed out after {timeout}s")
+            content = f"Error: tool {tool_name} timed out after {timeout}s"
         except Exception as e:
-            self.logger.error(f"Error calling LLM via OpenRouter: {e}")
+            self.logger.error(f"Error calling tool {tool_name}: {e}")
+            content = f"Error: {str(e)}"
+
+        return {
+            "role": "tool",
+            "content": content,
+            "tool_call_id": tool_call_id
+        }
+
+    def build_llm_request(self, messages: Conversation, settings: bytes, use_tools: bool = True) -> bytes:
+        return build_body(settings, self.tools_json if use_tools else None, messages)
+
+    @tracer.traced("call_llm")
+    async def call_llm(self, messages, settings: bytes, options: QueryOptions, use_tools: bool = True):
+        """Return the assistant message and the provider's token usage (if any)"""
+        try:
+            self.logger.info(f"Calling LLM ({self.provider.name}, {options.model})")
+            body = self.build_llm_request(messages, settings, use_tools=use_tools)
+            return await self.provider.complete(body, options)
+        except Exception as e:
+            self.logger.error(f"Error calling LLM via {self.provider.name}: {e}")
+            raise
+
+    @tracer.traced("call_llm")
+    async def call_llm_stream(self, messages, settings: bytes, options: QueryOptions, use_tools: bool = True):
+        """
+        Stream a completion. Yields ("delta", text) for each content token,
+        ("usage", usage) if the provider reports it, and finally
+        ("message", message) with the assembled assistant message.
+        """
+        try:
+            self.logger.info(f"Calling LLM (streaming, {self.provider.name}, {options.model})")
+            body = self.build_llm_request(messages, settings, use_tools=use_tools)
+            async for event in self.provider.stream(body, options):
+                yield event
+        except Exception as e:
+            self.logger.error(f"Error streaming LLM via {self.provider.name}: {e}")
             raise
 
     async def cleanup(self):
         try:
-            await self.exit_stack.aclose()
+            self.closing = True
+            self.disconnect.set()
+            if self.connection is not None:
+                await self.connection
+            await self.provider.close()
             self.logger.info("Disconnected from MCP server")
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
             traceback.print_exc()
             raise
 
-    async def log_conversation(self):
-        os.makedirs("conversations", exist_ok=True)
-        serializable_conversation = []
-
-        for message in self.messages:
-            try:
-                serializable_message = {"role": message["role"], "content": []}
-                if isinstance(message["content"], str):
-                    serializable_message["content"] = message["content"]
-                elif isinstance(message["content"], list):
-                    for content_item in message["content"]:
-                        if hasattr(content_item, "to_dict"):
-                            serializable_message["content"].append(content_item.to_dict())
-                        elif hasattr(content_item, "dict"):
-                            serializable_message["content"].append(content_item.dict())
-                        elif hasattr(content_item, "model_dump"):
-                            serializable_message["content"].append(content_item.model_dump())
-                        else:
-                            serializable_message["content"].append(content_item)
-                serializable_conversation.append(serializable_message)
-            except Exception as e:
-                self.logger.error(f"Error processing message: {str(e)}")
-                raise
-
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filepath = os.path.join("conversations", f"conversation_{timestamp}.json")
-
-        try:
-            with open(filepath, "w") as f:
-                json.dump(serializable_conversation, f, indent=2, default=str)
-        except Exception as e:
-            self.logger.error(f"Error writing conversation to file: {str(e)}")
-            raise
+    def log_messages(self, conversation_id: str, messages):
+        """Queue new messages for the append-only conversation log (non-blocking)"""
+        conversation_log.write(conversation_id, messages)
@@ -1,39 +1,100 @@
-from fastapi import FastAPI, HTTPException
+# ruff: noqa: E402 -- the clock starts before the imports so startup_timings can time them
+import time
+
+_started = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import AnyUrl, BaseModel
 from typing import Dict, Any
-from contextlib import asynccontextmanager
-from client import MCPClient
+from contextlib import aclosing, asynccontextmanager
+import json
+from pool import MCPClientPool, PoolSaturatedError, PoolTimeoutError
+from client import llm_outbound, speculator, tracer
+from utils.outbound import CircuitOpenError, RateLimitedError
+from utils.answer_cache import AnswerCache, is_cacheable
+from utils.llm_providers import QueryOptions
+from utils.tracing import Histogram, SpanContext, render_prometheus
+from utils.conversation_log import conversation_log
+from utils.logger import logger
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
 load_dotenv()
 
+# Seconds per startup phase, reported by /ready
+startup_timings: dict[str, float] = {"imports": round(time.perf_counter() - _started, 4)}
+
 
 class Settings(BaseSettings):
     server_script_path: str = "F:/ML Projects/mcp/documentation/main.py"
+    # URL of a shared MCP server in streamable-HTTP mode (e.g. http://127.0.0.1:8001/mcp);
+    # when set it is used instead of starting server_script_path subprocesses
+    mcp_server_url: str = ""
+    # Number of MCP server subprocesses / sessions that requests borrow from
+    mcp_pool_size: int = 2
+    # Requests allowed to queue for a session before returning 429
+    mcp_pool_max_waiters: int = 32
+    # Seconds a queued request waits for a session before returning 503
+    mcp_pool_acquire_timeout: float = 30.0
+    # Reuse whole answers for near-duplicate queries (cosine similarity of hashed n-grams)
+    answer_cache_enabled: bool = False
+    answer_cache_ttl: float = 3600.0
+    answer_cache_max_entries: int = 1024
+    answer_cache_threshold: float = 0.85
+    # Open the LLM provider's connection before /ready (the MCP servers read WARMUP too)
+    warmup: bool = False
 
 
 settings = Settings()
 
 
+async def start_up(pool: MCPClientPool):
+    """Connect the session pool, then warm up; each phase is timed into startup_timings"""
+    try:
+        phase = time.perf_counter()
+        await pool.start(settings.mcp_server_url or settings.server_script_path)
+        startup_timings["pool"] = round(time.perf_counter() - phase, 4)
+        if settings.warmup:
+            phase = time.perf_counter()
+            await asyncio.gather(*(client.provider.warm_up() for client in pool.clients))
+            startup_timings["warmup"] = round(time.perf_counter() - phase, 4)
+        startup_timings["ready"] = round(time.perf_counter() - _started, 4)
+        logger.info(f"API ready after {startup_timings['ready']:.2f}s: {startup_timings}")
+    except Exception as e:
+        logger.error(f"Startup failed: {e}")
+        raise
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    client = MCPClient()
+    pool = MCPClientPool(
+        settings.mcp_pool_size,
+        settings.mcp_pool_max_waiters,
+        settings.mcp_pool_acquire_timeout,
+    )
+    app.state.pool = pool
+    app.state.answer_cache = (
+        AnswerCache(
+            settings.answer_cache_ttl,
+            settings.answer_cache_max_entries,
+            settings.answer_cache_threshold,
+        )
+        if settings.answer_cache_enabled
+        else None
+    )
+    # Sessions connect in the background so /live answers right away; queries
+    # wait for the first free session and /ready turns 200 once all are up
+    app.state.startup = asyncio.create_task(start_up(pool))
     try:
-        connected = await client.connect_to_server(settings.server_script_path)
-        if not connected:
-            raise HTTPException(
-                status_code=500, detail="Failed to connect to MCP server"
-            )
-        app.state.client = client
         yield
-    except Exception as e:
-        print(f"Error during lifespan: {e}")
-        raise HTTPException(status_code=500, detail="Error during lifespan") from e
     finally:
         # shutdown
-        await client.cleanup()
+        app.state.startup.cancel()
+        await pool.cleanup()
+        conversation_log.close()
 
 
 app = FastAPI(title="MCP Client API", lifespan=lifespan)
@@ -51,6 +112,23 @@ app.add_middleware(
 
 class QueryRequest(BaseModel):
     query: str
+    # Optional per-request overrides of the client defaults
+    model: str | None = None
+    max_tokens: int | None = None
+    temperature: float | None = None
+    timeout: float | None = None
+    max_iterations: int | None = None
+    max_tool_calls: int | None = None
+
+    def options(self) -> QueryOptions:
+        return QueryOptions(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            timeout=self.timeout,
+            max_iterations=self.max_iterations,
+            max_tool_calls=self.max_tool_calls,
+        )
 
 
 class Message(BaseModel):
@@ -63,33 +141,233 @@ class ToolCall(BaseModel):
     args: Dict[str, Any]
 
 
+class PooledStreamingResponse(StreamingResponse):
+    """
+    Streams with a session borrowed from the pool and hands it back when the
+    response ends, even if the client went away before the body started
+    """
+
+    def __init__(self, content, pool: MCPClientPool, client, **kwargs):
+        super().__init__(content, **kwargs)
+        self.pool = pool
+        self.client = client
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # Let an interrupted agent loop clean up before the session is reused
+                await self.body_iterator.aclose()
+            finally:
+                self.pool.put(self.client)
+
+
+def cached_answer(request: QueryRequest, x_answer_cache: str | None):
+    """Look up the answer cache; returns (cache status, cached result or None)"""
+    cache = app.state.answer_cache
+    # Answers are cached for the default options only
+    if cache is None or request.options() != QueryOptions():
+        return None, None
+    query = request.query
+    if (x_answer_cache or "").lower() == "bypass":
+        cache.bypassed += 1
+        return "bypass", None
+    result = cache.get(query)
+    if result is None:
+        return "miss", None
+    # The answer came from a differently worded question; show this one
+    messages = [{"role": "user", "content": query}, *result["messages"][1:]]
+    return "hit", {**result, "messages": messages}
+
+
+def store_answer(query: str, status: str | None, result: dict):
+    # Bypassed requests still refresh the cache with their fresh answer
+    if status is not None and is_cacheable(result):
+        app.state.answer_cache.put(query, result)
+
+
 @app.post("/query")
-async def process_query(request: QueryRequest):
-    """Process a query and return the response"""
+async def process_query(
+    request: QueryRequest,
+    response: Response,
+    x_answer_cache: str | None = Header(default=None),
+    traceparent: str | None = Header(default=None),
+):
+    """
+    Process a query and return the response. Send `X-Answer-Cache: bypass`
+    to skip the answer cache and a W3C `traceparent` to join an existing trace
+    """
+    status, cached = cached_answer(request, x_answer_cache)
+    if status is not None:
+        response.headers["X-Answer-Cache"] = status
+    if cached is not None:
+        return cached
     try:
-        messages = await app.state.client.process_query(request.query)
-        return {"messages": messages}
+        with tracer.span("api.query", parent=SpanContext.from_traceparent(traceparent)) as span:
+            response.headers["X-Trace-Id"] = span.trace_id
+            async with app.state.pool.acquire() as client:
+                result = await client.process_query(request.query, request.options())
+        result = {"messages": result["messages"], "usage": result["usage"]}
+        store_answer(request.query, status, result)
+        return result
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except (CircuitOpenError, RateLimitedError) as e:
+        # The LLM provider is failing or we are over its rate limit; fail fast
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/stream")
+async def process_query_stream(
+    request: QueryRequest,
+    x_answer_cache: str | None = Header(default=None),
+    traceparent: str | None = Header(default=None),
+):
+    """Process a query and stream progress as server-sent events"""
+    status, cached = cached_answer(request, x_answer_cache)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if status is not None:
+        headers["X-Answer-Cache"] = status
+    if cached is not None:
+        async def cached_stream():
+            answer = cached["messages"][-1]
+            yield f"event: token\ndata: {json.dumps({'type': 'token', 'content': answer['content']})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'type': 'done', **cached}, default=str)}\n\n"
+
+        return StreamingResponse(cached_stream(), media_type="text/event-stream", headers=headers)
+
+    pool = app.state.pool
+    # Borrow the session before streaming starts so saturation is a real status code
+    try:
+        client = await pool.get()
+    except PoolSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except PoolTimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+    async def event_stream():
+        try:
+            with tracer.span("api.query", parent=SpanContext.from_traceparent(traceparent)):
+                # Closing this generator must close the agent loop too, before the session goes back
+                async with aclosing(client.process_query_stream(request.query, request.options())) as events:
+                    async for event in events:
+                        if event["type"] == "done":
+                            store_answer(request.query, status, {"messages": event["messages"], "usage": event["usage"]})
+                        yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return PooledStreamingResponse(event_stream(), pool, client, media_type="text/event-stream", headers=headers)
+
+
 @app.get("/tools")
-async def get_tools():
-    """Get the list of available tools"""
+async def get_tools(response: Response, if_none_match: str | None = Header(default=None)):
+    """Get the list of available tools. Honours `If-None-Match` with 304"""
+    # Served from the catalog a client cached at connect; every pooled session runs the same server
+    client = next((c for c in app.state.pool.clients if c.tools_etag is not None), None)
+    if client is None:
+        raise HTTPException(status_code=503, detail="MCP sessions are still connecting")
+    headers = {"ETag": client.tools_etag, "Cache-Control": "no-cache"}
+    tags = {tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")}
+    if client.tools_etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"tools": client.tool_catalog}
+
+
+def startup_error() -> BaseException | None:
+    startup = app.state.startup
+    if not startup.done() or startup.cancelled():
+        return None
+    return startup.exception()
+
+
+@app.get("/live")
+async def live(response: Response):
+    """Liveness: 200 unless startup failed"""
+    error = startup_error()
+    if error is not None:
+        response.status_code = 503
+        return {"live": False, "error": str(error)}
+    return {"live": True}
+
+
+@app.get("/ready")
+async def ready(response: Response):
+    """
+    Readiness: 200 once startup finished, a pooled MCP session is connected and
+    the connected sessions' servers have finished warming up, with startup timings
+    """
+    pool = app.state.pool
+    connected = [client for client in pool.clients if client.connected.is_set()]
+    started = app.state.startup.done() and startup_error() is None and not app.state.startup.cancelled()
+    # Servers without the resource can't report a warm-up, so they don't hold up readiness
+    servers = await asyncio.gather(*(read_server_resource(client, "startup://timings") for client in connected))
+    warming_up = sum(1 for server in servers if server and server.get("warmup") == "running")
+    is_ready = started and len(connected) > 0 and warming_up == 0
+    response.status_code = 200 if is_ready else 503
+    return {
+        "ready": is_ready,
+        "sessions_connected": len(connected),
+        "sessions_warming_up": warming_up,
+        "pool_size": pool.size,
+        "startup": startup_timings,
+        "sessions": [client.connect_timings for client in pool.clients],
+        "servers": servers,
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    """Session pool usage, answer cache and speculation metrics, and per-host LLM circuit breaker / rate limit state"""
+    stats = {"pool": app.state.pool.stats(), "llm": llm_outbound.stats(), "speculation": speculator.stats()}
+    if app.state.answer_cache is not None:
+        stats["answer_cache"] = app.state.answer_cache.stats()
+    return stats
+
+
+async def read_server_resource(client, uri: str):
+    """JSON from an MCP server resource, or None if the server can't serve it"""
     try:
-        tools = await app.state.client.get_mcp_tools()
-        return {
-            "tools": [
-                {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "input_schema": tool.inputSchema,
-                }
-                for tool in tools
-            ]
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        result = await client.session.read_resource(AnyUrl(uri))
+        return json.loads(result.contents[0].text)
+    except Exception:
+        return None
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms of this API and its MCP servers, in Prometheus text format"""
+    series = {
+        (("process", "mcp-client"), ("stage", name)): histogram
+        for name, histogram in tracer.histograms.items()
+    }
+    # One series per stage across all server processes in the pool
+    server_series: dict[str, Histogram] = {}
+    for client in app.state.pool.clients:
+        for name, snapshot in (await read_server_resource(client, "metrics://stages") or {}).items():
+            histogram = server_series.get(name)
+            if histogram is None:
+                histogram = server_series[name] = Histogram(tuple(snapshot["buckets"]))
+            histogram.merge(snapshot)
+    for name, histogram in server_series.items():
+        series[(("process", "mcp-server"), ("stage", name))] = histogram
+    text = render_prometheus("mcp_stage_duration_seconds", "Time spent per pipeline stage", series)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Spans of one trace from this API and its MCP servers, by start time (needs TRACE_EXPORTER=memory)"""
+    spans = [{"process": "mcp-client", **span} for span in tracer.recent_spans(trace_id)]
+    for client in app.state.pool.clients:
+        spans.extend({"process": "mcp-server", **span} for span in await read_server_resource(client, f"traces://{trace_id}") or [])
+    return {"trace_id": trace_id, "spans": sorted(spans, key=lambda span: span["start"])}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+from client import MCPClient
+from utils.logger import logger
+
+
+class PoolSaturatedError(Exception):
+    """Raised when too many requests are already waiting for a client"""
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no client became free within the acquire timeout"""
+
+
+class MCPClientPool:
+    """
+    Fixed-size pool of MCPClients, each with its own MCP session: to a
+    private server subprocess, or to a shared server over HTTP.
+
+    Requests borrow a client for the duration of one query. At most
+    `max_waiters` requests may queue for a client; beyond that `acquire`
+    fails immediately so the API can shed load instead of piling up.
+    """
+
+    def __init__(self, size: int, max_waiters: int, acquire_timeout: float):
+        self.size = size
+        self.max_waiters = max_waiters
+        self.acquire_timeout = acquire_timeout
+        self.clients: List[MCPClient] = []
+        self._idle: asyncio.Queue[MCPClient] = asyncio.Queue()
+        self._waiters = 0
+        self.logger = logger
+
+    async def start(self, server: str):
+        """
+        Connect `size` sessions to a server script or URL. Each session can be
+        borrowed as soon as it is up: the first connects alone so it isn't
+        slowed down by the others, the rest connect concurrently.
+        """
+        async def connect(client: MCPClient):
+            await client.connect_to_server(server)
+            self._idle.put_nowait(client)
+
+        self.clients = [MCPClient() for _ in range(self.size)]
+        await connect(self.clients[0])
+        await asyncio.gather(*(connect(client) for client in self.clients[1:]))
+        self.logger.info(f"Started MCP client pool with {self.size} sessions")
+
+    async def get(self) -> MCPClient:
+        """Borrow a client; it must be handed back with `put`"""
+        if self._idle.empty() and self._waiters >= self.max_waiters:
+            raise PoolSaturatedError(f"{self._waiters} requests already waiting for an MCP session")
+
+        self._waiters += 1
+        try:
+            return await asyncio.wait_for(self._idle.get(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(f"No MCP session available within {self.acquire_timeout}s")
+        finally:
+            self._waiters -= 1
+
+    def put(self, client: MCPClient):
+        self._idle.put_nowait(client)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[MCPClient]:
+        client = await self.get()
+        try:
+            yield client
+        finally:
+            self.put(client)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "waiting": self._waiters,
+            "max_waiters": self.max_waiters,
+        }
+
+    async def cleanup(self):
+        # Each client's connection task owns its transports; stop them in reverse start order
+        for client in reversed(self.clients):
+            try:
+                await client.cleanup()
+            except Exception as e:
+                self.logger.error(f"Error cleaning up pooled client: {e}")
@@ -0,0 +1,162 @@
+import re
+import time
+import zlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import numpy as np
+# NumPy is imported when a cache is built, so importing this module (e.g. for
+# normalize_query) doesn't add it to API startup
+
+_WORD_RE = re.compile(r"[a-z0-9_.+#-]+")
+# Filler words that change the phrasing of a question but not what it asks
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "you", "how", "do", "does", "can",
+    "could", "would", "should", "to", "in", "of", "for", "is", "are", "it",
+    "please", "what", "whats", "way", "use", "using", "tell", "show", "about",
+    "with", "and", "on", "from", "by",
+}
+# One of these flips what a question asks while barely moving its vector
+# ("stream responses" vs "not stream responses" score 0.87), so a near
+# match must have exactly the same ones
+NEGATIONS = {"not", "no", "without", "never", "cannot", "nor", "neither", "none"}
+_CONTRACTION_RE = re.compile(r"n['’]t\b")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, spell out "n't", drop punctuation and filler words"""
+    words = [w.strip(".-") for w in _WORD_RE.findall(_CONTRACTION_RE.sub(" not", query.lower()))]
+    return " ".join(w for w in words if w and w not in STOPWORDS)
+
+
+def negations(key: str) -> frozenset[str]:
+    return frozenset(w for w in key.split() if w in NEGATIONS)
+
+
+def hashed_ngram_vector(text: str, dim: int) -> "np.ndarray":
+    """
+    Unit-length bag of hashed words and character trigrams. Trigrams make
+    "embeddings" and "embedding" close; whole words keep distinct terms apart.
+    """
+    import numpy as np
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.split():
+        vector[zlib.crc32(word.encode()) % dim] += 2.0
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """
+    Whole-answer cache for /query keyed by near-duplicate questions.
+
+    Queries are normalized and compared by cosine similarity of hashed
+    n-gram vectors; a cached answer is reused when the best match scores at
+    least `threshold`, has the same negation words and hasn't expired. Vectors live in one preallocated
+    matrix, so a lookup is a single matrix-vector product. When full, the
+    oldest entry is overwritten.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, threshold: float, dim: int = 4096):
+        import numpy as np
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._entries: list[tuple[str, Any] | None] = [None] * max_entries
+        self._exact: dict[str, int] = {}
+        self._next = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.tokens_saved = 0
+
+    def get(self, query: str) -> Any | None:
+        key = normalize_query(query)
+        now = time.monotonic()
+
+        slot = self._exact.get(key)
+        if slot is None and key:
+            scores = self._vectors @ hashed_ngram_vector(key, self.dim)
+            scores[self._expires <= now] = -1.0
+            wanted = negations(key)
+            # Best first among the few candidates over the threshold
+            candidates = (scores >= self.threshold).nonzero()[0]
+            for best in candidates[scores[candidates].argsort()[::-1]]:
+                if negations(self._entries[best][0]) == wanted:
+                    slot = int(best)
+                    self.semantic_hits += 1
+                    break
+
+        if slot is None or self._expires[slot] <= now:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, result = self._entries[slot]
+        self.tokens_saved += result_tokens(result)
+        return result
+
+    def put(self, query: str, result: Any) -> None:
+        key = normalize_query(query)
+        if not key:
+            return
+        slot = self._exact.get(key)
+        if slot is None:
+            slot = self._next
+            self._next = (self._next + 1) % self.max_entries
+            evicted = self._entries[slot]
+            if evicted is not None and self._exact.get(evicted[0]) == slot:
+                del self._exact[evicted[0]]
+            self._exact[key] = slot
+        self._vectors[slot] = hashed_ngram_vector(key, self.dim)
+        self._expires[slot] = time.monotonic() + self.ttl
+        self._entries[slot] = (key, result)
+        self.stores += 1
+
+    def clear(self) -> None:
+        self._vectors.fill(0)
+        self._expires.fill(0)
+        self._entries = [None] * self.max_entries
+        self._exact.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": int((self._expires > time.monotonic()).sum()),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "llm_tokens_saved": self.tokens_saved,
+        }
+
+
+def result_tokens(result: dict) -> int:
+    """LLM tokens the provider reported for a /query result"""
+    total = 0
+    for turn in (result.get("usage") or {}).get("turns", []):
+        total += (turn.get("prompt_tokens") or 0) + (turn.get("completion_tokens") or 0)
+    return total
+
+
+def is_cacheable(result: dict) -> bool:
+    """Only cache runs that ended in a plain assistant answer"""
+    messages = result.get("messages") or []
+    if not messages:
+        return False
+    last = messages[-1]
+    return last.get("role") == "assistant" and bool(last.get("content")) and not last.get("tool_calls")
@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+from utils.logger import logger
+
+_STOP = object()
+
+
+def serialize_message(message):
+    serializable_message = {"role": message["role"], "content": []}
+    if isinstance(message["content"], str):
+        serializable_message["content"] = message["content"]
+    elif isinstance(message["content"], list):
+        for content_item in message["content"]:
+            if hasattr(content_item, "to_dict"):
+                serializable_message["content"].append(content_item.to_dict())
+            elif hasattr(content_item, "dict"):
+                serializable_message["content"].append(content_item.dict())
+            elif hasattr(content_item, "model_dump"):
+                serializable_message["content"].append(content_item.model_dump())
+            else:
+                serializable_message["content"].append(content_item)
+    for key in ("tool_calls", "tool_call_id"):
+        if key in message:
+            serializable_message[key] = message[key]
+    return serializable_message
+
+
+class ConversationLog:
+    """
+    Append-only JSONL log of conversation messages.
+
+    `write` only enqueues; a background thread serializes records and appends
+    them to disk in batches, so logging never blocks the event loop. When the
+    file grows past `max_bytes` it is rotated and optionally gzipped.
+
+    Each process writes a file of its own (the pid is in the name), so
+    uvicorn workers sharing a directory never interleave or rotate each
+    other's writes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, compress: bool, flush_interval: float, batch_size: int = 256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.logger = logger
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"conversations_{os.getpid()}.jsonl")
+
+    def write(self, conversation_id: str, messages):
+        if self._thread is None:
+            self._start()
+        timestamp = datetime.now().isoformat()
+        for message in messages:
+            self._queue.put({
+                "conversation_id": conversation_id,
+                "timestamp": timestamp,
+                "message": message,
+            })
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [record for record in batch if record is not _STOP]
+            if batch:
+                self._append(batch)
+
+    def _append(self, batch):
+        try:
+            lines = []
+            for record in batch:
+                record["message"] = serialize_message(record["message"])
+                lines.append(json.dumps(record, default=str))
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            self.logger.error(f"Error writing conversation log: {str(e)}")
+
+    def _rotate(self):
+        suffix = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")
+        rotated = os.path.join(self.directory, f"conversations_{os.getpid()}_{suffix}.jsonl")
+        os.replace(self.path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+
+    def close(self):
+        """Flush pending records and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+
+conversation_log = ConversationLog(
+    directory=os.getenv("CONVERSATION_LOG_DIR", "conversations"),
+    max_bytes=int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(64 * 1024 * 1024))),
+    compress=os.getenv("CONVERSATION_LOG_COMPRESS", "1") == "1",
+    flush_interval=float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "1.0")),
+)
@@ -0,0 +1,95 @@
+import json
+from utils.token_budget import estimate_message_tokens
+
+try:
+    import orjson
+except ImportError:  # optional, faster encoder
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Encode to compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def to_provider_message(m):
+    """Keep only the fields the chat completions API accepts"""
+    if m["role"] == "tool":
+        return {
+            "role": "tool",
+            "content": m["content"],
+            "tool_call_id": m["tool_call_id"]
+        }
+    elif m["role"] == "assistant" and "tool_calls" in m:
+        return {
+            "role": "assistant",
+            "content": m["content"],
+            "tool_calls": m["tool_calls"]
+        }
+    return {
+        "role": m["role"],
+        "content": m["content"]
+    }
+
+
+class Conversation:
+    """
+    Messages of one query together with their pre-encoded provider form.
+
+    Each message is converted and encoded once when it is appended, so
+    building the request body for the next LLM turn only joins bytes. A
+    running token estimate is kept alongside for budgeting.
+    """
+
+    def __init__(self, messages=None):
+        self.messages = []
+        self._encoded = []
+        self._tokens = []
+        self._total_tokens = 0
+        for message in messages or []:
+            self.append(message)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def append(self, message):
+        self.messages.append(message)
+        self._encoded.append(dumps(to_provider_message(message)))
+        self._tokens.append(estimate_message_tokens(message))
+        self._total_tokens += self._tokens[-1]
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def replace(self, index, message):
+        self.messages[index] = message
+        self._encoded[index] = dumps(to_provider_message(message))
+        tokens = estimate_message_tokens(message)
+        self._total_tokens += tokens - self._tokens[index]
+        self._tokens[index] = tokens
+
+    def prompt_tokens(self) -> int:
+        """Estimated prompt tokens of the messages (tools not included)"""
+        return self._total_tokens
+
+    def encoded_messages(self) -> bytes:
+        return b"[" + b",".join(self._encoded) + b"]"
+
+
+def build_body(settings: bytes, tools: bytes | None, conversation: Conversation) -> bytes:
+    """
+    Assemble a chat completions body from pre-encoded parts.
+
+    `settings` is the encoded object of scalar options (model, max_tokens, ...),
+    `tools` the encoded tools list or None.
+    """
+    body = settings[:-1] + b',"messages":' + conversation.encoded_messages()
+    if tools is not None:
+        body += b',"tools":' + tools + b',"tool_choice":null'
+    return body + b"}"
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator
+
+import aiohttp
+
+from utils.llm_payload import dumps
+from utils.outbound import Outbound, raise_for_transient_status
+
+# Errors worth retrying: connection failures and timeouts before a response arrived
+LLM_TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+@dataclass(frozen=True)
+class QueryOptions:
+    """Per-request model, limits and timeouts; unset fields fall back to the client defaults"""
+
+    model: str | None = None
+    max_tokens: int | None = None
+    temperature: float | None = None
+    # Seconds for one LLM call (for streaming: between chunks)
+    timeout: float | None = None
+    max_iterations: int | None = None
+    max_tool_calls: int | None = None
+
+    def merged(self, defaults: "QueryOptions") -> "QueryOptions":
+        """These options with unset fields taken from defaults"""
+        overrides = {k: v for k, v in self.__dict__.items() if v is not None}
+        return replace(defaults, **overrides)
+
+    def encode_settings(self, stream: bool) -> bytes:
+        """The scalar part of a chat completions body, encoded once per query"""
+        settings: dict[str, Any] = {"model": self.model, "max_tokens": self.max_tokens}
+        if self.temperature is not None:
+            settings["temperature"] = self.temperature
+        if stream:
+            settings["stream"] = True
+            settings["stream_options"] = {"include_usage": True}
+        return dumps(settings)
+
+
+class LLMProvider(ABC):
+    """
+    A chat completions backend. Request bodies arrive already encoded (see
+    llm_payload.build_body) and in the OpenAI format.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, body: bytes, options: QueryOptions) -> tuple[dict, dict | None]:
+        """Return the assistant message and the provider's token usage (if any)"""
+
+    @abstractmethod
+    def stream(self, body: bytes, options: QueryOptions) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Yield ("delta", text) for each content token, ("usage", usage) if the
+        provider reports it, and finally ("message", message).
+        """
+
+    async def warm_up(self):
+        """Prepare for the first request (e.g. open a connection); never raises"""
+
+    async def close(self):
+        pass
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any server speaking the OpenAI chat completions API (vLLM, llama.cpp, Ollama, ...)"""
+
+    name = "openai"
+
+    def __init__(self, url: str, api_key: str | None, outbound: Outbound, logger):
+        self.url = url
+        self.api_key = api_key
+        self.outbound = outbound
+        self.logger = logger
+        self.session = aiohttp.ClientSession()
+
+    def headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    async def post(self, body: bytes, timeout: aiohttp.ClientTimeout) -> aiohttp.ClientResponse:
+        """
+        POST through the circuit breaker, retrying 429/5xx and connection
+        errors. Returns the open response once the status is 200.
+        """
+        async def attempt():
+            response = await self.session.post(self.url, headers=self.headers(), data=body, timeout=timeout)
+            if response.status == 200:
+                return response
+            async with response:
+                response_text = await response.text()
+            self.logger.error(f"{self.name} API error: {response_text}")
+            raise_for_transient_status(response.status, response.headers, self.url)
+            raise Exception(f"{self.name} API error: {response_text}")
+
+        return await self.outbound.call(self.url, attempt, transient=LLM_TRANSIENT_ERRORS)
+
+    async def warm_up(self):
+        # Any status will do; the TCP + TLS connection stays in the session's keep-alive pool
+        try:
+            async with self.session.head(self.url, timeout=aiohttp.ClientTimeout(total=5)):
+                pass
+        except Exception as e:
+            self.logger.warning(f"{self.name} warm-up failed: {e}")
+
+    async def complete(self, body: bytes, options: QueryOptions) -> tuple[dict, dict | None]:
+        async with await self.post(body, aiohttp.ClientTimeout(total=options.timeout)) as response:
+            result = json.loads(await response.text())
+        return result["choices"][0]["message"], result.get("usage")
+
+    async def stream(self, body: bytes, options: QueryOptions) -> AsyncIterator[tuple[str, Any]]:
+        content = ""
+        tool_calls = {}
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=options.timeout, sock_read=options.timeout)
+        # Only opening the request is retried; once tokens flow a failure is final
+        async with await self.post(body, timeout) as response:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                # Skip blank lines and SSE comments (": OPENROUTER PROCESSING")
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    yield "usage", chunk["usage"]
+                choices = chunk.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta", {})
+
+                if delta.get("content"):
+                    content += delta["content"]
+                    yield "delta", delta["content"]
+
+                # Tool call fragments arrive keyed by index; arguments are split across chunks
+                for fragment in delta.get("tool_calls") or []:
+                    call = tool_calls.setdefault(fragment.get("index", 0), {
+                        "id": "",
+                        "type": "function",
+                        "function": {"name": "", "arguments": ""},
+                    })
+                    if fragment.get("id"):
+                        call["id"] = fragment["id"]
+                    function = fragment.get("function") or {}
+                    if function.get("name"):
+                        call["function"]["name"] += function["name"]
+                    if function.get("arguments"):
+                        call["function"]["arguments"] += function["arguments"]
+
+        message = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+        yield "message", message
+
+    async def close(self):
+        await self.session.close()
+
+
+class OpenRouterProvider(OpenAICompatibleProvider):
+    name = "openrouter"
+    DEFAULT_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic in-process LLM for load tests and profiling, no network.
+
+    For the first `tool_rounds` turns it asks for `tool` (if that tool was
+    offered) with the user's question filled into any "{query}" argument,
+    then answers in plain text. Each call takes `latency` seconds, plus
+    `token_delay` per streamed token. Usage is estimated from the body size.
+    """
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.05, token_delay: float = 0.0, tool_rounds: int = 1, tool: dict | None = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tool_rounds = tool_rounds
+        self.tool = tool or {"name": "list_supported_libraries", "arguments": {}}
+        self.calls = 0
+
+    def respond(self, body: bytes) -> tuple[dict, dict]:
+        request = json.loads(body)
+        messages = request["messages"]
+        question = next((m["content"] for m in messages if m["role"] == "user"), "")
+        rounds = sum(1 for m in messages if m["role"] == "assistant" and m.get("tool_calls"))
+        offered = {t["function"]["name"] for t in request.get("tools") or []}
+
+        if rounds < self.tool_rounds and self.tool["name"] in offered:
+            arguments = {
+                k: v.replace("{query}", question) if isinstance(v, str) else v
+                for k, v in self.tool["arguments"].items()
+            }
+            message = {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{
+                    "id": f"call_{rounds + 1}",
+                    "type": "function",
+                    "function": {"name": self.tool["name"], "arguments": json.dumps(arguments)},
+                }],
+            }
+        else:
+            tool_chars = sum(len(m["content"] or "") for m in messages if m["role"] == "tool")
+            message = {
+                "role": "assistant",
+                "content": f"Mock answer to '{question}' based on {rounds} tool rounds and {tool_chars} chars of tool output.",
+            }
+
+        prompt_tokens = len(body) // 4
+        completion_tokens = len(message["content"]) // 4 + 1
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        return message, usage
+
+    async def complete(self, body: bytes, options: QueryOptions) -> tuple[dict, dict | None]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.respond(body)
+
+    async def stream(self, body: bytes, options: QueryOptions) -> AsyncIterator[tuple[str, Any]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        message, usage = self.respond(body)
+        for token in message["content"].split(" ") if message["content"] else []:
+            yield "delta", token + " "
+            await asyncio.sleep(self.token_delay)
+        yield "usage", usage
+        yield "message", message
+
+
+def create_provider(outbound: Outbound, logger) -> LLMProvider:
+    """Build the provider named by LLM_PROVIDER (openrouter, openai or mock)"""
+    name = os.getenv("LLM_PROVIDER", "openrouter")
+    if name == "mock":
+        return MockProvider(
+            latency=float(os.getenv("MOCK_LLM_LATENCY", "0.05")),
+            token_delay=float(os.getenv("MOCK_LLM_TOKEN_DELAY", "0")),
+            tool_rounds=int(os.getenv("MOCK_LLM_TOOL_ROUNDS", "1")),
+            tool=json.loads(os.getenv("MOCK_LLM_TOOL", "null")),
+        )
+    if name == "openai":
+        url = os.getenv("LLM_API_URL", "http://127.0.0.1:8080/v1/chat/completions")
+        return OpenAICompatibleProvider(url, os.getenv("LLM_API_KEY"), outbound, logger)
+    if name == "openrouter":
+        url = os.getenv("LLM_API_URL", OpenRouterProvider.DEFAULT_URL)
+        return OpenRouterProvider(url, os.getenv("OPENROUTER_API_KEY"), outbound, logger)
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
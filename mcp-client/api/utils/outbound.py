@@ -0,0 +1,390 @@
+"""
+Guards for outbound HTTP calls, kept per host: a circuit breaker, a token
+bucket rate limit that slows down on 429s, and jittered retries capped by a
+retry budget.
+
+The module only deals with coroutines and exceptions, so it works with any
+HTTP library. mcp-server and mcp-client/api each ship a copy; keep them in
+sync (mcp-server/tests/test_shared_copies.py fails when they differ).
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Mapping, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+
+# Statuses worth retrying; 429 and 503 may also carry a Retry-After
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class OutboundError(Exception):
+    """Base class for errors raised by the outbound guards"""
+
+
+class CircuitOpenError(OutboundError):
+    """Raised without calling the host while its circuit breaker is open"""
+
+
+class RateLimitedError(OutboundError):
+    """Raised when waiting for a rate limit token would take longer than allowed"""
+
+
+class TransientError(OutboundError):
+    """A failure worth retrying (5xx, 429); `retry_after` is the server's hint in seconds"""
+
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def raise_for_transient_status(status: int, headers: Mapping[str, str], url: str) -> None:
+    """Raise TransientError for statuses that should be retried"""
+    if status in RETRYABLE_STATUSES:
+        raise TransientError(
+            f"HTTP {status} from {url}",
+            status=status,
+            retry_after=parse_retry_after(headers.get("Retry-After")),
+        )
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls
+    fail immediately; after `reset_timeout` seconds a single probe call is
+    let through and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, logger: logging.Logger):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logger
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trips = 0
+        self._probing = False
+
+    def allow(self) -> None:
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuit open for {self.name}")
+            self._set_state(self.HALF_OPEN)
+        # Half-open: one probe at a time
+        if self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(f"Circuit half-open for {self.name}; probe in progress")
+        self._probing = True
+
+    def record_success(self) -> None:
+        self._probing = False
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and 0 < self.failure_threshold <= self.failures
+        ):
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            self._set_state(self.OPEN)
+
+    def abandon(self) -> None:
+        """The call was cancelled; let another probe through"""
+        self._probing = False
+
+    def _set_state(self, state: str) -> None:
+        level = logging.WARNING if state == self.OPEN else logging.INFO
+        self.logger.log(level, f"Circuit breaker for {self.name}: {self.state} -> {state}")
+        self.state = state
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second with bursts of up to `burst`. A 429 halves
+    the current rate and pauses the bucket for the Retry-After period; each
+    success then raises the rate back by a tenth of `rate`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.current_rate = rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.current_rate)
+        self.updated = now
+
+    async def acquire(self, max_wait: float) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait += (1 - self.tokens) / self.current_rate
+        if wait > max_wait:
+            self.rejected += 1
+            raise RateLimitedError(f"Rate limit wait of {wait:.1f}s exceeds {max_wait:.1f}s")
+        # Reserve the token now; it may go negative so later callers queue behind
+        self.tokens -= 1
+        if wait > 0:
+            self.waited += 1
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after: float | None) -> None:
+        self.throttled += 1
+        if self.rate > 0:
+            self.current_rate = max(self.rate / 16, self.current_rate / 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def recover(self) -> None:
+        if self.current_rate < self.rate:
+            self.current_rate = min(self.rate, self.current_rate + self.rate / 10)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "current_rate": round(self.current_rate, 3),
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries to roughly `ratio` of calls, so retries can't multiply load
+    on a host that is already struggling. Every call deposits `ratio` tokens
+    (up to `reserve`), every retry spends one.
+    """
+
+    def __init__(self, ratio: float, reserve: float = 10.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        return True
+
+
+class HostGuard:
+    def __init__(self, host: str, breaker: CircuitBreaker, bucket: TokenBucket, budget: RetryBudget):
+        self.host = host
+        self.breaker = breaker
+        self.bucket = bucket
+        self.budget = budget
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "retry_budget_exhausted": self.budget.exhausted,
+            "breaker": self.breaker.stats(),
+            "rate_limit": self.bucket.stats(),
+        }
+
+
+class Outbound:
+    """
+    Runs outbound calls through per-host guards. Settings apply to every host
+    unless overridden in `host_overrides`, e.g. {"google.serper.dev": {"rate": 5}}.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        rate: float = 0.0,
+        burst: int = 10,
+        max_wait: float = 5.0,
+        max_retries: int = 2,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        retry_ratio: float = 0.2,
+        host_overrides: dict[str, dict[str, Any]] | None = None,
+        logger: logging.Logger | None = None,
+    ):
+        self.name = name
+        self.defaults = {
+            "failure_threshold": failure_threshold,
+            "reset_timeout": reset_timeout,
+            "rate": rate,
+            "burst": burst,
+            "max_wait": max_wait,
+            "max_retries": max_retries,
+            "retry_ratio": retry_ratio,
+        }
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.host_overrides = host_overrides or {}
+        self.logger = logger or logging.getLogger(f"outbound.{name}")
+        self.hosts: dict[str, HostGuard] = {}
+
+    @classmethod
+    def from_env(cls, name: str, logger: logging.Logger | None = None) -> "Outbound":
+        """Build from OUTBOUND_* environment variables"""
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("OUTBOUND_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("OUTBOUND_BREAKER_RESET", "30")),
+            rate=float(os.getenv("OUTBOUND_RATE", "0")),
+            burst=int(os.getenv("OUTBOUND_BURST", "10")),
+            max_wait=float(os.getenv("OUTBOUND_MAX_WAIT", "5")),
+            max_retries=int(os.getenv("OUTBOUND_MAX_RETRIES", "2")),
+            base_delay=float(os.getenv("OUTBOUND_RETRY_BASE_DELAY", "0.25")),
+            max_delay=float(os.getenv("OUTBOUND_RETRY_MAX_DELAY", "4")),
+            retry_ratio=float(os.getenv("OUTBOUND_RETRY_RATIO", "0.2")),
+            host_overrides=json.loads(os.getenv("OUTBOUND_HOSTS", "{}")),
+            logger=logger,
+        )
+
+    def settings(self, host: str) -> dict[str, Any]:
+        return {**self.defaults, **self.host_overrides.get(host, {})}
+
+    def guard(self, url: str) -> HostGuard:
+        host = host_of(url)
+        guard = self.hosts.get(host)
+        if guard is None:
+            settings = self.settings(host)
+            guard = HostGuard(
+                host,
+                CircuitBreaker(host, settings["failure_threshold"], settings["reset_timeout"], self.logger),
+                TokenBucket(settings["rate"], settings["burst"]),
+                RetryBudget(settings["retry_ratio"]),
+            )
+            self.hosts[host] = guard
+        return guard
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(
+        self,
+        url: str,
+        attempt: Callable[[], Awaitable[T]],
+        transient: tuple[type[BaseException], ...] = (asyncio.TimeoutError, OSError),
+        retries: int | None = None,
+    ) -> T:
+        """
+        Run `attempt` against the host of `url`, retrying TransientError and
+        `transient` exceptions. Any other exception means the host answered
+        and is passed through without a retry.
+        """
+        guard = self.guard(url)
+        settings = self.settings(guard.host)
+        retries = settings["max_retries"] if retries is None else retries
+        guard.calls += 1
+        guard.budget.deposit()
+
+        tries = 0
+        while True:
+            guard.breaker.allow()
+            try:
+                await guard.bucket.acquire(settings["max_wait"])
+                result = await attempt()
+            except asyncio.CancelledError:
+                guard.breaker.abandon()
+                raise
+            except RateLimitedError:
+                guard.breaker.abandon()
+                raise
+            except (TransientError, *transient) as e:
+                guard.failures += 1
+                retry_after = getattr(e, "retry_after", None)
+                if getattr(e, "status", None) == 429:
+                    # The host is up but wants us to slow down
+                    guard.breaker.abandon()
+                    guard.bucket.throttle(retry_after)
+                else:
+                    guard.breaker.record_failure()
+
+                delay = retry_after if retry_after is not None else self.backoff(tries)
+                if (
+                    tries >= retries
+                    or delay > self.max_delay
+                    or guard.breaker.state == CircuitBreaker.OPEN
+                    or not guard.budget.withdraw()
+                ):
+                    raise
+                tries += 1
+                guard.retries += 1
+                self.logger.info(f"Retrying {guard.host} in {delay:.2f}s after: {e!r}")
+                await asyncio.sleep(delay)
+            except Exception:
+                guard.breaker.record_success()
+                raise
+            else:
+                guard.breaker.record_success()
+                guard.bucket.recover()
+                return result
+
+    def stats(self) -> dict:
+        return {host: guard.stats() for host, guard in self.hosts.items()}
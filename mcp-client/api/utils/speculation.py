@@ -0,0 +1,167 @@
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable
+
+from utils.answer_cache import normalize_query
+
+# Share of the question's topic words the model's query must keep for a match
+MATCH_COVERAGE = 0.75
+
+
+class SpeculationBudget:
+    """
+    Caps wasted speculative calls to roughly `ratio` per query. Every query
+    deposits `ratio` tokens (up to `reserve`), starting a speculation spends
+    one and a hit refunds it.
+    """
+
+    def __init__(self, ratio: float, reserve: float = 5.0):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+
+    def deposit(self, amount: float | None = None) -> None:
+        self.tokens = min(self.reserve, self.tokens + (self.ratio if amount is None else amount))
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Speculation:
+    """One query's speculative get_docs call, waiting to be claimed by a matching tool call"""
+
+    def __init__(self, speculator: "Speculator", query: str, library: str, task: asyncio.Task):
+        self.speculator = speculator
+        self.library = library
+        self.words = self.topic_words(query)
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished_at: float | None = None
+        self.claimed = False
+        self.done = False
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self.finished_at = time.perf_counter()
+        if not task.cancelled() and task.exception() is not None:
+            self.speculator.failed += 1
+
+    def topic_words(self, query: str) -> set[str]:
+        """Normalised words of a query, without the library's name"""
+        parts = [part for part in re.split(r"[-_ ]", self.library.lower()) if part]
+        return set(normalize_query(query).split()) - {*parts, "".join(parts)}
+
+    def matches(self, tool_name: str, arguments: dict) -> bool:
+        """
+        The model asked for the same library with (nearly) the user's question:
+        only words from it, and at least MATCH_COVERAGE of its topic words. A
+        narrower query ("Chroma" for "persist Chroma DB and add a retriever")
+        wants docs the speculative call may not have fetched.
+        """
+        if tool_name != "get_docs" or arguments.get("library") != self.library:
+            return False
+        words = self.topic_words(str(arguments.get("query", "")))
+        return bool(words) and words <= self.words and len(words) >= MATCH_COVERAGE * len(self.words)
+
+    def claim(self, tool_name: str, arguments: dict) -> asyncio.Task | None:
+        """Hand over the speculative call if it matches this tool call (once)"""
+        if self.claimed or self.done or not self.matches(tool_name, arguments):
+            return None
+        if self.task.done() and (self.task.cancelled() or self.task.exception() is not None):
+            return None
+        self.claimed = True
+        now = time.perf_counter()
+        # Latency saved: the part of the call that ran before the model asked for it
+        finished = self.finished_at if self.finished_at is not None else now
+        self.speculator.hits += 1
+        self.speculator.saved_seconds += min(finished, now) - self.started
+        self.speculator.budget.deposit(1)
+        return self.task
+
+    def finish(self) -> None:
+        """Cancel the call if no tool call claimed it; safe to call more than once"""
+        if self.done:
+            return
+        self.done = True
+        if not self.claimed:
+            self.speculator.wasted += 1
+            self.task.cancel()
+
+
+class Speculator:
+    """
+    Optional speculative docs prefetch. When the question names exactly one
+    supported library, get_docs for it starts concurrently with the first
+    LLM call and is handed over if the model asks for a matching call.
+    Shared by all pooled clients so the budget and metrics are process-wide.
+    """
+
+    def __init__(self, enabled: bool, waste_ratio: float, reserve: float = 5.0):
+        self.enabled = enabled
+        self.budget = SpeculationBudget(waste_ratio, reserve)
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.failed = 0
+        self.no_guess = 0
+        self.over_budget = 0
+        self.saved_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Speculator":
+        return cls(
+            enabled=os.getenv("MCP_SPECULATIVE_DOCS", "false").lower() in ("1", "true", "yes"),
+            waste_ratio=float(os.getenv("MCP_SPECULATION_WASTE_RATIO", "0.5")),
+        )
+
+    @staticmethod
+    def guess_library(query: str, libraries: list[str]) -> str | None:
+        """The only library the query names ("llama-index", "llamaindex" and "llama index" all count)"""
+        text = query.lower()
+        found = []
+        for library in libraries:
+            parts = [re.escape(part) for part in re.split(r"[-_ ]", library.lower()) if part]
+            if re.search(r"\b" + r"[-_ ]?".join(parts) + r"\b", text):
+                found.append(library)
+        return found[0] if len(found) == 1 else None
+
+    def start(
+        self,
+        query: str,
+        libraries: list[str],
+        call: Callable[[dict], Awaitable],
+    ) -> Speculation | None:
+        """Start get_docs for the query's library, if it names one and the budget allows"""
+        if not self.enabled:
+            return None
+        self.budget.deposit()
+        library = self.guess_library(query, libraries)
+        if library is None:
+            self.no_guess += 1
+            return None
+        if not self.budget.withdraw():
+            self.over_budget += 1
+            return None
+        self.started += 1
+        task = asyncio.ensure_future(call({"query": query, "library": library}))
+        return Speculation(self, query, library, task)
+
+    def stats(self) -> dict:
+        settled = self.hits + self.wasted
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "failed": self.failed,
+            "no_library_guess": self.no_guess,
+            "over_budget": self.over_budget,
+            "hit_rate": round(self.hits / settled, 4) if settled else 0.0,
+            "latency_saved_seconds": round(self.saved_seconds, 3),
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
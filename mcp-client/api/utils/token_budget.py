@@ -0,0 +1,98 @@
+import re
+
+# Rough chars-per-token ratio for English text and JSON; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+COMPACTED_PREFIX = "[compacted] "
+
+_WORD_RE = re.compile(r"[a-z0-9_]{3,}")
+_SOURCE_RE = re.compile(r"^--- Content from .* ---$")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_message_tokens(message) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(str(message.get("content") or ""))
+    for tool_call in message.get("tool_calls") or []:
+        tokens += estimate_tokens(tool_call["function"]["name"] + tool_call["function"]["arguments"])
+    return tokens
+
+
+def extract_relevant(text: str, query: str, max_chars: int, chunk_chars: int = 300) -> str:
+    """
+    Keep the chunks of a tool output that share the most words with the query,
+    in their original order, within max_chars. Source headers are always kept.
+    """
+    if len(text) <= max_chars:
+        return text
+
+    terms = set(_WORD_RE.findall(query.lower()))
+    chunks, current = [], []
+    for line in text.split("\n"):
+        if _SOURCE_RE.match(line.strip()):
+            if current:
+                chunks.append("\n".join(current))
+            chunks.append(line)
+            current = []
+            continue
+        current.append(line)
+        if sum(len(current_line) for current_line in current) >= chunk_chars:
+            chunks.append("\n".join(current))
+            current = []
+    if current:
+        chunks.append("\n".join(current))
+
+    def score(chunk):
+        if _SOURCE_RE.match(chunk.strip()):
+            return float("inf")
+        words = _WORD_RE.findall(chunk.lower())
+        return sum(1 for w in words if w in terms) / (len(words) ** 0.5 or 1)
+
+    ranked = sorted(range(len(chunks)), key=lambda i: score(chunks[i]), reverse=True)
+    keep, used = set(), 0
+    for i in ranked:
+        if used + len(chunks[i]) > max_chars:
+            continue
+        keep.add(i)
+        used += len(chunks[i]) + 1
+    return "\n".join(chunks[i] for i in sorted(keep))
+
+
+class TokenBudget:
+    """
+    Keeps a conversation's estimated prompt size under `max_prompt_tokens` by
+    compacting older tool results in place, oldest first.
+
+    The most recent `keep_recent` tool results are never touched. Older ones
+    are first reduced to their query-relevant chunks (`compacted_chars`), then
+    truncated to `min_chars` if the prompt is still over budget.
+    """
+
+    def __init__(self, max_prompt_tokens: int, keep_recent: int, compacted_chars: int, min_chars: int = 200):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.keep_recent = keep_recent
+        self.compacted_chars = compacted_chars
+        self.min_chars = min_chars
+
+    def compact(self, conversation, query: str, fixed_tokens: int = 0) -> int:
+        """Compact tool results until the prompt fits; returns how many messages changed"""
+        if conversation.prompt_tokens() + fixed_tokens <= self.max_prompt_tokens:
+            return 0
+
+        tool_indexes = [i for i, m in enumerate(conversation.messages) if m["role"] == "tool"]
+        candidates = tool_indexes[:-self.keep_recent] if self.keep_recent else tool_indexes
+        changed = 0
+        for max_chars in (self.compacted_chars, self.min_chars):
+            for i in candidates:
+                if conversation.prompt_tokens() + fixed_tokens <= self.max_prompt_tokens:
+                    return changed
+                message = conversation.messages[i]
+                content = message["content"].removeprefix(COMPACTED_PREFIX)
+                if len(content) <= max_chars:
+                    continue
+                reduced = extract_relevant(content, query, max_chars) if max_chars == self.compacted_chars else content[:max_chars]
+                conversation.replace(i, {**message, "content": COMPACTED_PREFIX + reduced})
+                changed += 1
+        return changed
@@ -0,0 +1,269 @@
+"""
+Span tracing with per-stage latency histograms.
+
+Spans carry W3C trace context (trace id, span id) in a contextvar, so nested
+spans and tasks started inside a span join the same trace. Every finished
+span is observed into a histogram named after the span; the histograms back
+the Prometheus `/metrics` endpoint. Finished spans are also handed to an
+exporter, chosen with TRACE_EXPORTER:
+
+* `none` (default) - histograms only
+* `memory` - keep the last TRACE_BUFFER_SIZE spans for inspection
+* `otel` - mirror spans to OpenTelemetry when `opentelemetry-api` is
+  installed; an SDK must be configured for them to leave the process
+
+mcp-server and mcp-client/api each ship a copy; keep them in sync
+(mcp-server/tests/test_shared_copies.py fails when they differ).
+"""
+import bisect
+import functools
+import inspect
+import os
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+
+try:
+    from opentelemetry import context as otel_context, trace as otel_trace
+except ImportError:  # optional
+    otel_context = otel_trace = None
+
+# Seconds; wide enough for both a cache hit and a slow LLM turn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, value: str | None) -> "SpanContext | None":
+        """Parse a W3C `traceparent` header; None if missing or malformed"""
+        parts = (value or "").strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16), int(parts[2], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2])
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start: float
+    duration: float = 0.0
+    error: str | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    def merge(self, snapshot: dict) -> None:
+        """Add another histogram's snapshot (same buckets) into this one"""
+        if tuple(snapshot["buckets"]) != self.buckets:
+            raise ValueError("Histogram buckets differ")
+        self.counts = [a + b for a, b in zip(self.counts, snapshot["counts"])]
+        self.sum += snapshot["sum"]
+        self.count += snapshot["count"]
+
+
+_current: ContextVar[SpanContext | None] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    def __init__(self, service: str, exporter: str = "none", buffer_size: int = 1000):
+        self.service = service
+        self.exporter = exporter
+        self.histograms: dict[str, Histogram] = {}
+        self.spans: deque[Span] = deque(maxlen=buffer_size)
+        self._otel = otel_trace.get_tracer(service) if exporter == "otel" and otel_trace is not None else None
+
+    @classmethod
+    def from_env(cls, service: str) -> "Tracer":
+        return cls(
+            service,
+            exporter=os.getenv("TRACE_EXPORTER", "none"),
+            buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "1000")),
+        )
+
+    @staticmethod
+    def current() -> SpanContext | None:
+        return _current.get()
+
+    def traceparent(self) -> str | None:
+        """Header value for propagating the current span to another process"""
+        context = _current.get()
+        return context.traceparent if context is not None else None
+
+    @contextmanager
+    def span(
+        self, name: str, parent: SpanContext | None = None, activate: bool = True, **attributes
+    ) -> Iterator[Span]:
+        """
+        Time a block as a span. The parent is the current span unless an
+        explicit (e.g. remote) parent is given; otherwise a new trace starts.
+        With `activate=False` the span doesn't become the current one.
+        """
+        remote = parent is not None
+        parent = parent or _current.get()
+        otel_span = self._start_otel(name, parent, remote, attributes)
+        # A recording OTel span brings its own ids; using them keeps the
+        # traceparent we send and the exported tree the same
+        ids = self._otel_ids(otel_span)
+        span = Span(
+            name=name,
+            trace_id=ids[0] if ids else parent.trace_id if parent else secrets.token_hex(16),
+            span_id=ids[1] if ids else secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start=time.time(),
+            attributes=attributes,
+        )
+        token = _current.set(SpanContext(span.trace_id, span.span_id)) if activate else None
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            if token is not None:
+                try:
+                    _current.reset(token)
+                except ValueError:
+                    # Async generators may be finalized in another context
+                    pass
+            self._finish(span, otel_span)
+
+    def traced(self, name: str, parent: Callable[[], SpanContext | None] | None = None):
+        """
+        Decorator running an async function (or async generator) inside a
+        span. `parent` is called per invocation to pick up a remote parent.
+        """
+        def decorator(fn):
+            if inspect.isasyncgenfunction(fn):
+                @functools.wraps(fn)
+                async def generator_wrapper(*args, **kwargs):
+                    # An async generator runs in its consumer's context, so the
+                    # span is only current while the generator itself is running
+                    with self.span(name, parent=parent() if parent else None, activate=False) as span:
+                        context = SpanContext(span.trace_id, span.span_id)
+                        iterator = fn(*args, **kwargs)
+                        try:
+                            while True:
+                                token = _current.set(context)
+                                try:
+                                    item = await iterator.__anext__()
+                                except StopAsyncIteration:
+                                    break
+                                finally:
+                                    _current.reset(token)
+                                yield item
+                        finally:
+                            token = _current.set(context)
+                            try:
+                                await iterator.aclose()
+                            finally:
+                                _current.reset(token)
+                return generator_wrapper
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with self.span(name, parent=parent() if parent else None):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _start_otel(self, name: str, parent: SpanContext | None, remote: bool, attributes: dict):
+        if self._otel is None:
+            return None
+        if parent is None:
+            # A root: a fresh context, so no ambient OTel span becomes its parent
+            context = otel_context.Context()
+        else:
+            context = otel_trace.set_span_in_context(otel_trace.NonRecordingSpan(otel_trace.SpanContext(
+                trace_id=int(parent.trace_id, 16),
+                span_id=int(parent.span_id, 16),
+                is_remote=remote,
+                trace_flags=otel_trace.TraceFlags(otel_trace.TraceFlags.SAMPLED),
+            )))
+        return self._otel.start_span(name, context=context, attributes=attributes)
+
+    @staticmethod
+    def _otel_ids(otel_span) -> tuple[str, str] | None:
+        """Hex trace and span id of a recording OTel span (None without an SDK)"""
+        if otel_span is None or not otel_span.is_recording():
+            return None
+        context = otel_span.get_span_context()
+        return format(context.trace_id, "032x"), format(context.span_id, "016x")
+
+    def _finish(self, span: Span, otel_span) -> None:
+        histogram = self.histograms.get(span.name)
+        if histogram is None:
+            histogram = self.histograms[span.name] = Histogram()
+        histogram.observe(span.duration)
+        if self.exporter == "memory":
+            self.spans.append(span)
+        if otel_span is not None:
+            if span.error:
+                otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, span.error))
+            otel_span.end()
+
+    def snapshot(self) -> dict[str, dict]:
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+    def recent_spans(self, trace_id: str | None = None) -> list[dict]:
+        return [s.to_dict() for s in self.spans if trace_id is None or s.trace_id == trace_id]
+
+
+def render_prometheus(metric: str, help_text: str, series: dict[tuple[tuple[str, str], ...], Histogram]) -> str:
+    """Prometheus text exposition of histograms keyed by their label pairs"""
+    lines = [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+    for labels, histogram in series.items():
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum{{{label_text}}} {histogram.sum}")
+        lines.append(f"{metric}_count{{{label_text}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,95 @@
+"""
+CPU cost of building the LLM request body on every turn of a long agent loop.
+
+Compares the previous approach (copy every message into a fresh list and
+JSON-encode the whole payload, tools included, each turn) with the
+incremental Conversation + pre-encoded tools block.
+
+    python benchmarks/bench_payload.py --turns 50 --tool-output-chars 6000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
+from utils.llm_payload import Conversation, build_body, dumps, orjson, to_provider_message  # noqa: E402
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": f"tool_{i}",
+            "description": "Search the latest docs for a given query and library. " * 4,
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string"}, "library": {"type": "string"}},
+                "required": ["query", "library"],
+            },
+        },
+    }
+    for i in range(5)
+]
+
+
+def turn_messages(turn: int, tool_output_chars: int):
+    tool_call = {
+        "id": f"call_{turn}",
+        "type": "function",
+        "function": {"name": "tool_0", "arguments": json.dumps({"query": f"q{turn}", "library": "langchain"})},
+    }
+    return [
+        {"role": "assistant", "content": "", "tool_calls": [tool_call]},
+        {"role": "tool", "content": "x" * tool_output_chars, "tool_call_id": f"call_{turn}"},
+    ]
+
+
+def rebuild_each_turn(turns: int, tool_output_chars: int) -> int:
+    messages = [{"role": "user", "content": "question"}]
+    total = 0
+    for turn in range(turns):
+        payload = {
+            "model": "openai/gpt-4o",
+            "messages": [to_provider_message(m) for m in messages],
+            "max_tokens": 1000,
+            "tools": TOOLS,
+            "tool_choice": None,
+        }
+        total += len(json.dumps(payload).encode())
+        messages.extend(turn_messages(turn, tool_output_chars))
+    return total
+
+
+def incremental(turns: int, tool_output_chars: int) -> int:
+    settings = dumps({"model": "openai/gpt-4o", "max_tokens": 1000})
+    tools = dumps(TOOLS)
+    conversation = Conversation([{"role": "user", "content": "question"}])
+    total = 0
+    for turn in range(turns):
+        total += len(build_body(settings, tools, conversation))
+        conversation.extend(turn_messages(turn, tool_output_chars))
+    return total
+
+
+def timed(fn, args, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(args.turns, args.tool_output_chars)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--tool-output-chars", type=int, default=6000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    before = timed(rebuild_each_turn, args, args.repeat)
+    after = timed(incremental, args, args.repeat)
+    print(f"{args.turns}-turn conversation, {args.tool_output_chars}-char tool outputs, encoder={'orjson' if orjson else 'json'}")
+    print(f"rebuild each turn  {before:8.2f}ms total  {before / args.turns:6.3f}ms/turn")
+    print(f"incremental        {after:8.2f}ms total  {after / args.turns:6.3f}ms/turn")
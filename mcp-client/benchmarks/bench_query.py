@@ -0,0 +1,155 @@
+"""
+Offline benchmark of the FastAPI `/query` path, emitted as JSON.
+
+Starts the real API (uvicorn, session pool, MCP server subprocesses) in
+process, with the LLM replaced by fake_llm.py over HTTP or the in-process
+mock provider, then fires `--requests` queries at each `--concurrency`
+level and reports throughput and latency percentiles.
+
+    python benchmarks/bench_query.py --concurrency 1 8 32 --output results/query.json
+    python benchmarks/bench_query.py --llm mock --pool-size 4
+
+Together with mcp-server/benchmarks/bench_tools.py this covers the agent
+pipeline end to end; every timing is in milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from fake_llm import start_fake_llm
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+DEFAULT_SERVER = os.path.join(os.path.dirname(os.path.dirname(API_DIR)), "mcp-server", "server.py")
+sys.path.insert(0, API_DIR)
+
+
+def summarize(timings: list[float]) -> dict:
+    """Latency percentiles in milliseconds"""
+    if not timings:
+        return {"count": 0}
+    ordered = sorted(timings)
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+    statuses: dict[str, int] = {}
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/query", json={"query": f"question {i}"})
+            elapsed = time.perf_counter() - start
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code == 200:
+                timings.append(elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": statuses,
+        "throughput_rps": round(len(timings) / wall, 2),
+        "latency": summarize(timings),
+    }
+
+
+async def main(args):
+    runner = None
+    if args.llm == "mock":
+        os.environ["LLM_PROVIDER"] = "mock"
+        os.environ["MOCK_LLM_LATENCY"] = str(args.llm_latency)
+    else:
+        runner, os.environ["LLM_API_URL"] = await start_fake_llm(args.llm_latency)
+    os.environ["SERVER_SCRIPT_PATH"] = args.server
+    os.environ["MCP_POOL_SIZE"] = str(args.pool_size)
+    os.environ["MCP_POOL_MAX_WAITERS"] = str(max(args.concurrency) * 2)
+
+    import uvicorn
+    from main import app
+    from utils.logger import logger
+
+    logger.setLevel(logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve.done():
+            serve.result()
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    levels = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120.0, limits=limits) as client:
+            await client.post("/query", json={"query": "warm-up"})
+            for concurrency in args.concurrency:
+                levels.append(await run_level(client, args.requests, concurrency))
+    finally:
+        server.should_exit = True
+        await serve
+        if runner is not None:
+            await runner.cleanup()
+
+    return {
+        "suite": "mcp-client",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "llm": args.llm,
+            "llm_latency_s": args.llm_latency,
+            "pool_size": args.pool_size,
+            "requests_per_level": args.requests,
+        },
+        "results": {"query": levels},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="Path to the MCP server script")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--llm", choices=["http", "mock"], default="http", help="fake_llm.py over HTTP or the in-process mock")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+    args.server = os.path.abspath(args.server)
+    output = os.path.abspath(args.output) if args.output else None
+    # Conversation logs and client logs are written to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="mcp-bench-"))
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,136 @@
+"""
+Cold-start benchmark of the FastAPI app, emitted as JSON.
+
+Reports the import time of `main` (best of `--runs`, from
+`python -X importtime`) with its slowest direct imports. It then starts
+the API with uvicorn in a subprocess, using the mock LLM provider and a
+pool of MCP server subprocesses, and times how long `/live` and `/ready`
+take to answer 200. The API's startup phases come from the `/ready` body.
+
+    python benchmarks/bench_startup.py --pool-size 4
+    python benchmarks/bench_startup.py --max-import-ms 1200
+
+With `--max-import-ms` the script exits non-zero when the import time goes
+over budget, so CI can catch a heavy import creeping back in.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+DEFAULT_SERVER = os.path.join(os.path.dirname(os.path.dirname(API_DIR)), "mcp-server", "server.py")
+
+
+def import_profile(module: str, cwd: str, env: dict, runs: int, top: int) -> dict:
+    """Fastest of `runs` fresh imports of `module`, with the slowest modules it imports directly"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True,
+        )
+        # "import time: self [us] | cumulative | imported package"; a module's
+        # imports are listed before it, indented two more spaces
+        children, total = {}, 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 1:
+                children[name.strip()] = int(cumulative)
+            elif depth == 0:
+                if name.strip() == module:
+                    total = int(cumulative)
+                    break
+                children = {}
+        if best is None or total < best[0]:
+            best = (total, children)
+    total, modules = best
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total / 1000, 1),
+        "slowest": {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def api_startup(env: dict, timeout: float) -> dict:
+    """Seconds from spawning uvicorn until /live and /ready answer 200"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", API_DIR,
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    results = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            while "ready_s" not in results:
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError(f"API not ready after {timeout}s")
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+                try:
+                    if "live_s" not in results and client.get("/live").status_code == 200:
+                        results["live_s"] = round(time.perf_counter() - start, 3)
+                    response = client.get("/ready")
+                    if response.status_code == 200:
+                        results["ready_s"] = round(time.perf_counter() - start, 3)
+                        results["ready"] = response.json()
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def main(args) -> dict:
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "mock",
+        "SERVER_SCRIPT_PATH": args.server,
+        "MCP_POOL_SIZE": str(args.pool_size),
+    }
+    return {
+        "suite": "mcp-client-startup",
+        "python": sys.version.split()[0],
+        "config": {"pool_size": args.pool_size, "warmup": env.get("WARMUP", "false")},
+        "import": import_profile("main", API_DIR, env, args.runs, args.top),
+        "api": api_startup(env, args.timeout),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="Path to the MCP server script")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh imports to take the best of")
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to report")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for /ready")
+    parser.add_argument("--max-import-ms", type=float, help="Exit with status 1 if importing takes longer")
+    args = parser.parse_args()
+    args.server = os.path.abspath(args.server)
+    # Conversation logs and client logs are written to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="mcp-bench-"))
+
+    report = main(args)
+    print(json.dumps(report, indent=2))
+    if args.max_import_ms is not None and report["import"]["total_ms"] > args.max_import_ms:
+        print(f"Import took {report['import']['total_ms']}ms, over the {args.max_import_ms}ms budget", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,74 @@
+"""
+Time to first token of MCPClient.process_query_stream versus the total time
+of the blocking process_query, against the fake streaming LLM.
+
+    python benchmarks/bench_stream.py --runs 10 --latency 0.3 --token-delay 0.02
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm import start_fake_llm
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+DEFAULT_SERVER = os.path.join(os.path.dirname(os.path.dirname(API_DIR)), "mcp-server", "server.py")
+sys.path.insert(0, API_DIR)
+
+
+async def main(args):
+    runner, os.environ["LLM_API_URL"] = await start_fake_llm(args.latency, args.token_delay)
+
+    from client import MCPClient
+    from utils.logger import logger
+    from utils.conversation_log import conversation_log
+
+    logger.setLevel(logging.WARNING)
+    client = MCPClient()
+    blocking, first_token, first_event, streamed = [], [], [], []
+    try:
+        await client.connect_to_server(args.server)
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            await client.process_query("Which libraries are supported?")
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            seen_event = seen_token = False
+            async for event in client.process_query_stream("Which libraries are supported?"):
+                if not seen_event:
+                    first_event.append(time.perf_counter() - start)
+                    seen_event = True
+                if event["type"] == "token" and not seen_token:
+                    first_token.append(time.perf_counter() - start)
+                    seen_token = True
+            streamed.append(time.perf_counter() - start)
+    finally:
+        await client.cleanup()
+        await runner.cleanup()
+        conversation_log.close()
+
+    def ms(values):
+        return statistics.median(values) * 1000
+
+    print(f"{args.runs} runs (median)")
+    print(f"/query         full response  {ms(blocking):8.1f}ms")
+    print(f"/query/stream  first event    {ms(first_event):8.1f}ms")
+    print(f"/query/stream  first token    {ms(first_token):8.1f}ms")
+    print(f"/query/stream  full response  {ms(streamed):8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="Path to the MCP server script")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+    args.server = os.path.abspath(args.server)
+    os.chdir(tempfile.mkdtemp(prefix="mcp-bench-"))
+    asyncio.run(main(args))
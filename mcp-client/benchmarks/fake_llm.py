@@ -0,0 +1,103 @@
+"""
+Fake OpenAI-compatible chat completions server for offline testing.
+
+The first turn of a conversation asks for the `list_supported_libraries`
+tool; once a tool result is present it answers in plain text. Both
+`stream: false` and `stream: true` (SSE chunks, like OpenRouter) are
+supported. `--error-rate` answers that fraction of requests with a 429 or
+503 instead, to exercise client retries and circuit breaking.
+
+    python benchmarks/fake_llm.py --port 9000 --latency 0.3 --token-delay 0.02
+    LLM_API_URL=http://127.0.0.1:9000/v1/chat/completions uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+ANSWER = "The docs server supports langchain, llama-index, openai, mcp and huggingface."
+
+
+def make_fake_llm(latency: float = 0.05, token_delay: float = 0.0, error_rate: float = 0.0) -> web.Application:
+    """`latency` is the time to the first byte, `token_delay` the gap between streamed tokens"""
+
+    def next_message(body: dict) -> dict:
+        if body["messages"][-1]["role"] == "user":
+            return {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": "list_supported_libraries", "arguments": "{}"},
+                }],
+            }
+        return {"role": "assistant", "content": ANSWER}
+
+    def usage(body: dict, message: dict) -> dict:
+        prompt_tokens = len(json.dumps(body["messages"])) // 4
+        completion_tokens = len(message["content"]) // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def stream_message(request: web.Request, body: dict, message: dict) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+
+        async def send(delta: dict):
+            chunk = {"choices": [{"index": 0, "delta": delta}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        for i, call in enumerate(message.get("tool_calls", [])):
+            await send({"tool_calls": [{"index": i, "id": call["id"], "type": "function",
+                                        "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            await send({"tool_calls": [{"index": i, "function": {"arguments": call["function"]["arguments"]}}]})
+        for token in message["content"].split(" ") if message["content"] else []:
+            await send({"content": token + " "})
+            await asyncio.sleep(token_delay)
+        await response.write(f"data: {json.dumps({'choices': [], 'usage': usage(body, message)})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            if random.random() < 0.5:
+                return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "0.1"})
+            return web.json_response({"error": "overloaded"}, status=503)
+        message = next_message(body)
+        if body.get("stream"):
+            return await stream_message(request, body, message)
+        return web.json_response({"choices": [{"message": message}], "usage": usage(body, message)})
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+async def start_fake_llm(latency: float = 0.05, token_delay: float = 0.0, port: int = 0, error_rate: float = 0.0):
+    """Start the fake server in the running loop; returns (runner, chat completions URL)"""
+    runner = web.AppRunner(make_fake_llm(latency, token_delay, error_rate))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(make_fake_llm(args.latency, args.token_delay, args.error_rate), host="127.0.0.1", port=args.port)
@@ -0,0 +1,108 @@
+"""
+Throughput of concurrent queries through MCPClientPool at several pool sizes.
+
+Queries go through the real MCP server over stdio, but the LLM is the local
+fake from fake_llm.py: the first call asks for `list_supported_libraries`,
+the second returns a final answer, each after `--llm-latency` seconds.
+`--llm mock` uses the in-process MockProvider instead, taking HTTP to the
+LLM out of the measurement.
+
+    python benchmarks/loadtest_pool.py --pool-sizes 1 2 4 --requests 200 --concurrency 32
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm import start_fake_llm
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+DEFAULT_SERVER = os.path.join(os.path.dirname(os.path.dirname(API_DIR)), "mcp-server", "server.py")
+sys.path.insert(0, API_DIR)
+
+
+async def run_load(pool, requests: int, concurrency: int) -> dict:
+    from pool import PoolSaturatedError, PoolTimeoutError
+
+    latencies = []
+    rejected = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with pool.acquire() as client:
+                    await client.process_query(f"question {i}")
+            except (PoolSaturatedError, PoolTimeoutError):
+                rejected += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "completed": len(latencies),
+        "rejected": rejected,
+        "throughput_rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+    }
+
+
+async def main(args):
+    runner = None
+    if args.llm == "mock":
+        os.environ["LLM_PROVIDER"] = "mock"
+        os.environ["MOCK_LLM_LATENCY"] = str(args.llm_latency)
+    else:
+        runner, os.environ["LLM_API_URL"] = await start_fake_llm(args.llm_latency)
+
+    from pool import MCPClientPool
+    from utils.logger import logger
+    from utils.conversation_log import conversation_log
+
+    logger.setLevel(logging.WARNING)
+
+    try:
+        for size in args.pool_sizes:
+            pool = MCPClientPool(size, max_waiters=args.max_waiters, acquire_timeout=args.acquire_timeout)
+            try:
+                await pool.start(args.server)
+                result = await run_load(pool, args.requests, args.concurrency)
+            finally:
+                await pool.cleanup()
+            print(
+                f"pool={size:<3} completed={result['completed']:<5} rejected={result['rejected']:<5} "
+                f"throughput={result['throughput_rps']:7.1f} req/s  "
+                f"p50={result['p50_ms']:7.1f}ms  p95={result['p95_ms']:7.1f}ms"
+            )
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        conversation_log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="Path to the MCP server script")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-waiters", type=int, default=64)
+    parser.add_argument("--acquire-timeout", type=float, default=30.0)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm", choices=["http", "mock"], default="http", help="fake_llm.py over HTTP or the in-process mock")
+    args = parser.parse_args()
+    args.server = os.path.abspath(args.server)
+    # Conversation logs and client logs are written to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="mcp-loadtest-"))
+    asyncio.run(main(args))
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests run offline against the in-process mock LLM
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("MOCK_LLM_LATENCY", "0")
+# The client writes mcp_client.log and its conversation log to the working directory
+os.environ.setdefault("CONVERSATION_LOG_DIR", os.path.join(tempfile.mkdtemp(), "conversations"))
+os.chdir(tempfile.mkdtemp())
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api"))
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,87 @@
+import pytest
+
+from utils.answer_cache import AnswerCache, is_cacheable, normalize_query
+
+
+def answer(text: str, tokens: int = 0) -> dict:
+    return {
+        "messages": [{"role": "assistant", "content": text}],
+        "usage": {"turns": [{"prompt_tokens": tokens, "completion_tokens": 0}]},
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr("utils.answer_cache.time.monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_normalize_query_drops_case_punctuation_and_filler():
+    assert normalize_query("How do I use the Chroma vector store?") == "chroma vector store"
+
+
+def test_rephrased_query_hits_and_counts_saved_tokens():
+    cache = AnswerCache(ttl=60, max_entries=8, threshold=0.85)
+    cache.put("How do I stream responses with OpenAI?", answer("Use stream=True", tokens=120))
+
+    assert cache.get("how to stream responses with openai")["messages"][0]["content"] == "Use stream=True"
+    assert cache.get("stream responses from the openai api") is not None
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["llm_tokens_saved"]) == (2, 1, 240)
+
+
+def test_different_question_misses():
+    cache = AnswerCache(ttl=60, max_entries=8, threshold=0.85)
+    cache.put("langchain chroma persist directory", answer("persist_directory"))
+
+    assert cache.get("llama-index query engine streaming") is None
+    assert cache.get("") is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_entries_expire(clock):
+    cache = AnswerCache(ttl=60, max_entries=8, threshold=0.85)
+    cache.put("chroma persist directory", answer("a"))
+    clock.now += 61
+
+    assert cache.get("chroma persist directory") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_oldest_entry_is_overwritten_when_full():
+    cache = AnswerCache(ttl=60, max_entries=2, threshold=0.85)
+    cache.put("chroma persist directory", answer("a"))
+    cache.put("llama-index query engine", answer("b"))
+    cache.put("huggingface tokenizer padding", answer("c"))
+
+    assert cache.get("chroma persist directory") is None
+    assert cache.get("llama-index query engine")["messages"][0]["content"] == "b"
+    assert cache.get("huggingface tokenizer padding")["messages"][0]["content"] == "c"
+
+
+def test_only_plain_answers_are_cacheable():
+    assert is_cacheable(answer("done"))
+    assert not is_cacheable({"messages": []})
+    assert not is_cacheable({"messages": [{"role": "assistant", "content": "", "tool_calls": [{}]}]})
+    assert not is_cacheable({"messages": [{"role": "tool", "content": "page"}]})
+
+
+def test_negated_question_does_not_reuse_the_answer():
+    cache = AnswerCache(ttl=60, max_entries=8, threshold=0.85)
+    cache.put("stream responses openai", answer("Use stream=True"))
+
+    assert cache.get("not stream responses openai") is None
+    assert cache.get("how do I stream responses without openai") is None
+    assert cache.get("stream responses from the openai api") is not None
+
+
+def test_negated_entries_match_each_other():
+    cache = AnswerCache(ttl=60, max_entries=8, threshold=0.85)
+    cache.put("stream responses openai", answer("stream"))
+    cache.put("don't stream responses openai", answer("no stream"))
+
+    assert normalize_query("Don't stream") == "not stream"
+    assert cache.get("do not stream responses from the openai api")["messages"][0]["content"] == "no stream"
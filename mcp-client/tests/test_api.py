@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from mcp import types
+from starlette.requests import ClientDisconnect
+
+import main
+from client import MCPClient
+from pool import MCPClientPool
+
+
+class FakePool:
+    """Lends one client and records when it comes back"""
+
+    def __init__(self, client, events: list[str]):
+        self.client = client
+        self.events = events
+
+    async def get(self):
+        return self.client
+
+    def put(self, client):
+        self.events.append("returned to pool")
+
+
+class EndlessClient:
+    """An agent loop that keeps streaming tokens until it is closed"""
+
+    def __init__(self, events: list[str]):
+        self.events = events
+
+    async def process_query_stream(self, query, options=None):
+        try:
+            while True:
+                yield {"type": "token", "content": "word "}
+                await asyncio.sleep(0)
+        finally:
+            self.events.append("agent loop closed")
+
+
+@pytest.fixture
+def app_state(monkeypatch):
+    """Pool and answer cache on app.state without running the lifespan"""
+    events = []
+    monkeypatch.setattr(main.app.state, "pool", FakePool(EndlessClient(events), events), raising=False)
+    monkeypatch.setattr(main.app.state, "answer_cache", None, raising=False)
+    return events
+
+
+@pytest.mark.anyio
+async def test_disconnect_closes_the_agent_loop_before_the_session_is_returned(app_state):
+    response = await main.process_query_stream(main.QueryRequest(query="Chroma persistence"), None, None)
+    sent = []
+
+    async def send(message):
+        if message["type"] == "http.response.body" and sent:
+            raise OSError("client went away")
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        await response(scope, None, send)
+
+    assert app_state == ["agent loop closed", "returned to pool"]
+
+
+class CatalogSession:
+    """Serves a tool list that the test can change"""
+
+    def __init__(self, names: list[str]):
+        self.names = names
+
+    async def list_tools(self):
+        schema = {"type": "object", "properties": {}}
+        return types.ListToolsResult(tools=[types.Tool(name=name, description=name, inputSchema=schema) for name in self.names])
+
+
+class ClientsPool:
+    def __init__(self, clients):
+        self.clients = clients
+
+
+@pytest.fixture
+async def catalog(monkeypatch):
+    """A connected client with a two-tool catalog behind /tools"""
+    session = CatalogSession(["get_docs", "list_supported_libraries"])
+    client = MCPClient()
+    client.session = session
+    await client.refresh_tools()
+    monkeypatch.setattr(main.app.state, "pool", ClientsPool([client]), raising=False)
+    return session, client
+
+
+@pytest.mark.anyio
+async def test_tools_answers_304_to_a_matching_etag(catalog):
+    api = TestClient(main.app)
+
+    first = api.get("/tools")
+    again = api.get("/tools", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.status_code == 200
+    assert [tool["name"] for tool in first.json()["tools"]] == ["get_docs", "list_supported_libraries"]
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert api.get("/tools", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+@pytest.mark.anyio
+async def test_tool_list_changed_notification_changes_the_etag(catalog):
+    session, client = catalog
+    api = TestClient(main.app)
+    etag = api.get("/tools").headers["ETag"]
+
+    session.names.append("get_docs_batch")
+    await client.handle_server_message(
+        types.ServerNotification(types.ToolListChangedNotification(method="notifications/tools/list_changed"))
+    )
+    await client.tools_refresh
+
+    changed = api.get("/tools", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert [tool["name"] for tool in changed.json()["tools"]][-1] == "get_docs_batch"
+
+
+class NotStarted:
+    """app.state.startup while the sessions are still connecting"""
+
+    def done(self):
+        return False
+
+    def cancelled(self):
+        return False
+
+
+@pytest.fixture
+def empty_pool(monkeypatch):
+    """A pool whose sessions haven't connected yet"""
+    def install(max_waiters: int) -> MCPClientPool:
+        pool = MCPClientPool(size=1, max_waiters=max_waiters, acquire_timeout=0.05)
+        monkeypatch.setattr(main.app.state, "pool", pool, raising=False)
+        monkeypatch.setattr(main.app.state, "startup", NotStarted(), raising=False)
+        monkeypatch.setattr(main.app.state, "answer_cache", None, raising=False)
+        return pool
+
+    return install
+
+
+@pytest.mark.parametrize("path", ["/query", "/query/stream"])
+def test_query_is_shed_with_429_when_the_wait_queue_is_full(empty_pool, path):
+    empty_pool(max_waiters=0)
+
+    response = TestClient(main.app).post(path, json={"query": "Chroma persistence"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "requests already waiting" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("path", ["/query", "/query/stream"])
+def test_query_gets_503_when_no_session_is_ready_in_time(empty_pool, path):
+    empty_pool(max_waiters=4)
+    api = TestClient(main.app)
+
+    response = api.post(path, json={"query": "Chroma persistence"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+    assert "No MCP session available" in response.json()["detail"]
+    ready = api.get("/ready")
+    assert ready.status_code == 503 and ready.json()["ready"] is False
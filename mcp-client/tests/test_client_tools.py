@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+import pytest
+from mcp import types
+from mcp.shared.exceptions import McpError
+
+from client import MCPClient
+from utils.llm_providers import MockProvider
+from utils.tracing import SpanContext
+
+
+class StubSession:
+    """Answers tools/call requests with the tool name and arguments, like a real session would over the wire"""
+
+    def __init__(self, delays: dict[str, float] | None = None):
+        self.delays = delays or {}
+        self.requests: list[dict] = []
+
+    async def send_request(self, request: types.ClientRequest, result_type):
+        # Serialized as the SDK would send it, so fields the wire format doesn't know fail here
+        wire = request.model_dump(by_alias=True, mode="json", exclude_none=True)
+        self.requests.append(wire)
+        params = wire["params"]
+        await asyncio.sleep(self.delays.get(params["name"], 0))
+        text = f"{params['name']}:{json.dumps(params.get('arguments'), sort_keys=True)}"
+        return result_type(content=[types.TextContent(type="text", text=text)])
+
+    async def list_tools(self):
+        schema = {"type": "object", "properties": {}}
+        return types.ListToolsResult(tools=[
+            types.Tool(name="list_supported_libraries", description="Libraries get_docs knows", inputSchema=schema),
+        ])
+
+
+class FailingSession(StubSession):
+    """Fails its first tools/call with the given MCP error code"""
+
+    def __init__(self, code: int):
+        super().__init__()
+        self.code = code
+
+    async def send_request(self, request: types.ClientRequest, result_type):
+        if not self.requests:
+            self.requests.append(request.model_dump(by_alias=True, mode="json", exclude_none=True))
+            raise McpError(types.ErrorData(code=self.code, message="boom"))
+        return await super().send_request(request, result_type)
+
+
+class ParallelCallsProvider(MockProvider):
+    """Asks for several tool calls in one turn, then answers"""
+
+    def __init__(self, tool_calls: list[tuple[str, dict]]):
+        super().__init__(latency=0)
+        self.tool_calls = tool_calls
+
+    def respond(self, body: bytes) -> tuple[dict, dict]:
+        if self.calls > 1:
+            return {"role": "assistant", "content": "Done."}, {}
+        return {
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [
+                {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+                for i, (name, args) in enumerate(self.tool_calls)
+            ],
+        }, {}
+
+
+def tool_call(call_id: str, name: str, arguments: dict | None = None) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments or {})}}
+
+
+def connected_client(session) -> MCPClient:
+    client = MCPClient()
+    client.session = session
+    client.connected.set()
+    return client
+
+
+@pytest.mark.anyio
+async def test_call_tool_sends_meta_on_the_wire():
+    session = StubSession()
+    client = connected_client(session)
+    traceparent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+    result = await client.call_tool("get_docs", {"query": "chroma", "library": "langchain"}, meta={"traceparent": traceparent})
+
+    assert result.content[0].text == 'get_docs:{"library": "langchain", "query": "chroma"}'
+    assert session.requests == [{
+        "method": "tools/call",
+        "params": {
+            "_meta": {"traceparent": traceparent},
+            "name": "get_docs",
+            "arguments": {"query": "chroma", "library": "langchain"},
+        },
+    }]
+
+
+@pytest.mark.anyio
+async def test_execute_tool_call_propagates_the_trace():
+    session = StubSession()
+    client = connected_client(session)
+    tool_call = {"id": "call_1", "type": "function", "function": {"name": "list_supported_libraries", "arguments": ""}}
+
+    message = await client.execute_tool_call(tool_call)
+
+    assert message == {"role": "tool", "content": "list_supported_libraries:{}", "tool_call_id": "call_1"}
+    sent = SpanContext.from_traceparent(session.requests[0]["params"]["_meta"]["traceparent"])
+    assert sent is not None
+
+
+@pytest.mark.anyio
+async def test_lost_session_is_retried_on_the_reconnected_one():
+    lost = FailingSession(types.CONNECTION_CLOSED)
+    fresh = StubSession()
+    client = connected_client(lost)
+
+    async def reconnect():
+        # What maintain_connection does once the disconnect is signalled
+        await client.disconnect.wait()
+        client.disconnect.clear()
+        client.session = fresh
+        client.connected.set()
+
+    reconnecting = asyncio.create_task(reconnect())
+    result = await client.call_tool("get_docs", {"query": "chroma", "library": "langchain"})
+    await reconnecting
+
+    assert result.content[0].text == 'get_docs:{"library": "langchain", "query": "chroma"}'
+    assert len(lost.requests) == 1 and len(fresh.requests) == 1
+
+
+@pytest.mark.anyio
+async def test_other_mcp_errors_are_not_retried():
+    session = FailingSession(types.INVALID_PARAMS)
+    client = connected_client(session)
+
+    with pytest.raises(McpError):
+        await client.call_tool("get_docs", {"query": "chroma"})
+
+    assert len(session.requests) == 1
+    assert client.connected.is_set() and not client.disconnect.is_set()
+
+
+@pytest.mark.anyio
+async def test_process_query_round_trip_with_the_mock_provider():
+    session = StubSession()
+    client = connected_client(session)
+    await client.refresh_tools()
+
+    result = await client.process_query("Which libraries are supported?")
+
+    roles = [m["role"] for m in result["messages"]]
+    assert roles == ["user", "assistant", "tool", "assistant"]
+    assert result["messages"][1]["tool_calls"][0]["function"]["name"] == "list_supported_libraries"
+    assert result["messages"][2] == {"role": "tool", "content": "list_supported_libraries:{}", "tool_call_id": "call_1"}
+    assert result["messages"][3]["content"].startswith("Mock answer to 'Which libraries are supported?' based on 1 tool rounds")
+    assert [r["params"]["name"] for r in session.requests] == ["list_supported_libraries"]
+    assert len(result["usage"]["turns"]) == 2 and result["usage"]["tool_calls"] == 1
+    assert all(turn["prompt_tokens"] for turn in result["usage"]["turns"])
+
+
+@pytest.mark.anyio
+async def test_parallel_tool_results_keep_the_call_order():
+    # The first call finishes last
+    session = StubSession(delays={"get_docs": 0.1, "list_supported_libraries": 0.01})
+    client = connected_client(session)
+    await client.refresh_tools()
+    client.provider = ParallelCallsProvider([
+        ("get_docs", {"query": "persist", "library": "chroma"}),
+        ("list_supported_libraries", {}),
+        ("get_docs", {"query": "agents", "library": "langchain"}),
+    ])
+
+    result = await client.process_query("Compare chroma and langchain")
+
+    tool_messages = [m for m in result["messages"] if m["role"] == "tool"]
+    assert [m["tool_call_id"] for m in tool_messages] == ["call_0", "call_1", "call_2"]
+    assert tool_messages[0]["content"] == 'get_docs:{"library": "chroma", "query": "persist"}'
+    assert tool_messages[2]["content"] == 'get_docs:{"library": "langchain", "query": "agents"}'
+    # They ran concurrently: the fast call was sent before the slow one returned
+    assert [r["params"]["name"] for r in session.requests][:2] == ["get_docs", "list_supported_libraries"]
+
+
+@pytest.mark.anyio
+async def test_tool_timeout_is_an_error_result_that_spares_the_other_calls():
+    # The other call outlives the timeout, so it would fail too if the timeout cancelled it
+    session = StubSession(delays={"get_docs": 5, "list_supported_libraries": 0.3})
+    client = connected_client(session)
+    client.tool_timeouts = {"get_docs": 0.1}
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    slow, fast = await asyncio.gather(
+        client.execute_tool_call(tool_call("call_1", "get_docs", {"query": "persist"})),
+        client.execute_tool_call(tool_call("call_2", "list_supported_libraries")),
+    )
+
+    assert loop.time() - start < 1
+    assert slow == {"role": "tool", "content": "Error: tool get_docs timed out after 0.1s", "tool_call_id": "call_1"}
+    assert fast == {"role": "tool", "content": "list_supported_libraries:{}", "tool_call_id": "call_2"}
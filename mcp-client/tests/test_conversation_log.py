@@ -0,0 +1,97 @@
+import glob
+import gzip
+import json
+import os
+import threading
+
+from utils.conversation_log import ConversationLog
+
+
+def make_log(tmp_path, **kwargs) -> ConversationLog:
+    return ConversationLog(
+        str(tmp_path / "conversations"),
+        kwargs.pop("max_bytes", 0),
+        kwargs.pop("compress", True),
+        kwargs.pop("flush_interval", 60.0),
+        **kwargs,
+    )
+
+
+def read_records(path: str) -> list[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def message(i: int) -> dict:
+    return {"role": "user", "content": f"question {i}"}
+
+
+def test_close_flushes_pending_records(tmp_path):
+    log = make_log(tmp_path)
+
+    log.write("c1", [message(0), {"role": "tool", "content": "docs", "tool_call_id": "call_1"}])
+    log.close()
+
+    assert log.path == str(tmp_path / "conversations" / f"conversations_{os.getpid()}.jsonl")
+    records = read_records(log.path)
+    assert [r["conversation_id"] for r in records] == ["c1", "c1"]
+    assert records[1]["message"] == {"role": "tool", "content": "docs", "tool_call_id": "call_1"}
+
+    # Writing again starts a new writer
+    log.write("c2", [message(1)])
+    log.close()
+    assert [r["conversation_id"] for r in read_records(log.path)] == ["c1", "c1", "c2"]
+
+
+def test_records_queued_while_writing_are_appended_in_batches(tmp_path):
+    log = make_log(tmp_path, batch_size=3)
+    batches = []
+    writing = threading.Event()
+    release = threading.Event()
+    append = log._append
+
+    def slow_append(batch):
+        batches.append([r["message"]["content"] for r in batch])
+        writing.set()
+        release.wait()
+        append(batch)
+
+    log._append = slow_append
+    log.write("c1", [message(0)])
+    writing.wait()
+    # Queued while the writer is busy with the first batch
+    log.write("c1", [message(i) for i in range(1, 6)])
+    release.set()
+    log.close()
+
+    assert batches == [["question 0"], ["question 1", "question 2", "question 3"], ["question 4", "question 5"]]
+    assert [r["message"]["content"] for r in read_records(log.path)] == [f"question {i}" for i in range(6)]
+
+
+def test_full_file_is_rotated_and_gzipped(tmp_path):
+    log = make_log(tmp_path, max_bytes=300)
+
+    for i in range(10):
+        log.write(f"c{i}", [message(i)])
+        log.close()
+
+    rotated = sorted(glob.glob(os.path.join(log.directory, f"conversations_{os.getpid()}_*.jsonl.gz")))
+    assert rotated
+    assert all(os.path.getsize(path) < 300 for path in rotated)
+    records = [r for path in rotated for r in read_records(path)]
+    if os.path.exists(log.path):
+        records += read_records(log.path)
+    # Nothing lost or duplicated across the rotations
+    assert sorted(r["conversation_id"] for r in records) == sorted(f"c{i}" for i in range(10))
+
+
+def test_rotation_without_compression_keeps_plain_files(tmp_path):
+    log = make_log(tmp_path, max_bytes=1, compress=False)
+
+    log.write("c1", [message(0)])
+    log.close()
+
+    [rotated] = glob.glob(os.path.join(log.directory, "conversations_*_*.jsonl"))
+    assert read_records(rotated)[0]["conversation_id"] == "c1"
+    assert not os.path.exists(log.path)
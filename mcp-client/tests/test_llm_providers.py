@@ -0,0 +1,122 @@
+import json
+import logging
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils.llm_providers import OpenAICompatibleProvider, QueryOptions
+from utils.outbound import Outbound
+
+logger = logging.getLogger("test-llm-providers")
+
+# A streamed tool call as an OpenAI-compatible server sends it: a keep-alive
+# comment, content tokens, arguments split mid-token, usage on its own chunk
+RECORDED_STREAM = [
+    ": OPENROUTER PROCESSING",
+    {"choices": [{"index": 0, "delta": {"role": "assistant", "content": "Let me "}}]},
+    {"choices": [{"index": 0, "delta": {"content": "check."}}]},
+    {"choices": [{"index": 0, "delta": {"tool_calls": [
+        {"index": 0, "id": "call_a", "type": "function", "function": {"name": "get_docs", "arguments": ""}},
+    ]}}]},
+    {"choices": [{"index": 0, "delta": {"tool_calls": [{"index": 0, "function": {"arguments": '{"query": "chr'}}]}}]},
+    {"choices": [{"index": 0, "delta": {"tool_calls": [
+        {"index": 1, "id": "call_b", "type": "function", "function": {"name": "list_supported", "arguments": "{}"}},
+    ]}}]},
+    {"choices": [{"index": 0, "delta": {"tool_calls": [{"index": 1, "function": {"name": "_libraries"}}]}}]},
+    {"choices": [{"index": 0, "delta": {"tool_calls": [
+        {"index": 0, "function": {"arguments": 'oma", "library": "langchain"}'}},
+    ]}}]},
+    {"choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls"}]},
+    {"choices": [], "usage": {"prompt_tokens": 120, "completion_tokens": 31, "total_tokens": 151}},
+    "[DONE]",
+]
+
+
+def sse(events) -> bytes:
+    lines = []
+    for event in events:
+        if isinstance(event, str) and event.startswith(":"):
+            lines.append(event)
+        else:
+            lines.append(f"data: {event if isinstance(event, str) else json.dumps(event)}")
+        lines.append("")
+    return "\n".join(lines).encode() + b"\n"
+
+
+@pytest.fixture
+async def completions_server():
+    """A chat completions endpoint replaying RECORDED_STREAM; collects request bodies"""
+    bodies = []
+
+    async def completions(request: web.Request) -> web.StreamResponse:
+        bodies.append(await request.json())
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        # Chunk boundaries that don't line up with SSE lines
+        payload = sse(RECORDED_STREAM)
+        for start in range(0, len(payload), 37):
+            await response.write(payload[start:start + 37])
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    server = TestServer(app)
+    await server.start_server()
+    yield str(server.make_url("/v1/chat/completions")), bodies
+    await server.close()
+
+
+@pytest.mark.anyio
+async def test_stream_assembles_split_tool_calls_and_usage(completions_server):
+    url, bodies = completions_server
+    provider = OpenAICompatibleProvider(url, "key", Outbound("test", base_delay=0, logger=logger), logger)
+    options = QueryOptions(model="test-model", max_tokens=100, timeout=5)
+    body = b'{"model":"test-model","stream":true,"messages":[{"role":"user","content":"chroma?"}]}'
+
+    try:
+        events = [event async for event in provider.stream(body, options)]
+    finally:
+        await provider.close()
+
+    assert events[:2] == [("delta", "Let me "), ("delta", "check.")]
+    assert events[2] == ("usage", {"prompt_tokens": 120, "completion_tokens": 31, "total_tokens": 151})
+    assert events[3] == ("message", {
+        "role": "assistant",
+        "content": "Let me check.",
+        "tool_calls": [
+            {
+                "id": "call_a",
+                "type": "function",
+                "function": {"name": "get_docs", "arguments": '{"query": "chroma", "library": "langchain"}'},
+            },
+            {"id": "call_b", "type": "function", "function": {"name": "list_supported_libraries", "arguments": "{}"}},
+        ],
+    })
+    assert len(events) == 4
+    assert bodies == [json.loads(body)]
+
+
+def test_query_options_merge_over_defaults():
+    defaults = QueryOptions(model="default", max_tokens=1000, timeout=120, max_iterations=5, max_tool_calls=10)
+
+    merged = QueryOptions(model="small", temperature=0.0, max_tool_calls=2).merged(defaults)
+
+    assert merged == QueryOptions(
+        model="small", max_tokens=1000, temperature=0.0, timeout=120, max_iterations=5, max_tool_calls=2
+    )
+    assert QueryOptions().merged(defaults) == defaults
+
+
+def test_query_options_encode_settings():
+    options = QueryOptions(model="m", max_tokens=50)
+
+    assert json.loads(options.encode_settings(stream=False)) == {"model": "m", "max_tokens": 50}
+    assert json.loads(QueryOptions(model="m", max_tokens=50, temperature=0.2).encode_settings(stream=True)) == {
+        "model": "m",
+        "max_tokens": 50,
+        "temperature": 0.2,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from utils.speculation import SpeculationBudget, Speculator
+
+LIBRARIES = ["langchain", "llama-index", "openai"]
+
+
+class FakeGetDocs:
+    """Stands in for the session's get_docs call"""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.cancelled = 0
+
+    async def __call__(self, arguments: dict):
+        self.calls.append(arguments)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"docs for {arguments['query']}"
+
+
+@pytest.mark.parametrize("query, library", [
+    ("How do I persist Chroma with LangChain?", "langchain"),
+    ("llamaindex query engine streaming", "llama-index"),
+    ("Llama Index vector store", "llama-index"),
+    ("compare langchain and llama-index agents", None),
+    ("how do I write a retriever", None),
+])
+def test_guess_library(query, library):
+    assert Speculator.guess_library(query, LIBRARIES) == library
+
+
+@pytest.mark.anyio
+async def test_matching_tool_call_claims_the_prefetch():
+    speculator = Speculator(enabled=True, waste_ratio=0.5)
+    get_docs = FakeGetDocs(delay=0.05)
+    speculation = speculator.start("How do I persist Chroma DB with langchain?", LIBRARIES, get_docs)
+
+    await asyncio.sleep(0.06)
+    task = speculation.claim("get_docs", {"query": "Chroma DB persist", "library": "langchain"})
+    speculation.finish()
+
+    assert await task == "docs for How do I persist Chroma DB with langchain?"
+    assert get_docs.calls == [{"query": "How do I persist Chroma DB with langchain?", "library": "langchain"}]
+    stats = speculator.stats()
+    assert (stats["started"], stats["hits"], stats["wasted"]) == (1, 1, 0)
+    assert stats["latency_saved_seconds"] >= 0.04
+
+
+@pytest.mark.anyio
+async def test_narrower_query_does_not_claim_the_prefetch():
+    speculator = Speculator(enabled=True, waste_ratio=0.5)
+    speculation = speculator.start(
+        "How do I persist Chroma DB and add a retriever with langchain?", LIBRARIES, FakeGetDocs(delay=10)
+    )
+    await asyncio.sleep(0)
+
+    # Only words from the question, but a fraction of what it asks about
+    assert speculation.claim("get_docs", {"query": "retriever", "library": "langchain"}) is None
+    assert speculation.claim("get_docs", {"query": "Chroma DB", "library": "langchain"}) is None
+    # The whole question, reordered and naming the library again, still matches
+    assert speculation.claim("get_docs", {"query": "langchain Chroma DB persist add retriever", "library": "langchain"})
+    speculation.finish()
+
+
+@pytest.mark.anyio
+async def test_unmatched_prefetch_is_cancelled_and_counted_as_waste():
+    speculator = Speculator(enabled=True, waste_ratio=0.5)
+    get_docs = FakeGetDocs(delay=10)
+    speculation = speculator.start("langchain chroma persist", LIBRARIES, get_docs)
+    await asyncio.sleep(0)
+
+    # Other library, then a query with words the user never used
+    assert speculation.claim("get_docs", {"query": "chroma", "library": "openai"}) is None
+    assert speculation.claim("get_docs", {"query": "pinecone", "library": "langchain"}) is None
+    assert speculation.claim("fetch_url", {"url": "https://python.langchain.com"}) is None
+    speculation.finish()
+    speculation.finish()
+    await asyncio.sleep(0)
+
+    assert get_docs.cancelled == 1
+    assert speculator.stats()["wasted"] == 1
+
+
+@pytest.mark.anyio
+async def test_failed_prefetch_is_not_handed_over():
+    speculator = Speculator(enabled=True, waste_ratio=0.5)
+    speculation = speculator.start("langchain chroma", LIBRARIES, FakeGetDocs(error=RuntimeError("down")))
+    await asyncio.sleep(0.01)
+
+    assert speculation.claim("get_docs", {"query": "chroma", "library": "langchain"}) is None
+    speculation.finish()
+    assert speculator.stats()["failed"] == 1
+
+
+@pytest.mark.anyio
+async def test_budget_limits_wasted_prefetches():
+    speculator = Speculator(enabled=True, waste_ratio=0, reserve=2)
+    get_docs = FakeGetDocs(delay=10)
+
+    speculations = [speculator.start("langchain chroma", LIBRARIES, get_docs) for _ in range(3)]
+    await asyncio.sleep(0)
+    for speculation in speculations:
+        if speculation is not None:
+            speculation.finish()
+    await asyncio.sleep(0)
+
+    assert speculations[2] is None
+    assert speculator.stats()["over_budget"] == 1
+    assert get_docs.cancelled == 2
+
+
+def test_disabled_or_unguessable_starts_nothing():
+    get_docs = FakeGetDocs()
+    assert Speculator(enabled=False, waste_ratio=0.5).start("langchain chroma", LIBRARIES, get_docs) is None
+
+    speculator = Speculator(enabled=True, waste_ratio=0.5)
+    assert speculator.start("how do I write a retriever", LIBRARIES, get_docs) is None
+    assert speculator.stats()["no_library_guess"] == 1
+    assert get_docs.calls == []
+
+
+def test_budget_refills_by_ratio_up_to_reserve():
+    budget = SpeculationBudget(ratio=0.5, reserve=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
@@ -0,0 +1,77 @@
+from utils.llm_payload import Conversation
+from utils.token_budget import COMPACTED_PREFIX, TokenBudget, extract_relevant
+
+SOURCE = "--- Content from https://docs.example/page ---"
+
+
+def tool_output(topic: str, filler: str) -> str:
+    lines = [SOURCE]
+    for i in range(20):
+        lines.append(f"{filler} paragraph {i} about unrelated setup details and options.")
+    lines.append(f"The {topic} parameter controls how results are persisted to disk.")
+    return "\n".join(lines)
+
+
+def conversation_with_tools(count: int) -> Conversation:
+    conversation = Conversation([{"role": "user", "content": "How do I persist a chroma collection?"}])
+    for i in range(count):
+        conversation.append({
+            "role": "assistant",
+            "content": "",
+            "tool_calls": [{"id": f"call_{i}", "type": "function", "function": {"name": "get_docs", "arguments": "{}"}}],
+        })
+        conversation.append({"role": "tool", "tool_call_id": f"call_{i}", "content": tool_output("persist_directory", f"Filler{i}")})
+    return conversation
+
+
+def test_extract_relevant_keeps_sources_and_matching_chunks():
+    text = tool_output("persist_directory", "Filler")
+    reduced = extract_relevant(text, "chroma persist_directory", max_chars=400, chunk_chars=100)
+
+    assert len(reduced) <= 400
+    assert reduced.startswith(SOURCE)
+    assert "persist_directory parameter" in reduced
+
+
+def test_under_budget_is_left_alone():
+    conversation = conversation_with_tools(2)
+    budget = TokenBudget(max_prompt_tokens=10_000, keep_recent=1, compacted_chars=300)
+
+    assert budget.compact(conversation, "persist") == 0
+
+
+def test_compacts_oldest_tool_results_first_and_keeps_recent():
+    conversation = conversation_with_tools(3)
+    before = conversation.prompt_tokens()
+    tool_indexes = [i for i, m in enumerate(conversation.messages) if m["role"] == "tool"]
+    # Room for the prompt minus roughly one tool output
+    budget = TokenBudget(max_prompt_tokens=before - 150, keep_recent=1, compacted_chars=400)
+
+    changed = budget.compact(conversation, "chroma persist_directory")
+
+    assert changed == 1
+    oldest, middle, newest = (conversation.messages[i]["content"] for i in tool_indexes)
+    assert oldest.startswith(COMPACTED_PREFIX) and "persist_directory" in oldest
+    assert not middle.startswith(COMPACTED_PREFIX)
+    assert not newest.startswith(COMPACTED_PREFIX)
+    assert conversation.prompt_tokens() <= budget.max_prompt_tokens
+
+
+def test_truncates_to_min_chars_when_compaction_is_not_enough():
+    conversation = conversation_with_tools(3)
+    budget = TokenBudget(max_prompt_tokens=1, keep_recent=1, compacted_chars=400, min_chars=50)
+
+    budget.compact(conversation, "chroma persist_directory")
+
+    tools = [m["content"] for m in conversation.messages if m["role"] == "tool"]
+    assert [len(t) for t in tools[:-1]] == [len(COMPACTED_PREFIX) + 50] * 2
+    # Never touched, even though the prompt is still over budget
+    assert not tools[-1].startswith(COMPACTED_PREFIX)
+
+
+def test_fixed_tokens_count_towards_the_budget():
+    conversation = conversation_with_tools(2)
+    budget = TokenBudget(max_prompt_tokens=conversation.prompt_tokens(), keep_recent=0, compacted_chars=400)
+
+    assert budget.compact(conversation, "persist") == 0
+    assert budget.compact(conversation, "persist", fixed_tokens=100) >= 1
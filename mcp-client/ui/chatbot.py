@@ -1,85 +1,158 @@
 import streamlit as st
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, List
 import json
+import os
+
+# Seconds the sidebar's tool list is reused before asking the API again
+TOOLS_TTL = float(os.getenv("UI_TOOLS_TTL", "60"))
+# Messages drawn on every rerun; older ones sit behind a button
+HISTORY_WINDOW = int(os.getenv("UI_HISTORY_WINDOW", "40"))
+# Tool outputs longer than this show a preview and load the rest on demand
+TOOL_PREVIEW_CHARS = int(os.getenv("UI_TOOL_PREVIEW_CHARS", "500"))
+
+# ETag and tools of the last /tools response per API URL, for conditional refreshes
+_tools_etags: Dict[str, tuple] = {}
+
+
+@st.cache_resource
+def api_client(api_url: str) -> httpx.Client:
+    """One keep-alive connection pool per API URL, shared by every session and rerun"""
+    return httpx.Client(base_url=api_url, timeout=httpx.Timeout(60.0, connect=5.0), verify=False)
+
+
+@st.cache_data(ttl=TOOLS_TTL, show_spinner=False)
+def get_tools(api_url: str) -> List[Dict[str, Any]]:
+    """The API's tool catalog, fetched at most once per TOOLS_TTL (304 if unchanged)"""
+    cached = _tools_etags.get(api_url)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = api_client(api_url).get("/tools", headers=headers, timeout=30.0)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    tools = response.json()["tools"]
+    if response.headers.get("ETag"):
+        _tools_etags[api_url] = (response.headers["ETag"], tools)
+    return tools
+
+
+def to_entries(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Turn API messages into display entries once, when they are appended, so
+    reruns only draw: tool results are paired with the call that asked for them
+    """
+    calls = {}
+    entries = []
+    for message in messages:
+        if message["role"] == "user":
+            entries.append({"role": "user", "text": message["content"]})
+        elif message["role"] == "assistant":
+            if message.get("content"):
+                entries.append({"role": "assistant", "text": message["content"]})
+            for call in message.get("tool_calls") or []:
+                calls[call["id"]] = call["function"]
+        elif message["role"] == "tool":
+            call = calls.get(message["tool_call_id"], {})
+            entries.append({
+                "role": "tool",
+                "name": call.get("name", "tool"),
+                "args": call.get("arguments", ""),
+                "content": message["content"],
+            })
+    return entries
 
 
 class Chatbot:
     def __init__(self, api_url: str):
         self.api_url = api_url
-        self.current_tool_call = {"name": None, "args": None}
         self.messages = st.session_state["messages"]
 
-    def display_message(self, message: Dict[str, Any]):
-        # display user message
-        if message["role"] == "user" and type(message["content"]) == str:
-            st.chat_message("user").markdown(message["content"])
-
-        # display tool result
-        if message["role"] == "user" and type(message["content"]) == list:
-            for content in message["content"]:
-                if content["type"] == "tool_result":
-                    with st.chat_message("assistant"):
-                        st.write(f"Called tool: {self.current_tool_call['name']}:")
-                        st.json(
-                            {
-                                "name": self.current_tool_call["name"],
-                                "args": self.current_tool_call["args"],
-                                "content": json.loads(content["content"][0]["text"]),
-                            },
-                            expanded=False,
-                        )
-
-        # display ai message
-        if message["role"] == "assistant" and type(message["content"]) == str:
-            st.chat_message("assistant").markdown(message["content"])
-
-        # store current ai tool use
-        if message["role"] == "assistant" and type(message["content"]) == list:
-            for content in message["content"]:
-                # ai tool use
-                if content["type"] == "tool_use":
-                    self.current_tool_call = {
-                        "name": content["name"],
-                        "args": content["input"],
-                    }
-
-    async def get_tools(self):
-        async with httpx.AsyncClient(timeout=30.0, verify=False) as client:
-            response = await client.get(
-                f"{self.api_url}/tools",
-                headers={"Content-Type": "application/json"},
-            )
-            return response.json()
-
-    async def render(self):
+    def display_tool_output(self, key: str, content: str):
+        """Preview a tool output; a long one is only sent to the browser when asked for"""
+        if len(content) <= TOOL_PREVIEW_CHARS or st.session_state.get(f"full-{key}"):
+            st.text(content)
+            return
+        st.text(content[:TOOL_PREVIEW_CHARS] + " …")
+        if st.button(f"Load full output ({len(content):,} chars)", key=f"load-{key}"):
+            st.session_state[f"full-{key}"] = True
+            st.rerun()
+
+    def display_message(self, index: int, entry: Dict[str, Any]):
+        if entry["role"] == "user":
+            st.chat_message("user").markdown(entry["text"])
+        elif entry["role"] == "assistant":
+            st.chat_message("assistant").markdown(entry["text"])
+        elif entry["role"] == "tool":
+            with st.chat_message("assistant"):
+                with st.expander(f"Called tool: {entry['name']}", expanded=False):
+                    st.code(entry["args"], language="json")
+                    # Call ids repeat across queries; the position in the history doesn't
+                    self.display_tool_output(str(index), entry["content"])
+
+    def display_history(self):
+        """Draw the last HISTORY_WINDOW messages, so reruns cost the same however long the chat gets"""
+        hidden = 0 if st.session_state.get("show_all") else max(0, len(self.messages) - HISTORY_WINDOW)
+        if hidden and st.button(f"Show {hidden} earlier messages"):
+            st.session_state["show_all"] = True
+            st.rerun()
+        for index, entry in enumerate(self.messages[hidden:], start=hidden):
+            self.display_message(index, entry)
+
+    def stream_query(self, query: str):
+        """Yield events from the API's /query/stream server-sent events"""
+        with api_client(self.api_url).stream("POST", "/query/stream", json={"query": query}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[len("data:"):])
+
+    def render_stream(self, query: str):
+        """Render a streamed response as tokens and tool calls arrive"""
+        st.chat_message("user").markdown(query)
+        with st.chat_message("assistant"):
+            text = ""
+            placeholder = st.empty()
+            tool_status = {}
+            for event in self.stream_query(query):
+                if event["type"] == "token":
+                    text += event["content"]
+                    placeholder.markdown(text + "▌")
+                elif event["type"] == "tool_call_start":
+                    tool_status[event["id"]] = st.status(f"Calling tool: {event['name']}")
+                    tool_status[event["id"]].code(event["arguments"], language="json")
+                elif event["type"] == "tool_call_end":
+                    status = tool_status.get(event["tool_call_id"])
+                    if status is not None:
+                        status.text(event["content"][:TOOL_PREVIEW_CHARS])
+                        status.update(state="complete")
+                    # Tokens after a tool round belong to a new reply
+                    placeholder = st.empty()
+                    text = ""
+                elif event["type"] == "done":
+                    placeholder.markdown(text)
+                    # Drawn live above; later reruns draw it from the history
+                    self.messages.extend(to_entries(event["messages"]))
+                elif event["type"] == "error":
+                    st.error(f"Backend: Error processing query: {event['detail']}")
+
+    def render(self):
         st.title("MCP Client")
 
         with st.sidebar:
             st.subheader("Settings")
             st.write("API URL: ", self.api_url)
-            result = await self.get_tools()
             st.subheader("Tools")
-            st.write([tool["name"] for tool in result["tools"]])
+            try:
+                st.write([tool["name"] for tool in get_tools(self.api_url)])
+            except httpx.HTTPError as e:
+                st.warning(f"Could not load tools: {e}")
 
-        # Display existing messages
-        for message in self.messages:
-            self.display_message(message)
+        self.display_history()
 
         # Handle new query
         query = st.chat_input("Enter your query here")
         if query:
-            async with httpx.AsyncClient(timeout=60.0, verify=False) as client:
-                try:
-                    response = await client.post(
-                        f"{self.api_url}/query",
-                        json={"query": query},
-                        headers={"Content-Type": "application/json"},
-                    )
-                    if response.status_code == 200:
-                        messages = response.json()["messages"]
-                        st.session_state["messages"] = messages
-                        for message in st.session_state["messages"]:
-                            self.display_message(message)
-                except Exception as e:
-                    st.error(f"Frontend: Error processing query: {str(e)}")
\ No newline at end of file
+            try:
+                self.render_stream(query)
+            except Exception as e:
+                st.error(f"Frontend: Error processing query: {str(e)}")
@@ -1,10 +1,9 @@
-import asyncio
 from utils.logger import logger
 import streamlit as st
 from chatbot import Chatbot
 
 
-async def main():
+def main():
     if "server_connected" not in st.session_state:
         st.session_state["server_connected"] = False
 
@@ -19,8 +18,8 @@ async def main():
     st.set_page_config(page_title="MCP Client", page_icon=":shark:")
 
     chatbot = Chatbot(API_URL)
-    await chatbot.render()
+    chatbot.render()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
\ No newline at end of file
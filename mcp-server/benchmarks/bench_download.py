@@ -0,0 +1,139 @@
+"""
+Download behaviour of fetch_url against a local server serving awkward pages:
+a normal page, an oversized page, a slow-drip page and a PDF.
+
+For each case it reports how long fetch_url took, the peak Python memory
+allocated during the call, and the start of the result. Compare with a
+plain full `client.get()` via `--full-download`.
+
+Unless `--full-download` is given it also checks the budgets: the oversized
+page is read no further than MAX_PAGE_BYTES, the slow drip returns its
+partial text soon after PAGE_DOWNLOAD_TIMEOUT, and the PDF is rejected from
+its headers. Any failed check makes the script exit non-zero.
+
+    python benchmarks/bench_download.py
+    MAX_PAGE_BYTES=65536 PAGE_DOWNLOAD_TIMEOUT=2 python benchmarks/bench_download.py
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+from utils.extract import html_to_text  # noqa: E402
+
+SECTION = b"<h2>Section</h2><p>" + b"Documentation text. " * 50 + b"</p>"
+
+
+class AwkwardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_body(self, content_type: str, chunks, delay: float = 0.0):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                if delay:
+                    time.sleep(delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        if self.path == "/page":
+            self.send_body("text/html; charset=utf-8", [b"<html><body>", SECTION * 20, b"</body></html>"])
+        elif self.path == "/huge":
+            self.send_body("text/html; charset=utf-8", (SECTION * 10 for _ in range(2000)))
+        elif self.path == "/drip":
+            self.send_body("text/html; charset=utf-8", (SECTION for _ in range(60)), delay=0.25)
+        elif self.path == "/pdf":
+            self.send_body("application/pdf", (b"%PDF-1.7 " * 1000 for _ in range(1000)))
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def check(path: str, result: str, elapsed: float, bytes_read: dict[str, int]) -> str | None:
+    """What is wrong with fetch_url's result for one of the awkward pages, if anything"""
+    if path == "/page" and "Section" not in result:
+        return f"normal page came back as {result[:80]!r}"
+    if path == "/huge" and not 0 < bytes_read.get(path, 0) <= server.MAX_PAGE_BYTES:
+        return f"read {bytes_read.get(path)} bytes, cap is {server.MAX_PAGE_BYTES}"
+    if path == "/drip":
+        if result.startswith("Error") or "Section" not in result:
+            return f"no partial page: {result[:80]!r}"
+        if elapsed > server.PAGE_DOWNLOAD_TIMEOUT + 2:
+            return f"took {elapsed:.1f}s, timeout is {server.PAGE_DOWNLOAD_TIMEOUT}s"
+    if path == "/pdf" and ("Unsupported content type" not in result or path in bytes_read):
+        return f"PDF was not rejected from its headers: {result[:80]!r}"
+    return None
+
+
+async def full_download(url: str) -> str:
+    response = await server.get_http_client().get(url, timeout=30.0)
+    return html_to_text(response.text)
+
+
+async def main(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), AwkwardHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    print(f"MAX_PAGE_BYTES={server.MAX_PAGE_BYTES}  PAGE_DOWNLOAD_TIMEOUT={server.PAGE_DOWNLOAD_TIMEOUT}s")
+
+    # Bytes of body fetch_url read per path (pages are ASCII, so one char per byte)
+    bytes_read: dict[str, int] = {}
+    read_page = server.read_page
+
+    async def recording_read_page(response):
+        text = await read_page(response)
+        bytes_read[response.url.path] = len(text.encode())
+        return text
+
+    server.read_page = recording_read_page
+    failures = []
+    try:
+        async with server.app_lifespan(server.mcp):
+            for path in ("/page", "/huge", "/drip", "/pdf"):
+                url = base + path
+                tracemalloc.start()
+                start = time.perf_counter()
+                if args.full_download:
+                    result = await full_download(url)
+                else:
+                    result = await server.fetch_url(url, max_chars=3000)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                preview = result[:50].replace("\n", " ")
+                print(f"{path:<6} {elapsed * 1000:8.1f}ms  peak memory {peak / 1024 / 1024:7.1f} MB  -> {preview!r}")
+                problem = None if args.full_download else check(path, result, elapsed, bytes_read)
+                if problem:
+                    failures.append(f"{path}: {problem}")
+    finally:
+        server.read_page = read_page
+        httpd.shutdown()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full-download", action="store_true", help="Read whole responses like the old fetch_url")
+    failures = asyncio.run(main(parser.parse_args()))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,81 @@
+"""
+Compare HTML-to-text backends over a corpus of saved docs pages, and the
+throughput of parsing inline versus in a process pool.
+
+    python benchmarks/bench_extract.py --corpus ./saved_pages
+    python benchmarks/bench_extract.py              # synthetic pages
+
+`--corpus` is searched recursively for *.html files (the same layout as
+`python server.py index --corpus`).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.extract import available_backends, html_to_text  # noqa: E402
+
+
+def synthetic_page(i: int) -> str:
+    nav = "".join(f"<li><a href='/docs/{j}'>Link {j}</a></li>" for j in range(200))
+    sections = "".join(
+        f"<h2>Section {j}</h2><p>Paragraph {j} of page {i} with <code>code</code> and <a href='#'>links</a>.</p>"
+        f"<pre>example = Example({j})\nexample.run()</pre>"
+        for j in range(150)
+    )
+    return (
+        f"<html><head><title>Page {i}</title><script>{'var x = 1;' * 500}</script><style>{'p{}' * 500}</style></head>"
+        f"<body><header>Header</header><nav><ul>{nav}</ul></nav><main>{sections}</main><footer>Footer</footer></body></html>"
+    )
+
+
+def load_corpus(path: str | None, pages: int) -> list[str]:
+    if path:
+        return [p.read_text(encoding="utf-8", errors="replace") for p in sorted(Path(path).rglob("*.htm*"))]
+    return [synthetic_page(i) for i in range(pages)]
+
+
+def bench_backend(backend: str, corpus: list[str]) -> list[float]:
+    timings = []
+    for html in corpus:
+        start = time.perf_counter()
+        html_to_text(html, backend)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--pages", type=int, default=40, help="Synthetic pages when no corpus is given")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.pages)
+    size_kb = sum(len(html) for html in corpus) / len(corpus) / 1024
+    print(f"{len(corpus)} pages, {size_kb:.0f} KB average")
+
+    for backend in available_backends():
+        timings = bench_backend(backend, corpus)
+        timings.sort()
+        print(
+            f"{backend:<11} mean={statistics.mean(timings) * 1000:7.2f}ms  "
+            f"p95={timings[int(len(timings) * 0.95) - 1] * 1000:7.2f}ms  "
+            f"throughput={len(timings) / sum(timings):7.1f} pages/s"
+        )
+
+    start = time.perf_counter()
+    for html in corpus:
+        html_to_text(html)
+    inline = time.perf_counter() - start
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(html_to_text, corpus[: args.workers]))  # warm up workers
+        start = time.perf_counter()
+        list(pool.map(html_to_text, corpus))
+        pooled = time.perf_counter() - start
+    print(f"default backend inline        {len(corpus) / inline:7.1f} pages/s")
+    print(f"default backend {args.workers} processes  {len(corpus) / pooled:7.1f} pages/s")
@@ -0,0 +1,114 @@
+"""
+Per-call request latency with a fresh httpx client per call (the old
+search_web/fetch_url behaviour) versus the shared pooled client.
+
+Runs against a local stub HTTP server. `--connect-delay` adds a fixed cost to
+every new connection to stand in for the TCP/TLS handshake to a remote host.
+
+    python benchmarks/bench_http_pool.py --calls 200 --connect-delay 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import logging
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+PAGE = (
+    "<html><head><title>Docs</title></head><body><nav>menu</nav>"
+    + "".join(f"<h2>Section {i}</h2><p>Some documentation text {i}.</p>" for i in range(50))
+    + "</body></html>"
+).encode()
+
+
+def make_handler(connect_delay: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            time.sleep(connect_delay)
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+async def fetch_fresh_client(url: str) -> None:
+    async with httpx.AsyncClient(timeout=8.0) as client:
+        response = await client.get(url, headers={"User-Agent": server.USER_AGENT})
+        response.raise_for_status()
+
+
+async def fetch_pooled_client(url: str) -> None:
+    async with server.host_semaphore(url):
+        response = await server.get_http_client().get(url)
+    response.raise_for_status()
+
+
+async def measure(fetch, url: str, calls: int, concurrency: int) -> list[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await fetch(url)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    mean = statistics.mean(latencies) * 1000
+    print(f"{name:<14} mean={mean:7.2f}ms  p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+
+
+async def main(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.connect_delay))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}/docs"
+
+    try:
+        before = await measure(fetch_fresh_client, url, args.calls, args.concurrency)
+        async with server.app_lifespan(server.mcp):
+            # Fill the pool once so the run reflects steady state
+            await fetch_pooled_client(url)
+            after = await measure(fetch_pooled_client, url, args.calls, args.concurrency)
+    finally:
+        httpd.shutdown()
+
+    print(f"{args.calls} calls, concurrency={args.concurrency}, connect delay={args.connect_delay * 1000:.0f}ms")
+    report("fresh client", before)
+    report("pooled client", after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--connect-delay", type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
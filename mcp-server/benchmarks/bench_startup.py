@@ -0,0 +1,117 @@
+"""
+Cold-start benchmark of the MCP server, emitted as JSON.
+
+Reports the import time of `server` (best of `--runs`, from
+`python -X importtime`) with its slowest direct imports, and the time a
+stdio client needs to spawn the server, initialize and list its tools. The
+server's own startup phases (imports, ready, warm-up) are read back from
+`cache_stats`.
+
+    python benchmarks/bench_startup.py
+    WARMUP=true python benchmarks/bench_startup.py --max-import-ms 800
+
+With `--max-import-ms` the script exits non-zero when the import time goes
+over budget, so CI can catch a heavy import creeping back in.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(SERVER_DIR, "server.py")
+
+
+def import_profile(module: str, cwd: str, env: dict, runs: int, top: int) -> dict:
+    """Fastest of `runs` fresh imports of `module`, with the slowest modules it imports directly"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True,
+        )
+        # "import time: self [us] | cumulative | imported package"; a module's
+        # imports are listed before it, indented two more spaces
+        children, total = {}, 0
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 1:
+                children[name.strip()] = int(cumulative)
+            elif depth == 0:
+                if name.strip() == module:
+                    total = int(cumulative)
+                    break
+                children = {}
+        if best is None or total < best[0]:
+            best = (total, children)
+    total, modules = best
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total / 1000, 1),
+        "slowest": {name: round(us / 1000, 1) for name, us in slowest},
+    }
+
+
+async def stdio_startup(env: dict) -> dict:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT], env=env)
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            await session.list_tools()
+            listed = time.perf_counter()
+            # Give a warm-up (if enabled) the chance to finish before reading the phases
+            phases = {}
+            for _ in range(50):
+                result = await session.call_tool("cache_stats", {})
+                phases = json.loads(result.content[0].text)["startup"]
+                if env.get("WARMUP", "false").lower() not in ("1", "true", "yes") or "warmup" in phases:
+                    break
+                await asyncio.sleep(0.1)
+    return {
+        "initialize_ms": round((initialized - start) * 1000, 1),
+        "list_tools_ms": round((listed - initialized) * 1000, 1),
+        "server_phases_s": phases,
+    }
+
+
+async def main(args) -> dict:
+    # Offline: no docs store or local index, and an unreachable search API
+    env = {
+        **os.environ,
+        "SERPER_URL": os.environ.get("SERPER_URL", "http://127.0.0.1:9/search"),
+        "SERPER_API_KEY": "offline",
+        "DOCSTORE_PATH": "",
+        "INDEX_PATH": os.path.join(tempfile.mkdtemp(), "no_index.json.gz"),
+    }
+    return {
+        "suite": "mcp-server-startup",
+        "python": sys.version.split()[0],
+        "import": import_profile("server", SERVER_DIR, env, args.runs, args.top),
+        "stdio": await stdio_startup(env),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh imports to take the best of")
+    parser.add_argument("--top", type=int, default=10, help="Slowest direct imports to report")
+    parser.add_argument("--max-import-ms", type=float, help="Exit with status 1 if importing takes longer")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    print(json.dumps(report, indent=2))
+    if args.max_import_ms is not None and report["import"]["total_ms"] > args.max_import_ms:
+        print(f"Import took {report['import']['total_ms']}ms, over the {args.max_import_ms}ms budget", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,257 @@
+"""
+Offline end-to-end benchmarks of the MCP server tools, emitted as JSON.
+
+A local stub stands in for both Serper and the docs sites, so nothing
+leaves the machine. Measured:
+
+* fetch_url  - download + parse throughput over a saved HTML corpus (or synthetic pages)
+* get_docs   - latency of cold (empty caches) and warm calls
+* batch      - multi-library questions: one get_docs_batch call vs one get_docs per library
+* stdio      - MCP session start-up and per-`call_tool` round trip over stdio
+
+    python benchmarks/bench_tools.py --output results/server.json
+    python benchmarks/bench_tools.py --corpus ./saved_pages --docs-latency 0.05
+
+Compare two runs by diffing their JSON files; every timing is in milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_extract import load_corpus
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(SERVER_DIR, "server.py")
+sys.path.insert(0, SERVER_DIR)
+
+QUERIES = [
+    f"{topic} {detail}"
+    for topic in ("vector store", "retriever", "chat model", "embeddings", "agents", "tool calling")
+    for detail in ("setup", "streaming", "async usage", "configuration")
+]
+
+
+def make_stub_handler(corpus: list[bytes], docs_latency: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        """POST /search answers like Serper (single or batch); GET /docs/<n> serves corpus page n"""
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def send(self, status: int, content_type: str, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            base = f"http://{self.headers['Host']}"
+
+            def search(q: dict) -> dict:
+                # Same query -> same pages, different queries spread over the corpus
+                first = zlib.crc32(q["q"].encode())
+                return {"organic": [{"link": f"{base}/docs/{(first + i) % len(corpus)}"} for i in range(q.get("num", 2))]}
+
+            # Like Serper, a JSON array is a batch of searches answered in order
+            results = [search(q) for q in request] if isinstance(request, list) else search(request)
+            self.send(200, "application/json", json.dumps(results).encode())
+
+        def do_GET(self):
+            if not self.path.startswith("/docs/"):
+                self.send(404, "text/plain", b"")
+                return
+            time.sleep(docs_latency)
+            self.send(200, "text/html; charset=utf-8", corpus[int(self.path.rsplit("/", 1)[1]) % len(corpus)])
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+def summarize(timings: list[float]) -> dict:
+    """Latency percentiles in milliseconds"""
+    ordered = sorted(timings)
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def timed_all(calls, concurrency: int) -> tuple[list[float], float]:
+    """Run coroutine factories with bounded concurrency; returns per-call timings and wall time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one(call):
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    return timings, time.perf_counter() - start
+
+
+async def bench_fetch_url(server, base: str, corpus: list[bytes], concurrency: int) -> dict:
+    # Start the parse workers outside the measurement
+    await server.fetch_url(f"{base}/docs/0")
+    server.page_cache.clear()
+    urls = [f"{base}/docs/{i}" for i in range(len(corpus))]
+    timings, wall = await timed_all([lambda url=url: server.fetch_url(url, max_chars=3000) for url in urls], concurrency)
+    html_mb = sum(len(page) for page in corpus) / 1024 / 1024
+    return {
+        "pages": len(urls),
+        "concurrency": concurrency,
+        "pages_per_s": round(len(urls) / wall, 2),
+        "html_mb_per_s": round(html_mb / wall, 2),
+        "latency": summarize(timings),
+    }
+
+
+async def bench_get_docs(server, concurrency: int, rounds: int) -> dict:
+    server.search_cache.clear()
+    server.page_cache.clear()
+    calls = [lambda query=query: server.get_docs(query, "langchain") for query in QUERIES]
+    cold, cold_wall = await timed_all(calls, concurrency)
+    warm = []
+    for _ in range(rounds):
+        timings, _ = await timed_all(calls, concurrency)
+        warm.extend(timings)
+    return {
+        "queries": len(QUERIES),
+        "concurrency": concurrency,
+        "cold": {**summarize(cold), "queries_per_s": round(len(QUERIES) / cold_wall, 2)},
+        "warm": summarize(warm),
+    }
+
+
+async def bench_batch(server) -> dict:
+    libraries = ("langchain", "llama-index", "openai")
+    results = {}
+    for mode in ("separate", "batch"):
+        server.search_cache.clear()
+        server.page_cache.clear()
+        timings = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            if mode == "batch":
+                await server.get_docs_batch([server.DocsQuery(query=query, library=library) for library in libraries])
+            else:
+                await asyncio.gather(*(server.get_docs(query, library) for library in libraries))
+            timings.append(time.perf_counter() - start)
+        results[mode] = summarize(timings)
+    return {"libraries_per_question": len(libraries), **results}
+
+
+async def bench_stdio(env: dict, calls: int) -> dict:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=[SERVER_SCRIPT], env=env)
+    start = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            startup = time.perf_counter() - start
+
+            results = {"startup_ms": round(startup * 1000, 3)}
+            for name, args in (
+                ("list_supported_libraries", {}),
+                ("get_docs", {"query": QUERIES[0], "library": "langchain"}),
+            ):
+                await session.call_tool(name, args)  # warm the server-side caches
+                timings = []
+                for _ in range(calls):
+                    call_start = time.perf_counter()
+                    await session.call_tool(name, args)
+                    timings.append(time.perf_counter() - call_start)
+                results[name] = summarize(timings)
+    return results
+
+
+async def main(args):
+    corpus = [page.encode("utf-8") for page in load_corpus(args.corpus, args.pages)]
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_stub_handler(corpus, args.docs_latency))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{httpd.server_port}"
+
+    # Point the server at the stub, without a docs store or offline index
+    env = {
+        **os.environ,
+        "SERPER_URL": f"{base}/search",
+        "SERPER_API_KEY": "offline",
+        "DOCSTORE_PATH": "",
+        "INDEX_PATH": os.path.join(tempfile.mkdtemp(), "no_index.json.gz"),
+    }
+    os.environ.update(env)
+    logging.basicConfig(level=logging.WARNING)
+    import server
+    from utils.extract import EXTRACT_BACKEND
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    try:
+        async with server.app_lifespan(server.mcp):
+            results["fetch_url"] = await bench_fetch_url(server, base, corpus, args.concurrency)
+            results["get_docs"] = await bench_get_docs(server, args.concurrency, args.rounds)
+            results["batch"] = await bench_batch(server)
+        results["stdio"] = await bench_stdio(env, args.calls)
+    finally:
+        httpd.shutdown()
+
+    return {
+        "suite": "mcp-server",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "corpus": args.corpus or f"synthetic:{args.pages}",
+            "docs_latency_s": args.docs_latency,
+            "extract_backend": EXTRACT_BACKEND,
+            "extract_workers": server.EXTRACT_WORKERS,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of saved .html pages")
+    parser.add_argument("--pages", type=int, default=40, help="Synthetic pages when no corpus is given")
+    parser.add_argument("--docs-latency", type=float, default=0.0, help="Seconds the stub docs server waits per page")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3, help="Warm get_docs rounds")
+    parser.add_argument("--calls", type=int, default=50, help="call_tool round trips per tool over stdio")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,210 @@
+"""
+Build the offline docs index used by get_docs.
+
+    python server.py index                       # crawl every library in docs_urls
+    python server.py index --library langchain --max-pages 300
+    python server.py index --corpus ./fixtures   # ingest saved pages instead of crawling
+
+A corpus directory holds one sub-directory per library with saved `.html`
+pages. A page's URL is taken from its `<link rel="canonical">` when present.
+
+The crawler honours robots.txt (including Crawl-delay) and sends at most
+`--rate` requests per second to each host.
+"""
+import argparse
+import asyncio
+import html
+import logging
+import os
+import re
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from bs4 import BeautifulSoup, SoupStrainer
+
+from utils.extract import html_to_text
+from utils.outbound import TokenBucket, parse_retry_after
+from utils.search_index import BM25Index, save_indexes
+
+TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+CANONICAL_RE = re.compile(
+    r"<link[^>]+rel=[\"']canonical[\"'][^>]*href=[\"']([^\"']+)[\"']", re.IGNORECASE
+)
+# Cap stored text per page to keep the index compact
+MAX_TEXT_CHARS = 20000
+
+
+def page_title(raw_html: str) -> str:
+    match = TITLE_RE.search(raw_html)
+    return html.unescape(match.group(1).strip()) if match else ""
+
+
+def site_prefix(site: str) -> str:
+    """Turn a docs_urls entry into an absolute URL prefix"""
+    if not site.startswith(("http://", "https://")):
+        site = f"https://{site}"
+    return site.rstrip("/")
+
+
+def extract_links(raw_html: str, base_url: str, prefix: str) -> set[str]:
+    links = set()
+    for a in BeautifulSoup(raw_html, "html.parser", parse_only=SoupStrainer("a", href=True)).find_all("a"):
+        url, _ = urldefrag(urljoin(base_url, a["href"]))
+        if url.startswith(prefix):
+            links.add(url.rstrip("/"))
+    return links
+
+
+class HostPolicy:
+    """robots.txt rules and a request rate per host, shared by all crawl workers"""
+
+    def __init__(self, client: httpx.AsyncClient, user_agent: str, rate: float):
+        self.client = client
+        self.user_agent = user_agent
+        self.rate = rate
+        self.robots: dict[str, asyncio.Task] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+
+    async def fetch_robots(self, origin: str) -> RobotFileParser:
+        """A host's robots.txt; missing (4xx) allows everything, unreachable allows nothing"""
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await self.client.get(robots.url, follow_redirects=True)
+        except httpx.HTTPError as e:
+            logging.warning(f"Could not read {robots.url}, skipping host: {e}")
+            robots.disallow_all = True
+            return robots
+        if response.status_code in (401, 403) or response.status_code >= 500:
+            robots.disallow_all = True
+        elif response.status_code >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(response.text.splitlines())
+        return robots
+
+    async def allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        # One robots.txt request per host, however many workers ask at once
+        if origin not in self.robots:
+            self.robots[origin] = asyncio.create_task(self.fetch_robots(origin))
+        robots = await self.robots[origin]
+        if parts.netloc not in self.buckets:
+            rate = self.rate
+            delay = robots.crawl_delay(self.user_agent)
+            if delay:
+                rate = min(rate, 1 / float(delay)) if rate > 0 else 1 / float(delay)
+            self.buckets[parts.netloc] = TokenBucket(rate, burst=1)
+        return robots.can_fetch(self.user_agent, url)
+
+    async def get(self, url: str) -> httpx.Response:
+        """GET within the host's rate; 429/503 slow the host down"""
+        bucket = self.buckets[urlsplit(url).netloc]
+        await bucket.acquire(max_wait=float("inf"))
+        response = await self.client.get(url, follow_redirects=True)
+        if response.status_code in (429, 503):
+            bucket.throttle(parse_retry_after(response.headers.get("Retry-After")))
+        else:
+            bucket.recover()
+        return response
+
+
+async def crawl_library(
+    policy: HostPolicy,
+    library: str,
+    site: str,
+    max_pages: int,
+    concurrency: int,
+) -> BM25Index:
+    """Breadth-first crawl of a docs site, staying under its URL prefix"""
+    prefix = site_prefix(site)
+    index = BM25Index()
+    seen = {prefix}
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    queue.put_nowait(prefix)
+    fetched = 0
+
+    async def worker():
+        nonlocal fetched
+        while True:
+            url = await queue.get()
+            try:
+                if fetched >= max_pages:
+                    continue
+                if not await policy.allowed(url):
+                    logging.info(f"Skipping {url}: disallowed by robots.txt")
+                    continue
+                fetched += 1
+                response = await policy.get(url)
+                if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+                    continue
+                raw_html = response.text
+                text = html_to_text(raw_html)
+                if text:
+                    index.add_document(url, page_title(raw_html), text[:MAX_TEXT_CHARS])
+                for link in extract_links(raw_html, str(response.url), prefix):
+                    if link not in seen and len(seen) < max_pages * 4:
+                        seen.add(link)
+                        queue.put_nowait(link)
+            except Exception as e:
+                # One bad page must not take its worker down, or join() never returns
+                logging.warning(f"Crawl error for {url}: {e!r}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    await queue.join()
+    for w in workers:
+        w.cancel()
+    logging.info(f"Indexed {len(index)} pages for {library}")
+    return index
+
+
+def ingest_corpus(corpus_dir: str, libraries: list[str]) -> dict[str, BM25Index]:
+    """Index saved pages from `<corpus_dir>/<library>/**/*.html`"""
+    indexes = {}
+    for library in libraries:
+        library_dir = Path(corpus_dir) / library
+        if not library_dir.is_dir():
+            continue
+        index = BM25Index()
+        for path in sorted(library_dir.rglob("*.htm*")):
+            raw_html = path.read_text(encoding="utf-8", errors="replace")
+            canonical = CANONICAL_RE.search(raw_html)
+            url = canonical.group(1) if canonical else path.resolve().as_uri()
+            text = html_to_text(raw_html)
+            if text:
+                index.add_document(url, page_title(raw_html), text[:MAX_TEXT_CHARS])
+        logging.info(f"Indexed {len(index)} pages for {library} from {library_dir}")
+        indexes[library] = index
+    return indexes
+
+
+async def main(argv: list[str], docs_urls: dict[str, str], default_output: str, user_agent: str) -> None:
+    parser = argparse.ArgumentParser(prog="server.py index", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--library", action="append", choices=list(docs_urls), help="Library to index (repeatable, default: all)")
+    parser.add_argument("--max-pages", type=int, default=200, help="Max pages to crawl per library")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=2.0, help="Max requests per second per host (robots.txt Crawl-delay can lower it)")
+    parser.add_argument("--corpus", help="Directory of saved pages to ingest instead of crawling")
+    parser.add_argument("--output", default=default_output, help="Index file to write")
+    args = parser.parse_args(argv)
+
+    libraries = args.library or list(docs_urls)
+    if args.corpus:
+        indexes = ingest_corpus(args.corpus, libraries)
+    else:
+        indexes = {}
+        async with httpx.AsyncClient(headers={"User-Agent": user_agent}, timeout=10.0) as client:
+            policy = HostPolicy(client, user_agent, args.rate)
+            for library in libraries:
+                indexes[library] = await crawl_library(
+                    policy, library, docs_urls[library], args.max_pages, args.concurrency
+                )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    save_indexes(args.output, indexes)
+    total = sum(len(index) for index in indexes.values())
+    print(f"Wrote {total} pages for {len(indexes)} libraries to {args.output}")
@@ -1,19 +1,116 @@
+# ruff: noqa: E402 -- the clock starts before the imports so startup_timings can time them
+import time
+
+# Startup phases in seconds, reported by cache_stats; every stdio client and
+# every parse worker imports this module, so keep its import cheap
+_started = time.perf_counter()
+startup_timings: dict[str, float] = {}
+
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 import httpx
 import json
 import os
 import asyncio
-from bs4 import BeautifulSoup
-from typing import List
+import sys
+import codecs
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, List
+from pydantic import BaseModel
 import logging
+from utils.cache import AsyncTTLCache
+from utils.docstore import DocStore
+from utils.outbound import Outbound, OutboundError, raise_for_transient_status
+from utils.search_index import BM25Index, load_indexes
+from utils.tracing import SpanContext, Tracer
+# BeautifulSoup (utils.extract) and NumPy (utils.relevance) are imported on first use
 
 load_dotenv()
-
-mcp = FastMCP("docs")
+startup_timings["imports"] = round(time.perf_counter() - _started, 4)
 
 USER_AGENT = "docs-app/1.0"
-SERPER_URL = "https://google.serper.dev/search"
+SERPER_URL = os.getenv("SERPER_URL", "https://google.serper.dev/search")
+
+# Outbound connection pool (shared by search_web and fetch_url)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30.0"))
+# HTTP/2 needs the optional `h2` package (httpx[http2])
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+# get_docs caches: (library, query) -> result URLs, and URL -> cleaned page text
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_MAX_CHARS = int(os.getenv("SEARCH_CACHE_MAX_CHARS", str(1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "21600"))
+PAGE_CACHE_MAX_CHARS = int(os.getenv("PAGE_CACHE_MAX_CHARS", str(64 * 1024 * 1024)))
+
+search_cache = AsyncTTLCache("search", SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_CHARS)
+page_cache = AsyncTTLCache("page", PAGE_CACHE_TTL, PAGE_CACHE_MAX_CHARS)
+
+# Optional on-disk store so cached pages and searches survive restarts
+DOCSTORE_PATH = os.getenv("DOCSTORE_PATH", "")
+DOCSTORE_MAX_BYTES = int(os.getenv("DOCSTORE_MAX_BYTES", str(256 * 1024 * 1024)))
+DOCSTORE_PAGE_TTL = float(os.getenv("DOCSTORE_PAGE_TTL", "86400"))
+DOCSTORE_SEARCH_TTL = float(os.getenv("DOCSTORE_SEARCH_TTL", "86400"))
+
+# Opened by the lifespan, so parse workers re-importing this module don't open it too
+docstore: DocStore | None = None
+docstore_counters = {"fresh_hits": 0, "revalidated": 0, "downloads": 0, "search_hits": 0}
+
+# Offline BM25 index built with `python server.py index`; get_docs tries it before Serper
+INDEX_PATH = os.getenv("INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs_index.json.gz"))
+INDEX_MIN_SCORE = float(os.getenv("INDEX_MIN_SCORE", "2.0"))
+
+_local_indexes: dict[str, BM25Index] | None = None
+index_counters = {"hits": 0, "misses": 0}
+
+# Page downloads are streamed and stop after this many bytes or seconds
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(512 * 1024)))
+PAGE_DOWNLOAD_TIMEOUT = float(os.getenv("PAGE_DOWNLOAD_TIMEOUT", "8.0"))
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+# fetch_multiple_urls: overall deadline, and delay before a slow page gets a hedged second request (0 disables)
+FETCH_DEADLINE = float(os.getenv("FETCH_DEADLINE", "15.0"))
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2.0"))
+# get_docs fetches this many search results and returns once FETCH_TARGET_PAGES have arrived
+FETCH_OVERFETCH = int(os.getenv("FETCH_OVERFETCH", "3"))
+FETCH_TARGET_PAGES = int(os.getenv("FETCH_TARGET_PAGES", "2"))
+# Most (query, library) pairs accepted by one get_docs_batch call
+DOCS_BATCH_MAX_QUERIES = int(os.getenv("DOCS_BATCH_MAX_QUERIES", "6"))
+
+fetch_counters = {"hedges": 0, "hedge_wins": 0, "partial_results": 0}
+
+# Per-host circuit breakers, rate limits and retries for Serper and docs hosts (OUTBOUND_* env vars)
+outbound = Outbound.from_env("server")
+# Page downloads are also hedged, so they get fewer retries than searches
+PAGE_MAX_RETRIES = int(os.getenv("PAGE_MAX_RETRIES", "1"))
+# Errors worth retrying: connection failures, timeouts, dropped connections, and
+# read_page's download budget running out before the first byte
+HTTP_TRANSIENT_ERRORS = (httpx.TransportError, TimeoutError)
+
+# stdio serves one client as its subprocess; streamable-http (or the older sse)
+# serves many concurrent sessions from one long-running process on MCP_HOST:MCP_PORT
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8001"))
+
+# Per-stage spans and latency histograms; TRACE_EXPORTER picks none, memory or otel
+tracer = Tracer.from_env("mcp-server")
+
+# HTML parsing runs in worker processes so it doesn't block the event loop; 0 parses inline
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Start parse workers, load the offline index and open the Serper connection in the background at startup
+WARMUP = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+_warmup_task: asyncio.Task | None = None
+
+_extract_pool: ProcessPoolExecutor | None = None
+
+_http_client: httpx.AsyncClient | None = None
+_http_client_users = 0
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
 
 docs_urls = {
     "langchain": "python.langchain.com/docs",
@@ -23,86 +120,525 @@ docs_urls = {
     "huggingface": "https://huggingface.co/docs"
 }
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled keep-alive client for all outbound requests"""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=HTTP2_ENABLED,
+        headers={"User-Agent": USER_AGENT},
+        timeout=10.0,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the server lifespan"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def host_semaphore(url: str) -> asyncio.Semaphore:
+    """Per-host limit on concurrent requests, on top of the pool-wide limit"""
+    host = httpx.URL(url).host
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST)
+    return _host_semaphores[host]
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    global _extract_pool
+    if _extract_pool is None:
+        from utils.extract_worker import create_pool
+
+        _extract_pool = create_pool(EXTRACT_WORKERS)
+    return _extract_pool
+
+
+@tracer.traced("parse")
+async def extract_text(html: str) -> str:
+    """Run HTML-to-text extraction off the event loop"""
+    from utils.extract_worker import parse
+
+    if EXTRACT_WORKERS <= 0:
+        return parse(html)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_extract_pool(), parse, html)
+
+
+async def warm_up():
+    """Do the first-query work ahead of time; failures only cost the head start"""
+    from utils.extract_worker import parse
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    steps = [asyncio.to_thread(get_local_indexes)]
+    if EXTRACT_WORKERS > 0:
+        # Submitted together, so each job gets a worker of its own
+        pool = get_extract_pool()
+        steps += [loop.run_in_executor(pool, parse, "<p>warm-up</p>") for _ in range(EXTRACT_WORKERS)]
+    # Any status will do; the point is a pooled keep-alive connection (and TLS session) to Serper
+    steps.append(get_http_client().head(SERPER_URL, timeout=5.0))
+    for result in await asyncio.gather(*steps, return_exceptions=True):
+        if isinstance(result, Exception):
+            logging.warning(f"Warm-up step failed: {result}")
+    startup_timings["warmup"] = round(time.perf_counter() - started, 4)
+    logging.info(f"Warm-up done in {startup_timings['warmup']}s")
+
+
+def warmup_state() -> str:
+    """disabled, running, done or cancelled"""
+    if not WARMUP:
+        return "disabled"
+    if _warmup_task is None or not _warmup_task.done():
+        return "running"
+    return "cancelled" if _warmup_task.cancelled() else "done"
+
+
+@asynccontextmanager
+async def app_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Own the shared HTTP client, docs store and parse workers for as long as the server runs"""
+    global _http_client, _http_client_users, _extract_pool, _warmup_task, docstore
+    get_http_client()
+    if DOCSTORE_PATH and docstore is None:
+        docstore = DocStore(DOCSTORE_PATH, DOCSTORE_MAX_BYTES, DOCSTORE_PAGE_TTL, DOCSTORE_SEARCH_TTL)
+    _http_client_users += 1
+    if "ready" not in startup_timings:
+        startup_timings["ready"] = round(time.perf_counter() - _started, 4)
+        logging.info(f"Startup: {startup_timings}")
+    if WARMUP and _warmup_task is None:
+        # In the background so it doesn't hold up the first session's initialize
+        _warmup_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        _http_client_users -= 1
+        if _http_client_users == 0 and _warmup_task is not None:
+            # Stop it before the client and pool it uses are closed under it
+            _warmup_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await _warmup_task
+            _warmup_task = None
+        if _http_client_users == 0 and _http_client is not None:
+            await _http_client.aclose()
+            _http_client = None
+        if _http_client_users == 0 and _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+        if _http_client_users == 0 and docstore is not None:
+            docstore.close()
+            docstore = None
+
+
+mcp = FastMCP("docs", lifespan=app_lifespan, host=MCP_HOST, port=MCP_PORT)
+
+
+def request_trace_parent() -> SpanContext | None:
+    """Trace context the client sent in the current tool call's `_meta`, if any"""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except (LookupError, ValueError):
+        return None
+    return SpanContext.from_traceparent(getattr(meta, "traceparent", None)) if meta else None
 
-async def search_web(query: str) -> dict | None:
-    payload = json.dumps({"q": query, "num": 2})
 
+async def serper_post(payload: str):
+    """POST to Serper through its host semaphore, circuit breaker and retries"""
     headers = {
         "X-API-KEY": os.getenv("SERPER_API_KEY"),
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient(timeout=10.0) as client:  # Reduced timeout
-        try:
+    client = get_http_client()
+
+    async def attempt() -> dict:
+        async with host_semaphore(SERPER_URL):
             response = await client.post(
-                SERPER_URL, headers=headers, data=payload
+                SERPER_URL, headers=headers, data=payload, timeout=10.0
             )
-            response.raise_for_status()
-            return response.json()
-        except (httpx.TimeoutException, httpx.HTTPError) as e:
-            print(f"Search error: {e}")
-            return {"organic": []}
-
-async def fetch_url(url: str, max_chars: int = 5000) -> str:
-    """Fetch URL content with timeout and character limit"""
-    async with httpx.AsyncClient(timeout=8.0) as client:  # Reduced timeout
-        try:
-            response = await client.get(
-                url, 
-                headers={"User-Agent": USER_AGENT},
-                follow_redirects=True
-            )
-            response.raise_for_status()
-            
-            # Parse and clean content
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "header", "footer"]):
-                script.decompose()
-            
-            # Get text and limit length
-            text = soup.get_text(strip=True, separator='\n')
-            
-            # Clean up whitespace
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            clean_text = '\n'.join(lines)
-            
-            # Truncate if too long
-            if len(clean_text) > max_chars:
-                clean_text = clean_text[:max_chars] + "... [truncated]"
-            
-            return clean_text
-            
-        except Exception as e:
-            print(f"Fetch error for {url}: {e}")
-            return f"Error fetching {url}: {str(e)}"
-
-async def fetch_multiple_urls(urls: List[str], max_chars_per_url: int = 3000) -> str:
-    """Fetch multiple URLs concurrently with timeout"""
+        raise_for_transient_status(response.status_code, response.headers, SERPER_URL)
+        response.raise_for_status()
+        return response.json()
+
+    return await outbound.call(SERPER_URL, attempt, transient=HTTP_TRANSIENT_ERRORS)
+
+@tracer.traced("search_web")
+async def search_web(query: str, num: int = 2) -> dict | None:
+    try:
+        return await serper_post(json.dumps({"q": query, "num": num}))
+    except (httpx.HTTPError, OutboundError) as e:
+        # Logged to stderr: over stdio, stdout is the JSON-RPC channel
+        logging.warning(f"Search error: {e}")
+        return {"organic": []}
+
+@tracer.traced("search_web")
+async def search_web_batch(queries: List[str], num: int = 2) -> List[dict]:
+    """Several searches in one request; Serper takes a JSON array of queries and answers in order"""
     try:
-        # Use asyncio.wait_for with overall timeout
-        tasks = [fetch_url(url, max_chars_per_url) for url in urls]
-        results = await asyncio.wait_for(
-            asyncio.gather(*tasks, return_exceptions=True),
-            timeout=15.0  # Overall timeout for all requests
+        results = await serper_post(json.dumps([{"q": query, "num": num} for query in queries]))
+    except (httpx.HTTPError, OutboundError) as e:
+        # Logged to stderr: over stdio, stdout is the JSON-RPC channel
+        logging.warning(f"Search error: {e}")
+        return [{"organic": []} for _ in queries]
+    if not isinstance(results, list) or len(results) != len(queries):
+        logging.warning(f"Search error: expected {len(queries)} batch results")
+        return [{"organic": []} for _ in queries]
+    return results
+
+async def download_page_text(url: str) -> str:
+    """Download a page and return its cleaned, untruncated text"""
+    record = None
+    headers = {}
+    if docstore is not None:
+        record = await asyncio.to_thread(docstore.get_page, url)
+        if record is not None:
+            if docstore.is_fresh(record):
+                docstore_counters["fresh_hits"] += 1
+                return record.text
+            # Stale: revalidate instead of re-downloading and re-parsing
+            if record.etag:
+                headers["If-None-Match"] = record.etag
+            if record.last_modified:
+                headers["If-Modified-Since"] = record.last_modified
+
+    client = get_http_client()
+
+    async def attempt() -> tuple[httpx.Headers, str | None]:
+        async with host_semaphore(url):
+            async with client.stream(
+                "GET",
+                url,
+                headers=headers,
+                follow_redirects=True,
+                timeout=8.0,
+            ) as response:
+                if response.status_code == 304 and record is not None:
+                    return response.headers, None
+                raise_for_transient_status(response.status_code, response.headers, url)
+                response.raise_for_status()
+
+                # Reject PDFs, images etc. from the headers alone
+                content_type = response.headers.get("Content-Type", "")
+                if content_type and not content_type.lower().startswith(HTML_CONTENT_TYPES):
+                    raise ValueError(f"Unsupported content type: {content_type}")
+
+                return response.headers, await read_page(response)
+
+    response_headers, html = await outbound.call(
+        url, attempt, transient=HTTP_TRANSIENT_ERRORS, retries=PAGE_MAX_RETRIES
+    )
+    if html is None:
+        docstore_counters["revalidated"] += 1
+        await asyncio.to_thread(docstore.touch_page, url)
+        return record.text
+
+    clean_text = await extract_text(html)
+
+    if docstore is not None:
+        docstore_counters["downloads"] += 1
+        await asyncio.to_thread(
+            docstore.put_page,
+            url,
+            clean_text,
+            response_headers.get("ETag"),
+            response_headers.get("Last-Modified"),
         )
-        
-        combined_text = ""
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                combined_text += f"\nError fetching {urls[i]}: {str(result)}\n"
-            else:
-                combined_text += f"\n--- Content from {urls[i]} ---\n{result}\n"
-        
-        return combined_text
-        
-    except asyncio.TimeoutError:
+
+    return clean_text
+
+async def read_page(response: httpx.Response) -> str:
+    """
+    Read and decode a streamed response incrementally, stopping at
+    MAX_PAGE_BYTES or PAGE_DOWNLOAD_TIMEOUT (whatever arrived by then is kept).
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    received = 0
+    try:
+        async with asyncio.timeout(PAGE_DOWNLOAD_TIMEOUT):
+            async for chunk in response.aiter_bytes():
+                chunk = chunk[: MAX_PAGE_BYTES - received]
+                received += len(chunk)
+                parts.append(decoder.decode(chunk))
+                if received >= MAX_PAGE_BYTES:
+                    logging.info(f"Stopped reading {response.url} at {received} bytes")
+                    break
+    except TimeoutError:
+        if not parts:
+            raise
+        logging.info(f"Download of {response.url} timed out after {received} bytes; using partial page")
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+def format_page(text: str, max_chars: int, query: str | None = None) -> str:
+    """Fit page text into max_chars, keeping the sections relevant to query if given"""
+    if query:
+        from utils.relevance import select_relevant
+
+        return select_relevant(text, query, max_chars)
+    if len(text) > max_chars:
+        # Truncate if too long
+        return text[:max_chars] + "... [truncated]"
+    return text
+
+async def first_successful(tasks: list[asyncio.Task]):
+    """The first of tasks to succeed; raises the last error if all of them fail"""
+    pending = set(tasks)
+    error: BaseException | None = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task
+            error = task.exception()
+    raise error
+
+@tracer.traced("fetch_url")
+async def fetch_text(url: str) -> str:
+    """
+    Fetch a page's text through the cache. If it hasn't arrived after
+    HEDGE_DELAY, a second download of the same URL is raced against the first.
+    """
+    primary = asyncio.ensure_future(page_cache.get_or_fetch(url, lambda: download_page_text(url)))
+    hedge = None
+    try:
+        if HEDGE_DELAY > 0:
+            await asyncio.wait({primary}, timeout=HEDGE_DELAY)
+        if primary.done() or HEDGE_DELAY <= 0:
+            text = await primary
+        else:
+            fetch_counters["hedges"] += 1
+            hedge = asyncio.ensure_future(download_page_text(url))
+            winner = await first_successful([primary, hedge])
+            text = winner.result()
+            if winner is hedge:
+                fetch_counters["hedge_wins"] += 1
+                page_cache.put(url, text)
+    finally:
+        # Cancelling the cache waiter leaves the shared download running
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+    return text
+
+async def fetch_page(url: str, max_chars: int, query: str | None = None) -> str:
+    return format_page(await fetch_text(url), max_chars, query)
+
+async def fetch_url(url: str, max_chars: int = 5000, query: str | None = None) -> str:
+    """
+    Fetch URL content with timeout and character limit. With a query, the
+    page sections most relevant to it are kept instead of the page head.
+    """
+    try:
+        return await fetch_page(url, max_chars, query)
+    except Exception as e:
+        logging.warning(f"Fetch error for {url}: {e}")
+        return f"Error fetching {url}: {str(e)}"
+
+async def download_pages(
+    url_groups: List[List[str]],
+    min_results: int | None,
+    deadline: float,
+) -> tuple[dict[str, str], dict[str, BaseException]]:
+    """
+    Download the union of the groups' URLs concurrently, each URL once, and
+    return the page texts and errors that arrived by the deadline.
+
+    Pages are collected in completion order; as soon as every group has
+    `min_results` pages (or all of its URLs have settled) the remaining
+    downloads are abandoned.
+    """
+    urls = list(dict.fromkeys(url for group in url_groups for url in group))
+    tasks = {asyncio.ensure_future(fetch_text(url)): url for url in urls}
+    pages: dict[str, str] = {}
+    errors: dict[str, BaseException] = {}
+
+    def satisfied(group: List[str]) -> bool:
+        needed = min(min_results or len(group), len(group))
+        return sum(url in pages for url in group) >= needed or all(url in pages or url in errors for url in group)
+
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    try:
+        while pending and not all(satisfied(group) for group in url_groups):
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors[tasks[task]] = task.exception()
+                else:
+                    pages[tasks[task]] = task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    return pages, errors
+
+def combine_pages(
+    urls: List[str],
+    pages: dict[str, str],
+    errors: dict[str, BaseException],
+    min_results: int | None,
+    max_chars_per_url: int,
+    query: str | None = None,
+) -> str:
+    """One group's pages, fitted to max_chars_per_url, in the original URL (search rank) order"""
+    min_results = min(min_results or len(urls), len(urls))
+    results = [url for url in urls if url in pages]
+    if not results and not any(url in errors for url in urls):
         return "Timeout: Could not fetch all documentation pages in time"
 
-@mcp.tool()  
+    enough = len(results) >= min_results
+    if not enough and not all(url in errors for url in urls if url not in pages):
+        fetch_counters["partial_results"] += 1
+
+    combined_text = ""
+    for url in urls:
+        if url in pages:
+            combined_text += f"\n--- Content from {url} ---\n{format_page(pages[url], max_chars_per_url, query)}\n"
+        elif enough:
+            # Over-fetched extra that wasn't needed
+            continue
+        elif url in errors:
+            combined_text += f"\nError fetching {url}: {str(errors[url])}\n"
+        else:
+            combined_text += f"\nTimeout fetching {url}\n"
+
+    return combined_text
+
+async def fetch_multiple_urls(
+    urls: List[str],
+    max_chars_per_url: int = 3000,
+    query: str | None = None,
+    min_results: int | None = None,
+    deadline: float | None = None,
+) -> str:
+    """
+    Fetch multiple URLs concurrently and return what arrived by the deadline.
+    Once `min_results` pages have succeeded the remaining fetches are abandoned.
+    """
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    pages, errors = await download_pages([urls], min_results, deadline)
+    return combine_pages(urls, pages, errors, min_results, max_chars_per_url, query)
+
+def get_local_indexes() -> dict[str, BM25Index]:
+    """Load the offline index on first use; empty when none has been built"""
+    global _local_indexes
+    if _local_indexes is None:
+        try:
+            _local_indexes = load_indexes(INDEX_PATH)
+            logging.info(f"Loaded local docs index from {INDEX_PATH}")
+        except FileNotFoundError:
+            _local_indexes = {}
+    return _local_indexes
+
+async def search_local_index(query: str, library: str, max_chars_per_doc: int = 3000) -> str | None:
+    """Answer from the offline index, or None when it has no good match"""
+    indexes = await asyncio.to_thread(get_local_indexes)
+    index = indexes.get(library)
+    if index is None:
+        return None
+
+    results = [(doc_id, score) for doc_id, score in index.search(query, k=2) if score >= INDEX_MIN_SCORE]
+    if not results:
+        index_counters["misses"] += 1
+        return None
+
+    index_counters["hits"] += 1
+    from utils.relevance import select_relevant
+
+    combined_text = ""
+    for doc_id, _ in results:
+        text = select_relevant(index.texts[doc_id], query, max_chars_per_doc)
+        combined_text += f"\n--- Content from {index.urls[doc_id]} ---\n{text}\n"
+    return combined_text
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def site_query(query: str, library: str) -> str:
+    return f"site:{docs_urls[library]} {query}"
+
+def result_links(results: dict | None) -> List[str]:
+    if not results:
+        return []
+    return [result["link"] for result in results.get("organic", [])[:FETCH_OVERFETCH]]
+
+async def search_doc_urls(query: str, library: str) -> List[str]:
+    """Search a library's docs site and return the top result URLs"""
+    search_query = site_query(query, library)
+    logging.info(f"Searching for: {search_query}")
+    return result_links(await search_web(search_query, num=FETCH_OVERFETCH))
+
+async def lookup_doc_urls(query: str, library: str) -> List[str]:
+    """Result URLs for a docs query, from the on-disk store when possible"""
+    normalized = normalize_query(query)
+    if docstore is not None:
+        urls = await asyncio.to_thread(docstore.get_search, library, normalized)
+        if urls:
+            docstore_counters["search_hits"] += 1
+            return urls
+
+    urls = await search_doc_urls(query, library)
+    if docstore is not None and urls:
+        await asyncio.to_thread(docstore.put_search, library, normalized, urls)
+    return urls
+
+async def lookup_doc_urls_batch(pairs: List[tuple[str, str]]) -> dict[tuple[str, str], List[str]]:
+    """
+    Result URLs for several (query, library) pairs, keyed like search_cache.
+    Pairs in the search cache or docs store are answered locally; the rest
+    share a single Serper batch request.
+    """
+    found: dict[tuple[str, str], List[str]] = {}
+    missing: dict[tuple[str, str], str] = {}
+    for query, library in pairs:
+        key = (library, normalize_query(query))
+        if key in found or key in missing:
+            continue
+        urls = search_cache.lookup(key)
+        if urls:
+            found[key] = urls
+        else:
+            missing[key] = query
+
+    if docstore is not None and missing:
+        stored = await asyncio.to_thread(lambda: [docstore.get_search(*key) for key in missing])
+        for key, urls in zip(list(missing), stored):
+            if urls:
+                docstore_counters["search_hits"] += 1
+                found[key] = urls
+                search_cache.put(key, urls)
+                del missing[key]
+
+    if missing:
+        search_queries = [site_query(query, library) for (library, _), query in missing.items()]
+        logging.info(f"Batch searching for: {search_queries}")
+        results = await search_web_batch(search_queries, num=FETCH_OVERFETCH)
+        searched = {key: result_links(result) for key, result in zip(missing, results)}
+        for key, urls in searched.items():
+            found[key] = urls
+            if urls:
+                search_cache.put(key, urls)
+        if docstore is not None:
+            await asyncio.to_thread(
+                lambda: [docstore.put_search(*key, urls) for key, urls in searched.items() if urls]
+            )
+    return found
+
+@mcp.tool()
+@tracer.traced("tool.get_docs", parent=request_trace_parent)
 async def get_docs(query: str, library: str) -> str:
     """
     Search the latest docs for a given query and library.
@@ -119,20 +655,25 @@ async def get_docs(query: str, library: str) -> str:
         if library not in docs_urls:
             return f"Error: Library '{library}' not supported. Available: {list(docs_urls.keys())}"
         
-        # Search with site restriction
-        search_query = f"site:{docs_urls[library]} {query}"
-        logging.info(f"Searching for: {search_query}")
-        
-        results = await search_web(search_query)
-        if not results or len(results.get("organic", [])) == 0:
+        # Answer from the offline index when it has a good match
+        local_content = await search_local_index(query, library)
+        if local_content:
+            logging.info(f"Answered '{query}' for {library} from local index")
+            return local_content
+
+        # Search with site restriction (empty results are not cached)
+        urls = await search_cache.get_or_fetch(
+            (library, normalize_query(query)),
+            lambda: lookup_doc_urls(query, library),
+            cache_if=bool,
+        )
+        if not urls:
             return f"No results found for '{query}' in {library} documentation"
         
-        # Get URLs from search results
-        urls = [result["link"] for result in results["organic"][:2]]  # Limit to 2 URLs
         logging.info(f"Fetching URLs: {urls}")
         
         # Fetch content from URLs concurrently
-        content = await fetch_multiple_urls(urls)
+        content = await fetch_multiple_urls(urls, query=query, min_results=FETCH_TARGET_PAGES)
         
         if not content.strip():
             return f"No content could be retrieved for '{query}' in {library} documentation"
@@ -144,12 +685,124 @@ async def get_docs(query: str, library: str) -> str:
         logging.error(error_msg)
         return error_msg
 
+class DocsQuery(BaseModel):
+    query: str
+    library: str
+
 @mcp.tool()
+@tracer.traced("tool.get_docs_batch", parent=request_trace_parent)
+async def get_docs_batch(queries: List[DocsQuery]) -> str:
+    """
+    Search the latest docs for several queries and libraries at once, e.g.
+    to compare libraries. Prefer this over several get_docs calls.
+
+    Args:
+        queries: (query, library) pairs, e.g. [{"query": "retrievers", "library": "langchain"},
+            {"query": "retrievers", "library": "llama-index"}]
+
+    Returns:
+        Text from the docs for each pair, under a "=== library: query ===" heading
+    """
+    if len(queries) > DOCS_BATCH_MAX_QUERIES:
+        return f"Error: at most {DOCS_BATCH_MAX_QUERIES} queries per call"
+    try:
+        sections: dict[int, str] = {}
+        for i, q in enumerate(queries):
+            if q.library not in docs_urls:
+                sections[i] = f"Error: Library '{q.library}' not supported. Available: {list(docs_urls.keys())}"
+
+        # Offline index first, as in get_docs
+        remaining = [i for i in range(len(queries)) if i not in sections]
+        local = await asyncio.gather(*(search_local_index(queries[i].query, queries[i].library) for i in remaining))
+        for i, content in zip(remaining, local):
+            if content:
+                sections[i] = content
+
+        # One search request for the rest, then the union of their URLs under one deadline
+        remaining = [i for i in range(len(queries)) if i not in sections]
+        found = await lookup_doc_urls_batch([(queries[i].query, queries[i].library) for i in remaining])
+        urls = {i: found[(queries[i].library, normalize_query(queries[i].query))] for i in remaining}
+        pages, errors = await download_pages(
+            [urls[i] for i in remaining if urls[i]], FETCH_TARGET_PAGES, FETCH_DEADLINE
+        )
+        for i in remaining:
+            q = queries[i]
+            if not urls[i]:
+                sections[i] = f"No results found for '{q.query}' in {q.library} documentation"
+            else:
+                sections[i] = combine_pages(urls[i], pages, errors, FETCH_TARGET_PAGES, 3000, q.query)
+
+        return "\n".join(
+            f"=== {q.library}: {q.query} ===\n{sections[i].strip()}\n" for i, q in enumerate(queries)
+        )
+
+    except Exception as e:
+        error_msg = f"Error searching docs: {str(e)}"
+        logging.error(error_msg)
+        return error_msg
+
+@mcp.tool()
+@tracer.traced("tool.list_supported_libraries", parent=request_trace_parent)
 async def list_supported_libraries() -> str:
     """List all supported documentation libraries"""
     return f"Supported libraries: {', '.join(docs_urls.keys())}"
 
+@mcp.tool()
+async def cache_stats() -> str:
+    """Report get_docs cache hit rates and sizes, fetch counters, per-host outbound state and startup timings"""
+    stats = {cache.name: cache.stats() for cache in (search_cache, page_cache)}
+    stats["fetch"] = fetch_counters
+    stats["outbound"] = outbound.stats()
+    stats["startup"] = startup_timings
+    if docstore is not None:
+        stats["docstore"] = {**await asyncio.to_thread(docstore.stats), **docstore_counters}
+    if _local_indexes:
+        stats["local_index"] = {
+            "pages": {library: len(index) for library, index in _local_indexes.items()},
+            **index_counters,
+        }
+    return json.dumps(stats, indent=2)
+
+# Resources rather than tools: the client reads these, the LLM never sees them
+@mcp.resource("metrics://stages", mime_type="application/json")
+def stage_metrics() -> str:
+    """Latency histograms of this server's traced stages"""
+    return json.dumps(tracer.snapshot())
+
+@mcp.resource("docs://libraries", mime_type="application/json")
+def supported_libraries() -> str:
+    """Libraries get_docs supports, for clients that route or prefetch by library"""
+    return json.dumps(list(docs_urls))
+
+@mcp.resource("startup://timings", mime_type="application/json")
+def startup_status() -> str:
+    """Startup phases in seconds and the warm-up state, for the client's readiness check"""
+    return json.dumps({"phases": startup_timings, "warmup": warmup_state()})
+
+@mcp.resource("traces://{trace_id}", mime_type="application/json")
+def trace_spans(trace_id: str) -> str:
+    """Spans of one trace recorded by this server (needs TRACE_EXPORTER=memory)"""
+    return json.dumps(tracer.recent_spans(trace_id))
+
+async def serve_http(transport: str):
+    """Serve many sessions from this process over HTTP"""
+    # The lifespan runs per session; holding it here keeps the HTTP client,
+    # parse workers and caches warm between sessions
+    async with app_lifespan(mcp):
+        if transport == "sse":
+            await mcp.run_sse_async()
+        else:
+            await mcp.run_streamable_http_async()
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if sys.argv[1:2] == ["index"]:
+        import indexer
+
+        asyncio.run(indexer.main(sys.argv[2:], docs_urls, INDEX_PATH, USER_AGENT))
+        sys.exit(0)
+
     print("Starting MCP server...")
     print(f"Supported libraries: {list(docs_urls.keys())}")
     
@@ -157,4 +810,10 @@ if __name__ == "__main__":
     if not os.getenv("SERPER_API_KEY"):
         print("WARNING: SERPER_API_KEY not found in environment variables")
     
-    mcp.run(transport="stdio")
\ No newline at end of file
+    if MCP_TRANSPORT == "stdio":
+        mcp.run(transport="stdio")
+    elif MCP_TRANSPORT in ("streamable-http", "sse"):
+        print(f"Serving MCP over {MCP_TRANSPORT} on http://{MCP_HOST}:{MCP_PORT}")
+        asyncio.run(serve_http(MCP_TRANSPORT))
+    else:
+        sys.exit(f"Unknown MCP_TRANSPORT: {MCP_TRANSPORT}")
\ No newline at end of file
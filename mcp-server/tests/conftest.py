@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests run offline: no docs store, no prebuilt index, an unreachable search API,
+# and extraction in-process
+os.environ.setdefault("DOCSTORE_PATH", "")
+os.environ.setdefault("INDEX_PATH", os.path.join(tempfile.mkdtemp(), "no_index.json.gz"))
+os.environ.setdefault("SERPER_URL", "http://127.0.0.1:9/search")
+os.environ.setdefault("SERPER_API_KEY", "offline")
+os.environ.setdefault("EXTRACT_WORKERS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
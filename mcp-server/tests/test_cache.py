@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from utils.cache import AsyncTTLCache
+
+
+def make_cache(**kwargs) -> AsyncTTLCache:
+    return AsyncTTLCache("test", kwargs.pop("ttl", 60), kwargs.pop("max_size", 1000), **kwargs)
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_share_one_fetch():
+    cache = make_cache()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "page"
+
+    waiters = [asyncio.create_task(cache.get_or_fetch("url", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["page"] * 5
+    assert calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+    assert await cache.get_or_fetch("url", fetch) == "page"
+    assert cache.hits == 1
+
+
+@pytest.mark.anyio
+async def test_cancelled_caller_does_not_cancel_shared_fetch():
+    cache = make_cache()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "page"
+
+    first = asyncio.create_task(cache.get_or_fetch("url", fetch))
+    second = asyncio.create_task(cache.get_or_fetch("url", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "page"
+    assert first.cancelled()
+    assert cache.lookup("url") == "page"
+
+
+@pytest.mark.anyio
+async def test_failed_fetch_is_not_cached_and_reaches_every_waiter():
+    cache = make_cache()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+        raise RuntimeError("down")
+
+    results = await asyncio.gather(
+        cache.get_or_fetch("url", fetch), cache.get_or_fetch("url", fetch), return_exceptions=True
+    )
+
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert calls == 1
+    assert cache.lookup("url") is None
+    assert not cache._inflight
+
+
+@pytest.mark.anyio
+async def test_cache_if_rejects_value():
+    cache = make_cache()
+
+    async def fetch():
+        return ""
+
+    assert await cache.get_or_fetch("url", fetch, cache_if=bool) == ""
+    assert cache.lookup("url") is None
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr("utils.cache.time.monotonic", lambda: now)
+    cache = make_cache(ttl=10)
+    cache.put("url", "page")
+    assert cache.lookup("url") == "page"
+
+    now += 11
+    assert cache.lookup("url") is None
+    assert cache.size == 0
+
+
+def test_size_budget_evicts_least_recently_used():
+    cache = make_cache(max_size=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.lookup("a")
+    cache.put("c", "cccc")
+
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == "aaaa"
+    assert cache.size == 8 and cache.evictions == 1
+
+    # Larger than the whole budget: never stored
+    cache.put("huge", "x" * 11)
+    assert cache.lookup("huge") is None
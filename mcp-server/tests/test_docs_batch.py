@@ -0,0 +1,73 @@
+import pytest
+
+import server
+from server import DocsQuery
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """
+    No local index; searches and page downloads answered in-process.
+    Returns the batch searches and page groups that were requested.
+    """
+    calls = {"searches": [], "groups": []}
+
+    async def search_web_batch(queries, num=2):
+        calls["searches"].append(queries)
+        return [{"organic": [{"link": f"https://docs.example/{i}/{q.split()[-1]}"}]} for i, q in enumerate(queries)]
+
+    async def download_pages(groups, min_results, deadline):
+        calls["groups"].append(groups)
+        return {url: f"Text of {url}" for group in groups for url in group}, {}
+
+    monkeypatch.setattr(server, "_local_indexes", {})
+    monkeypatch.setattr(server, "search_web_batch", search_web_batch)
+    monkeypatch.setattr(server, "download_pages", download_pages)
+    server.search_cache.clear()
+    yield calls
+    server.search_cache.clear()
+
+
+@pytest.mark.anyio
+async def test_batch_dedups_queries_and_groups_sections_per_pair(offline):
+    queries = [
+        DocsQuery(query="Chroma persist", library="langchain"),
+        DocsQuery(query="retrievers", library="llama-index"),
+        DocsQuery(query="  chroma   PERSIST ", library="langchain"),
+        DocsQuery(query="retrievers", library="langchain"),
+        DocsQuery(query="retrievers", library="nope"),
+    ]
+
+    result = await server.get_docs_batch(queries)
+
+    # One search request; the repeated langchain query is searched once
+    [searches] = offline["searches"]
+    assert searches == [
+        f"site:{server.docs_urls['langchain']} Chroma persist",
+        f"site:{server.docs_urls['llama-index']} retrievers",
+        f"site:{server.docs_urls['langchain']} retrievers",
+    ]
+    # Every answerable pair gets its own page group, sharing one download round
+    [groups] = offline["groups"]
+    assert groups == [
+        ["https://docs.example/0/persist"],
+        ["https://docs.example/1/retrievers"],
+        ["https://docs.example/0/persist"],
+        ["https://docs.example/2/retrievers"],
+    ]
+
+    sections = result.split("=== ")[1:]
+    assert [s.split(" ===")[0] for s in sections] == [f"{q.library}: {q.query}" for q in queries]
+    assert "Text of https://docs.example/0/persist" in sections[0]
+    assert "Text of https://docs.example/1/retrievers" in sections[1]
+    assert "Text of https://docs.example/0/persist" in sections[2]
+    assert "Text of https://docs.example/2/retrievers" in sections[3]
+    assert "Error: Library 'nope' not supported" in sections[4]
+
+
+@pytest.mark.anyio
+async def test_batch_rejects_too_many_queries(offline):
+    queries = [DocsQuery(query=f"q{i}", library="langchain") for i in range(server.DOCS_BATCH_MAX_QUERIES + 1)]
+
+    assert await server.get_docs_batch(queries) == f"Error: at most {server.DOCS_BATCH_MAX_QUERIES} queries per call"
+    assert not offline["searches"]
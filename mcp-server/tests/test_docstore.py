@@ -0,0 +1,134 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import server
+from utils.docstore import DocStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A wall clock the test moves by hand"""
+
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr("utils.docstore.time.time", lambda: Clock.now)
+    return Clock
+
+
+def make_store(tmp_path, **kwargs) -> DocStore:
+    return DocStore(
+        str(tmp_path / "docs.db"),
+        kwargs.pop("max_bytes", 1_000_000),
+        kwargs.pop("page_ttl", 3600),
+        kwargs.pop("search_ttl", 3600),
+    )
+
+
+def test_size_cap_evicts_least_recently_used_pages(tmp_path, clock):
+    store = make_store(tmp_path, max_bytes=10)
+    store.put_page("a", "aaaa", None, None)
+    clock.now += 1
+    store.put_page("b", "bbbb", None, None)
+    clock.now += 1
+    store.get_page("a")
+    clock.now += 1
+    store.put_page("c", "cccc", None, None)
+
+    assert store.get_page("b") is None
+    assert store.get_page("a").text == "aaaa"
+    assert store.stats()["size_bytes"] == 8 and store.evictions == 1
+
+    # Larger than the whole cap: never stored
+    store.put_page("huge", "x" * 11, None, None)
+    assert store.get_page("huge") is None
+    store.close()
+
+
+def test_pages_go_stale_and_touch_revalidates_them(tmp_path, clock):
+    store = make_store(tmp_path, page_ttl=60)
+    store.put_page("a", "text", '"v1"', "Wed, 21 Oct 2015 07:28:00 GMT")
+    clock.now += 61
+    record = store.get_page("a")
+
+    assert not store.is_fresh(record)
+    assert (record.etag, record.last_modified) == ('"v1"', "Wed, 21 Oct 2015 07:28:00 GMT")
+    store.touch_page("a")
+    assert store.is_fresh(store.get_page("a"))
+    store.close()
+
+
+class VersionedPage(BaseHTTPRequestHandler):
+    """A page with an ETag that answers 304 to a matching If-None-Match"""
+
+    version = "v1"
+    conditional: list[str | None] = []
+
+    def do_GET(self):
+        etag = f'"{VersionedPage.version}"'
+        VersionedPage.conditional.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = f"<html><body><p>Docs {VersionedPage.version}</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def page_url():
+    VersionedPage.version = "v1"
+    VersionedPage.conditional = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), VersionedPage)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/page"
+    httpd.shutdown()
+
+
+@pytest.fixture
+async def stale_store(tmp_path, monkeypatch):
+    """A docstore where every page is stale at once, and an HTTP client for this test's event loop"""
+    store = make_store(tmp_path, page_ttl=0)
+    monkeypatch.setattr(server, "docstore", store)
+    monkeypatch.setattr(server, "docstore_counters", {"fresh_hits": 0, "revalidated": 0, "downloads": 0, "search_hits": 0})
+    monkeypatch.setattr(server, "_http_client", None)
+    yield store
+    await server.get_http_client().aclose()
+    store.close()
+
+
+@pytest.mark.anyio
+async def test_stored_etag_is_revalidated_and_304_served_from_the_store(page_url, stale_store):
+    assert await server.download_page_text(page_url) == "Docs v1"
+    assert stale_store.get_page(page_url).etag == '"v1"'
+
+    assert await server.download_page_text(page_url) == "Docs v1"
+
+    assert VersionedPage.conditional == [None, '"v1"']
+    assert server.docstore_counters["downloads"] == 1
+    assert server.docstore_counters["revalidated"] == 1
+
+
+@pytest.mark.anyio
+async def test_changed_page_replaces_the_stored_row(page_url, stale_store):
+    await server.download_page_text(page_url)
+    VersionedPage.version = "v2"
+
+    assert await server.download_page_text(page_url) == "Docs v2"
+
+    record = stale_store.get_page(page_url)
+    assert (record.text, record.etag) == ("Docs v2", '"v2"')
+    assert VersionedPage.conditional == [None, '"v1"']
+    assert stale_store.stats()["pages"] == 1
+    assert server.docstore_counters["downloads"] == 2
@@ -0,0 +1,8 @@
+from utils.extract_worker import create_pool, parse
+
+
+def test_parse_in_spawned_worker():
+    with create_pool(1) as pool:
+        text = pool.submit(parse, "<html><body><h2>Install</h2><p>pip install mcp</p></body></html>").result(timeout=30)
+
+    assert text == "## Install\npip install mcp"
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import server
+from utils.outbound import Outbound
+
+
+class DocsHost(BaseHTTPRequestHandler):
+    """Pages that answer fast, slowly, with an error or slowly only the first time; plus awkward streams"""
+
+    requests: list[str] = []
+
+    def do_GET(self):
+        DocsHost.requests.append(self.path)
+        if self.path.startswith("/slow"):
+            time.sleep(3)
+        elif self.path == "/sticky" and DocsHost.requests.count("/sticky") == 1:
+            time.sleep(3)
+        elif self.path == "/missing":
+            self.send_error(404)
+            return
+        elif self.path in ("/huge", "/drip", "/pdf", "/stall"):
+            self.send_stream()
+            return
+        body = f"<html><body><p>Page {self.path}</p></body></html>".encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up on this page
+            pass
+
+    def send_stream(self):
+        """A 1MB page, a page trickling out over 3s, a PDF, or headers and then 3s of nothing; sent chunk by chunk"""
+        content_type = "application/pdf" if self.path == "/pdf" else "text/html; charset=utf-8"
+        chunk = b"<p>" + b"Documentation text. " * 50 + b"</p>"
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.end_headers()
+            if self.path == "/stall":
+                self.wfile.flush()
+                time.sleep(3)
+            for _ in range(30 if self.path == "/drip" else 1000):
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                if self.path == "/drip":
+                    time.sleep(0.1)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def docs_host():
+    DocsHost.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), DocsHost)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+async def fresh_state(monkeypatch):
+    """An HTTP client for this test's event loop, empty page cache and counters"""
+    monkeypatch.setattr(server, "_http_client", None)
+    monkeypatch.setattr(server, "fetch_counters", {"hedges": 0, "hedge_wins": 0, "partial_results": 0})
+    server.page_cache.clear()
+    yield
+    await server.get_http_client().aclose()
+
+
+@pytest.mark.anyio
+async def test_returns_once_enough_pages_arrived(docs_host, fresh_state):
+    urls = [f"{docs_host}/fast1", f"{docs_host}/slow", f"{docs_host}/fast2"]
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    result = await server.fetch_multiple_urls(urls, min_results=2, deadline=10)
+
+    assert loop.time() - start < 2
+    assert "Page /fast1" in result and "Page /fast2" in result
+    # The over-fetched slow page is dropped without an error line
+    assert "/slow" not in result
+    assert server.fetch_counters["partial_results"] == 0
+
+
+@pytest.mark.anyio
+async def test_deadline_returns_partial_results(docs_host, fresh_state):
+    urls = [f"{docs_host}/fast", f"{docs_host}/slow"]
+
+    result = await server.fetch_multiple_urls(urls, min_results=2, deadline=0.5)
+
+    assert "Page /fast" in result
+    assert f"Timeout fetching {docs_host}/slow" in result
+    assert server.fetch_counters["partial_results"] == 1
+
+
+@pytest.mark.anyio
+async def test_nothing_by_the_deadline(docs_host, fresh_state):
+    result = await server.fetch_multiple_urls([f"{docs_host}/slow"], deadline=0.3)
+
+    assert result == "Timeout: Could not fetch all documentation pages in time"
+
+
+@pytest.mark.anyio
+async def test_failed_pages_are_reported(docs_host, fresh_state):
+    urls = [f"{docs_host}/missing", f"{docs_host}/fast"]
+
+    result = await server.fetch_multiple_urls(urls, deadline=5)
+
+    assert f"Error fetching {docs_host}/missing" in result
+    assert "Page /fast" in result
+
+
+@pytest.mark.anyio
+async def test_shared_urls_are_downloaded_once(docs_host, fresh_state):
+    page = f"{docs_host}/fast"
+
+    pages, errors = await server.download_pages([[page], [page, f"{docs_host}/other"]], None, deadline=5)
+
+    assert set(pages) == {page, f"{docs_host}/other"} and not errors
+    assert DocsHost.requests.count("/fast") == 1
+
+
+@pytest.mark.anyio
+async def test_slow_page_is_hedged(docs_host, fresh_state, monkeypatch):
+    monkeypatch.setattr(server, "HEDGE_DELAY", 0.2)
+    url = f"{docs_host}/sticky"
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    text = await server.fetch_text(url)
+
+    assert text == "Page /sticky"
+    assert loop.time() - start < 2
+    assert server.fetch_counters == {"hedges": 1, "hedge_wins": 1, "partial_results": 0}
+    assert DocsHost.requests.count("/sticky") == 2
+    # The hedge's result is cached for the next caller
+    assert server.page_cache.lookup(url) == "Page /sticky"
+
+
+@pytest.mark.anyio
+async def test_download_stops_at_max_page_bytes(docs_host, fresh_state, monkeypatch):
+    monkeypatch.setattr(server, "MAX_PAGE_BYTES", 4096)
+
+    text = await server.download_page_text(f"{docs_host}/huge")
+
+    assert text.startswith("Documentation text.")
+    assert len(text) < 4096
+
+
+@pytest.mark.anyio
+async def test_slow_drip_returns_partial_page(docs_host, fresh_state, monkeypatch):
+    monkeypatch.setattr(server, "PAGE_DOWNLOAD_TIMEOUT", 0.5)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    text = await server.download_page_text(f"{docs_host}/drip")
+
+    assert loop.time() - start < 2
+    assert 0 < text.count("Documentation text.") < 30 * 50
+
+
+@pytest.mark.anyio
+async def test_pdf_is_rejected_from_headers(docs_host, fresh_state):
+    result = await server.fetch_url(f"{docs_host}/pdf")
+
+    assert result == f"Error fetching {docs_host}/pdf: Unsupported content type: application/pdf"
+
+
+@pytest.mark.anyio
+async def test_stalled_body_counts_as_a_host_failure(docs_host, fresh_state, monkeypatch):
+    monkeypatch.setattr(server, "PAGE_DOWNLOAD_TIMEOUT", 0.3)
+    monkeypatch.setattr(server, "PAGE_MAX_RETRIES", 0)
+    monkeypatch.setattr(server, "outbound", Outbound("test", base_delay=0, logger=logging.getLogger("test-fetch")))
+
+    with pytest.raises(TimeoutError):
+        await server.download_page_text(f"{docs_host}/stall")
+
+    stats = server.outbound.stats()[docs_host.removeprefix("http://")]
+    assert stats["failures"] == 1
+    assert stats["breaker"]["consecutive_failures"] == 1
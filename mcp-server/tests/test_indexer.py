@@ -0,0 +1,128 @@
+import asyncio
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import indexer
+import server
+from conftest import FIXTURES
+from utils.search_index import save_indexes
+
+CORPUS = os.path.join(FIXTURES, "corpus")
+
+
+@pytest.fixture
+def local_index(tmp_path, monkeypatch):
+    """Index the fixture corpus and point the server at it"""
+    indexes = indexer.ingest_corpus(CORPUS, list(server.docs_urls))
+    path = tmp_path / "docs_index.json.gz"
+    save_indexes(str(path), indexes)
+    monkeypatch.setattr(server, "INDEX_PATH", str(path))
+    monkeypatch.setattr(server, "_local_indexes", None)
+    return indexes
+
+
+def test_ingest_corpus_uses_canonical_urls():
+    indexes = indexer.ingest_corpus(CORPUS, ["langchain", "llama-index", "openai"])
+
+    assert set(indexes) == {"langchain", "llama-index"}
+    assert len(indexes["langchain"]) == 3
+    assert "https://python.langchain.com/docs/integrations/vectorstores/chroma" in indexes["langchain"].urls
+
+
+@pytest.mark.anyio
+async def test_get_docs_answers_from_local_index(local_index):
+    result = await server.get_docs("Chroma vector store persist directory", "langchain")
+
+    assert "https://python.langchain.com/docs/integrations/vectorstores/chroma" in result
+    assert "persist_directory" in result
+
+
+@pytest.mark.anyio
+async def test_local_index_is_per_library(local_index):
+    result = await server.search_local_index("query engine streaming", "llama-index")
+    assert result is not None and "as_query_engine" in result
+
+    # Nothing indexed for openai, so get_docs would go on to search
+    assert await server.search_local_index("query engine streaming", "openai") is None
+
+
+class DocsSite(BaseHTTPRequestHandler):
+    requests: list[str] = []
+
+    def do_GET(self):
+        DocsSite.requests.append(self.path)
+        pages = {
+            "/robots.txt": "User-agent: *\nDisallow: /docs/private\n",
+            "/docs": '<html><body><h1>Docs</h1><p>Start page</p>'
+                     '<a href="/docs/guide">Guide</a> <a href="/docs/broken">Broken</a>'
+                     ' <a href="/docs/private">Private</a></body></html>',
+            "/docs/guide": "<html><head><title>Guide</title></head><body><h1>Guide</h1>"
+                           "<p>Embeddings guide</p></body></html>",
+            "/docs/broken": "<html><body><p>BROKEN</p></body></html>",
+            "/docs/private": "<html><body><p>Private</p></body></html>",
+        }
+        body = pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode()
+        self.send_response(200)
+        content_type = "text/plain" if self.path == "/robots.txt" else "text/html; charset=utf-8"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def docs_site():
+    DocsSite.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), DocsSite)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+
+@pytest.mark.anyio
+async def test_crawl_survives_page_errors_and_honours_robots(docs_site, monkeypatch):
+    extract = indexer.html_to_text
+
+    def html_to_text(raw_html: str) -> str:
+        if "BROKEN" in raw_html:
+            raise ValueError("unparseable page")
+        return extract(raw_html)
+
+    monkeypatch.setattr(indexer, "html_to_text", html_to_text)
+
+    async with httpx.AsyncClient() as client:
+        policy = indexer.HostPolicy(client, "docs-app-test", rate=0)
+        index = await asyncio.wait_for(
+            indexer.crawl_library(policy, "site", f"{docs_site}/docs", max_pages=10, concurrency=2),
+            timeout=10,
+        )
+
+    assert sorted(index.urls) == [f"{docs_site}/docs", f"{docs_site}/docs/guide"]
+    assert "/docs/private" not in DocsSite.requests
+    assert DocsSite.requests.count("/robots.txt") == 1
+
+
+@pytest.mark.anyio
+async def test_requests_are_rate_limited_per_host(docs_site):
+    async with httpx.AsyncClient() as client:
+        policy = indexer.HostPolicy(client, "docs-app-test", rate=5.0)
+        assert await policy.allowed(f"{docs_site}/docs")
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            await policy.get(f"{docs_site}/docs/guide")
+        elapsed = loop.time() - start
+
+    # Burst of one, then 5 requests per second: two waits of 0.2s
+    assert elapsed >= 0.35
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+
+import pytest
+
+from utils.outbound import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Outbound,
+    RateLimitedError,
+    RetryBudget,
+    TokenBucket,
+    TransientError,
+    parse_retry_after,
+)
+
+logger = logging.getLogger("test-outbound")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock the test moves by hand"""
+
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr("utils.outbound.time.monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_breaker_opens_after_threshold_and_probes_once(clock):
+    breaker = CircuitBreaker("host", failure_threshold=2, reset_timeout=30, logger=logger)
+    breaker.allow()
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    clock.now += 31
+    breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "trips": 1, "rejected": 2}
+
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker("host", failure_threshold=1, reset_timeout=30, logger=logger)
+    breaker.record_failure()
+    clock.now += 31
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+@pytest.mark.anyio
+async def test_token_bucket_spaces_calls_after_the_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(4):
+        await bucket.acquire(max_wait=1)
+
+    # Two from the burst, then two waits of 1/20s
+    assert loop.time() - start >= 0.09
+    assert bucket.waited == 2
+
+
+@pytest.mark.anyio
+async def test_token_bucket_rejects_waits_over_max_wait():
+    bucket = TokenBucket(rate=1, burst=1)
+    await bucket.acquire(max_wait=0)
+
+    with pytest.raises(RateLimitedError):
+        await bucket.acquire(max_wait=0.5)
+    assert bucket.rejected == 1
+
+
+def test_token_bucket_throttles_and_recovers(clock):
+    bucket = TokenBucket(rate=10, burst=1)
+    bucket.throttle(retry_after=5)
+
+    assert bucket.current_rate == 5
+    assert bucket.paused_until == clock.now + 5
+    for _ in range(5):
+        bucket.recover()
+    assert bucket.current_rate == 10
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, reserve=2)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.exhausted == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def make_outbound(**kwargs) -> Outbound:
+    return Outbound("test", base_delay=0, logger=logger, **kwargs)
+
+
+@pytest.mark.anyio
+async def test_call_retries_transient_errors():
+    outbound = make_outbound(max_retries=2)
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise TransientError("HTTP 503", status=503)
+        return "ok"
+
+    assert await outbound.call("https://docs.example/page", attempt) == "ok"
+    stats = outbound.stats()["docs.example"]
+    assert (stats["calls"], stats["failures"], stats["retries"]) == (1, 2, 2)
+    assert stats["breaker"]["state"] == "closed"
+
+
+@pytest.mark.anyio
+async def test_call_passes_other_errors_through_without_retry():
+    outbound = make_outbound()
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        await outbound.call("https://docs.example/page", attempt)
+    assert attempts == 1
+
+
+@pytest.mark.anyio
+async def test_open_breaker_fails_fast():
+    outbound = make_outbound(failure_threshold=2, max_retries=0)
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        raise TransientError("HTTP 500", status=500)
+
+    for _ in range(2):
+        with pytest.raises(TransientError):
+            await outbound.call("https://docs.example/page", attempt)
+    with pytest.raises(CircuitOpenError):
+        await outbound.call("https://docs.example/other", attempt)
+
+    assert attempts == 2
+    # Other hosts have breakers of their own
+    with pytest.raises(TransientError):
+        await outbound.call("https://search.example/", attempt)
+
+
+@pytest.mark.anyio
+async def test_429_throttles_instead_of_tripping_breaker():
+    outbound = make_outbound(failure_threshold=1, rate=100, max_retries=1)
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise TransientError("HTTP 429", status=429, retry_after=0)
+        return "ok"
+
+    assert await outbound.call("https://docs.example/page", attempt) == "ok"
+    stats = outbound.stats()["docs.example"]
+    assert stats["breaker"]["state"] == "closed"
+    assert stats["rate_limit"]["throttled"] == 1
+
+
+@pytest.mark.anyio
+async def test_retry_budget_stops_retry_storms():
+    outbound = make_outbound(max_retries=5, retry_ratio=0)
+    outbound.guard("https://docs.example/").budget.tokens = 1
+    attempts = 0
+
+    async def attempt():
+        nonlocal attempts
+        attempts += 1
+        raise TransientError("HTTP 502", status=502)
+
+    with pytest.raises(TransientError):
+        await outbound.call("https://docs.example/page", attempt)
+    assert attempts == 2
+    assert outbound.stats()["docs.example"]["retry_budget_exhausted"] == 1
@@ -0,0 +1,61 @@
+from utils.relevance import select_relevant, split_sections
+
+PAGE = "\n".join([
+    "# Vector stores",
+    "Vector stores keep embeddings and search them by similarity.",
+    "## Installation",
+    "Install the integration package with pip before you start.",
+    "## Persistence",
+    "Pass persist_directory to Chroma so the collection is saved to disk and reloaded on restart.",
+    "## Deleting documents",
+    "Remove documents by id with the delete method.",
+])
+
+
+def test_sections_start_at_headings():
+    sections = split_sections(PAGE)
+
+    assert [s.split("\n")[0] for s in sections] == ["# Vector stores", "## Installation", "## Persistence", "## Deleting documents"]
+    assert "\n".join(sections) == PAGE
+
+
+def test_long_sections_are_split_at_line_boundaries():
+    text = "# Reference\n" + "\n".join(f"line {i} " + "x" * 40 for i in range(10))
+
+    sections = split_sections(text, max_section_chars=120)
+
+    assert all(len(s) <= 120 for s in sections)
+    assert len(sections) > 1 and "\n".join(sections) == text
+
+
+def test_the_matching_section_is_kept():
+    result = select_relevant(PAGE, "chroma persist_directory disk", max_chars=150)
+
+    assert result.startswith("## Persistence\nPass persist_directory to Chroma")
+    assert "Installation" not in result and "Deleting" not in result
+    assert result.endswith("\n... [truncated]")
+
+
+def test_sections_keep_page_order_with_gaps_marked():
+    result = select_relevant(PAGE, "install delete", max_chars=len(PAGE) - 1)
+
+    assert result.index("## Installation") < result.index("## Deleting documents")
+    assert "\n...\n## Deleting documents" in result
+    assert "## Persistence" not in result
+
+
+def test_char_budget_is_respected():
+    sections = [f"## Section {i}\n" + f"chroma{i} " * 40 for i in range(5)]
+    page = "\n".join(sections)
+
+    result = select_relevant(page, "chroma1 chroma3", max_chars=500)
+
+    kept = result.removesuffix("\n... [truncated]").split("\n...\n")
+    # The first section whole, the second cut off where the budget runs out
+    assert kept[0] == sections[1]
+    assert kept[1] == sections[3][: 500 - len(sections[1])]
+
+
+def test_no_match_falls_back_to_the_head_of_the_page():
+    assert select_relevant(PAGE, "tokenizer", max_chars=40) == PAGE[:40] + "... [truncated]"
+    assert select_relevant(PAGE, "anything", max_chars=len(PAGE)) == PAGE
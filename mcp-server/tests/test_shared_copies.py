@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+SERVER_UTILS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+CLIENT_UTILS = os.path.join(os.path.dirname(os.path.dirname(SERVER_UTILS)), "mcp-client", "api", "utils")
+
+# Modules mcp-server and mcp-client/api each ship a copy of
+SHARED_MODULES = ["outbound.py", "tracing.py"]
+
+
+@pytest.mark.parametrize("name", SHARED_MODULES)
+def test_client_copy_matches(name):
+    with open(os.path.join(SERVER_UTILS, name), "rb") as f:
+        server_copy = f.read()
+    with open(os.path.join(CLIENT_UTILS, name), "rb") as f:
+        client_copy = f.read()
+
+    assert server_copy == client_copy, f"mcp-server/utils/{name} and mcp-client/api/utils/{name} differ; change both"
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    monkeypatch.setattr(server, "WARMUP", True)
+    monkeypatch.setattr(server, "_warmup_task", None)
+
+
+@pytest.mark.anyio
+async def test_warmup_state_is_reported_until_done(warmup):
+    async with server.app_lifespan(server.mcp):
+        assert server.warmup_state() == "running"
+        await asyncio.wait_for(asyncio.shield(server._warmup_task), timeout=10)
+        status = json.loads(server.startup_status())
+        assert status["warmup"] == "done"
+        assert "warmup" in status["phases"]
+
+
+@pytest.mark.anyio
+async def test_lifespan_teardown_cancels_warmup(warmup, monkeypatch):
+    started = asyncio.Event()
+
+    async def slow_warm_up():
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(server, "warm_up", slow_warm_up)
+    async with server.app_lifespan(server.mcp):
+        task = server._warmup_task
+        await started.wait()
+
+    assert task.cancelled()
+    assert server._warmup_task is None
+
+
+def test_warmup_disabled(monkeypatch):
+    monkeypatch.setattr(server, "WARMUP", False)
+    assert json.loads(server.startup_status())["warmup"] == "disabled"
+
+
+@pytest.mark.anyio
+async def test_lifespan_owns_the_docstore(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DOCSTORE_PATH", str(tmp_path / "docs.db"))
+    assert server.docstore is None
+
+    async with server.app_lifespan(server.mcp):
+        assert server.docstore is not None
+        assert json.loads(await server.cache_stats())["docstore"]["pages"] == 0
+
+    assert server.docstore is None
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from utils.tracing import SpanContext, Tracer
+
+
+def test_nested_spans_share_the_trace():
+    tracer = Tracer("test", exporter="memory")
+    with tracer.span("outer") as outer:
+        with tracer.span("inner") as inner:
+            assert tracer.current() == SpanContext(inner.trace_id, inner.span_id)
+    assert tracer.current() is None
+
+    assert inner.trace_id == outer.trace_id
+    assert (outer.parent_id, inner.parent_id) == (None, outer.span_id)
+    assert set(tracer.histograms) == {"outer", "inner"}
+
+
+def test_remote_parent_continues_its_trace():
+    tracer = Tracer("test", exporter="memory")
+    remote = SpanContext.from_traceparent("00-" + "a" * 32 + "-" + "b" * 16 + "-01")
+
+    with tracer.span("tool", parent=remote) as span:
+        pass
+
+    assert (span.trace_id, span.parent_id) == ("a" * 32, "b" * 16)
+
+
+@pytest.mark.anyio
+async def test_traced_generator_span_is_only_current_while_it_runs():
+    tracer = Tracer("test", exporter="memory")
+    seen = []
+
+    @tracer.traced("stream")
+    async def stream():
+        for i in range(2):
+            with tracer.span("step"):
+                await asyncio.sleep(0)
+            seen.append(tracer.current())
+            yield i
+
+    with tracer.span("request") as request:
+        async for _ in stream():
+            # Between items the consumer still sees its own span
+            assert tracer.current() == SpanContext(request.trace_id, request.span_id)
+
+    spans = {s["name"]: s for s in tracer.recent_spans()}
+    assert spans["stream"]["parent_id"] == request.span_id
+    assert spans["step"]["parent_id"] == spans["stream"]["span_id"]
+    assert seen == [SpanContext(request.trace_id, spans["stream"]["span_id"])] * 2
+
+
+@pytest.mark.anyio
+async def test_closing_a_traced_generator_early_ends_its_span():
+    tracer = Tracer("test", exporter="memory")
+    cleaned_up = []
+
+    @tracer.traced("stream")
+    async def stream():
+        try:
+            while True:
+                yield 1
+        finally:
+            cleaned_up.append(tracer.current())
+
+    iterator = stream()
+    await iterator.__anext__()
+    await iterator.aclose()
+
+    [span] = tracer.recent_spans()
+    assert cleaned_up == [SpanContext(span["trace_id"], span["span_id"])]
+    assert tracer.current() is None
+
+
+@pytest.fixture
+def otel_spans():
+    """Finished OTel spans from an in-memory SDK exporter"""
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider, exporter
+
+
+def otel_tracer(provider) -> Tracer:
+    tracer = Tracer("test", exporter="memory")
+    tracer._otel = provider.get_tracer("test")
+    return tracer
+
+
+def test_otel_spans_link_to_their_parents(otel_spans):
+    provider, exporter = otel_spans
+    tracer = otel_tracer(provider)
+
+    with tracer.span("outer") as outer:
+        with tracer.span("inner") as inner:
+            traceparent = tracer.traceparent()
+
+    exported = {s.name: s for s in exporter.get_finished_spans()}
+    assert exported["outer"].parent is None
+    assert exported["inner"].parent.span_id == exported["outer"].context.span_id
+    # The ids we propagate are the exported ones
+    assert inner.span_id == format(exported["inner"].context.span_id, "016x")
+    assert traceparent == f"00-{format(exported['outer'].context.trace_id, '032x')}-{inner.span_id}-01"
+    assert outer.trace_id == inner.trace_id
+
+
+def test_otel_span_joins_a_remote_trace(otel_spans):
+    provider, exporter = otel_spans
+    tracer = otel_tracer(provider)
+    remote = SpanContext("c" * 32, "d" * 16)
+
+    with tracer.span("tool.get_docs", parent=remote):
+        pass
+
+    [span] = exporter.get_finished_spans()
+    assert format(span.context.trace_id, "032x") == "c" * 32
+    assert format(span.parent.span_id, "016x") == "d" * 16
+    assert span.parent.is_remote
@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class PageRecord:
+    url: str
+    text: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+
+class DocStore:
+    """
+    SQLite-backed store for cleaned page text and search result URLs.
+
+    Survives server restarts so that a freshly spawned server can answer
+    popular queries without touching the network. Pages keep their ETag and
+    Last-Modified headers for conditional revalidation. The total size of
+    stored page text is capped; least recently used pages are evicted first.
+
+    Methods are blocking; call them from a worker thread.
+    """
+
+    def __init__(self, path: str, max_bytes: int, page_ttl: float, search_ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.page_ttl = page_ttl
+        self.search_ttl = search_ttl
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+            CREATE TABLE IF NOT EXISTS searches (
+                library TEXT NOT NULL,
+                query TEXT NOT NULL,
+                urls TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (library, query)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def get_page(self, url: str) -> PageRecord | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+        return PageRecord(url, *row)
+
+    def is_fresh(self, record: PageRecord) -> bool:
+        return time.time() - record.fetched_at < self.page_ttl
+
+    def put_page(self, url: str, text: str, etag: str | None, last_modified: str | None) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch_page(self, url: str) -> None:
+        """Mark a page as revalidated (e.g. after a 304 Not Modified)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url),
+            )
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT url, size FROM pages ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (row[0],))
+            total -= row[1]
+            self.evictions += 1
+
+    def get_search(self, library: str, query: str) -> list[str] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT urls, fetched_at FROM searches WHERE library = ? AND query = ?",
+                (library, query),
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.search_ttl:
+            return None
+        return json.loads(row[0])
+
+    def put_search(self, library: str, query: str, urls: list[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)",
+                (library, query, json.dumps(urls), time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pages, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+            (searches,) = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()
+        return {
+            "path": self.path,
+            "pages": pages,
+            "searches": searches,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
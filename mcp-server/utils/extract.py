@@ -0,0 +1,90 @@
+"""
+HTML-to-text extraction backends.
+
+All backends drop script/style/nav/header/footer, mark headings with `#`
+prefixes (so the text can be split into sections) and return one cleaned
+line per text block. The fastest installed backend is used by default:
+selectolax (lexbor) > lxml > BeautifulSoup's html.parser.
+"""
+import importlib.util
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+REMOVED_TAGS = ["script", "style", "nav", "header", "footer"]
+HEADING_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6"]
+
+# Only the body is parsed; <head> never contributes text
+_BODY_ONLY = SoupStrainer("body")
+
+
+def _clean_lines(text: str) -> str:
+    # Clean up whitespace
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    return '\n'.join(lines)
+
+
+def _soup_to_text(html: str, parser: str) -> str:
+    soup = BeautifulSoup(html, parser, parse_only=_BODY_ONLY)
+    if not soup.contents:
+        # Fragment without a <body>: parse it whole
+        soup = BeautifulSoup(html, parser)
+
+    # Remove script and style elements
+    for script in soup(REMOVED_TAGS):
+        script.decompose()
+
+    # Mark headings so the text can be split back into sections
+    for heading in soup(HEADING_TAGS):
+        heading.string = "#" * int(heading.name[1]) + " " + heading.get_text(" ", strip=True)
+
+    return _clean_lines(soup.get_text(strip=True, separator='\n'))
+
+
+def bs4_to_text(html: str) -> str:
+    return _soup_to_text(html, "html.parser")
+
+
+def lxml_to_text(html: str) -> str:
+    return _soup_to_text(html, "lxml")
+
+
+def selectolax_to_text(html: str) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    root = tree.body or tree.root
+    if root is None:
+        return ""
+    tree.strip_tags(REMOVED_TAGS)
+    for heading in root.css(",".join(HEADING_TAGS)):
+        heading.replace_with("#" * int(heading.tag[1]) + " " + heading.text(separator=" ", strip=True))
+    return _clean_lines(root.text(separator='\n', strip=True))
+
+
+BACKENDS = {
+    "selectolax": (selectolax_to_text, "selectolax"),
+    "lxml": (lxml_to_text, "lxml"),
+    "bs4": (bs4_to_text, "bs4"),
+}
+
+
+def available_backends() -> list[str]:
+    return [name for name, (_, module) in BACKENDS.items() if importlib.util.find_spec(module) is not None]
+
+
+def resolve_backend(name: str) -> str:
+    """Map "auto" (or an uninstalled backend) to the fastest installed one"""
+    available = available_backends()
+    if name in available:
+        return name
+    return available[0]
+
+
+EXTRACT_BACKEND = resolve_backend(os.getenv("EXTRACT_BACKEND", "auto"))
+
+
+def html_to_text(html: str, backend: str | None = None) -> str:
+    """Strip boilerplate elements from an HTML page and return its cleaned text"""
+    extract, _ = BACKENDS[backend or EXTRACT_BACKEND]
+    return extract(html)
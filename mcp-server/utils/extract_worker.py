@@ -0,0 +1,30 @@
+"""
+The HTML parse worker processes.
+
+Workers are started with spawn: forking would copy the stdio transport's
+reader thread and its locks into them, and they would deadlock. A spawned
+worker imports this module and the parser backend, and re-runs the main
+script as `__mp_main__`; server.py opens nothing at import time so that
+re-run stays cheap.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def load_parser() -> None:
+    """Import the parser backend as the worker starts, not on its first page"""
+    import utils.extract  # noqa: F401
+
+
+def parse(html: str) -> str:
+    from utils.extract import html_to_text
+
+    return html_to_text(html)
+
+
+def create_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=load_parser,
+    )
@@ -0,0 +1,79 @@
+import re
+
+import numpy as np
+
+from utils.search_index import tokenize
+
+HEADING_RE = re.compile(r"^#{1,6} ")
+
+
+def split_sections(text: str, max_section_chars: int = 1500) -> list[str]:
+    """
+    Split cleaned page text into sections at heading lines (`# ...`, as
+    emitted by html_to_text). Sections longer than max_section_chars are
+    split further at line boundaries so one huge section can't dominate.
+    """
+    sections, current, size = [], [], 0
+    for line in text.split("\n"):
+        if current and (HEADING_RE.match(line) or size + len(line) > max_section_chars):
+            sections.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def bm25_scores(sections: list[str], query: str, k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """BM25 score of every section against the query terms"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return np.zeros(len(sections))
+
+    term_index = {term: i for i, term in enumerate(terms)}
+    tf = np.zeros((len(sections), len(terms)))
+    lengths = np.empty(len(sections))
+    for row, section in enumerate(sections):
+        tokens = tokenize(section)
+        lengths[row] = len(tokens)
+        for token in tokens:
+            col = term_index.get(token)
+            if col is not None:
+                tf[row, col] += 1
+
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(sections) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def select_relevant(text: str, query: str, max_chars: int) -> str:
+    """
+    Keep the sections of a page that best match the query, in page order,
+    within max_chars. Falls back to the head of the page when nothing matches.
+    """
+    if len(text) <= max_chars:
+        return text
+
+    sections = split_sections(text)
+    scores = bm25_scores(sections, query)
+    if not scores.any():
+        return text[:max_chars] + "... [truncated]"
+
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] <= 0 or used >= max_chars:
+            break
+        section = sections[i][: max_chars - used]
+        chosen.append((i, section))
+        used += len(section)
+
+    parts = []
+    previous = None
+    for i, section in sorted(chosen):
+        if previous is not None and i != previous + 1:
+            parts.append("...")
+        parts.append(section)
+        previous = i
+    return "\n".join(parts) + "\n... [truncated]"
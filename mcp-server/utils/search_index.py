@@ -0,0 +1,106 @@
+import gzip
+import json
+import math
+import re
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9_]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or the to use using what when with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index over documentation pages with BM25 ranking.
+
+    Postings are stored as flat `[doc_id, tf, doc_id, tf, ...]` lists so the
+    serialized index stays compact.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.urls: list[str] = []
+        self.titles: list[str] = []
+        self.texts: list[str] = []
+        self.doc_lengths: list[int] = []
+        self.postings: dict[str, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def add_document(self, url: str, title: str, text: str) -> None:
+        doc_id = len(self.urls)
+        tokens = tokenize(f"{title}\n{text}")
+        self.urls.append(url)
+        self.titles.append(title)
+        self.texts.append(text)
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).extend((doc_id, tf))
+
+    def search(self, query: str, k: int = 2, min_coverage: float = 0.5) -> list[tuple[int, float]]:
+        """
+        Return up to k `(doc_id, score)` pairs, best first.
+
+        Documents matching less than `min_coverage` of the distinct query
+        terms are dropped so that a single common word is not a hit.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.urls:
+            return []
+
+        n_docs = len(self.urls)
+        avg_length = sum(self.doc_lengths) / n_docs or 1.0
+        scores: Counter[int] = Counter()
+        matched: Counter[int] = Counter()
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings) // 2
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for i in range(0, len(postings), 2):
+                doc_id, tf = postings[i], postings[i + 1]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] += 1
+
+        min_matched = math.ceil(len(terms) * min_coverage)
+        ranked = [(d, s) for d, s in scores.most_common() if matched[d] >= min_matched]
+        return ranked[:k]
+
+    def to_dict(self) -> dict:
+        return {
+            "urls": self.urls,
+            "titles": self.titles,
+            "texts": self.texts,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        index = cls()
+        index.urls = data["urls"]
+        index.titles = data["titles"]
+        index.texts = data["texts"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        return index
+
+
+def save_indexes(path: str, indexes: dict[str, BM25Index]) -> None:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({library: index.to_dict() for library, index in indexes.items()}, f, separators=(",", ":"))
+
+
+def load_indexes(path: str) -> dict[str, BM25Index]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    return {library: BM25Index.from_dict(index) for library, index in data.items()}